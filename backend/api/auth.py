@@ -5,6 +5,7 @@ from fastapi import HTTPException, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 from config import settings
+from tracing import traced
 
 security = HTTPBearer()
 
@@ -13,8 +14,12 @@ async def verify_clerk_token(
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ) -> dict:
     """Verify Clerk JWT and return user data"""
-    
-    token = credentials.credentials
+    return await verify_token(credentials.credentials)
+
+
+@traced("auth.verify_token")
+async def verify_token(token: str) -> dict:
+    """Verify a Clerk session token (also used by WebSocket endpoints, which get it in a message)"""
     
     try:
         async with httpx.AsyncClient() as client:
@@ -0,0 +1,134 @@
+"""
+Micro-benchmark for job_market queries (indexed vs. the old linear scans)
+and the skill normalizer
+
+Run: python bench_job_market.py [queries]
+"""
+
+import random
+import sys
+import time
+
+import job_market
+import skills
+from job_market import (
+    ROLE_SKILLS, get_job_market_summary, get_market_data, get_role_outlook, get_skills_gap_analysis
+)
+
+JOB_MARKET_DATA = get_market_data()
+
+ROLE_QUERIES = [
+    "DevOps Engineer", "ai/ml", "data", "Cloud Architect", "bank teller", "Senior Backend Engineer",
+    "cashier", "Full Stack Developer", "ux", "Product Manager", "cybersecurity specialist", "nurse",
+]
+GAP_QUERIES = [
+    (["Python", "SQL", "Git"], "ML Engineer"),
+    (["Docker", "Kubernetes", "AWS", "Linux"], "Senior DevOps Engineer"),
+    (["JavaScript", "React", "Node.js"], "Full Stack Developer"),
+    (["Excel"], "Product Manager"),
+    (["Python", "Statistics", "SQL", "TensorFlow"], "Data Scientist II"),
+]
+
+
+# Reference implementations of the pre-index linear scans
+def _legacy_role_outlook(role: str) -> dict:
+    role_lower = role.lower()
+    for job in JOB_MARKET_DATA["fastest_growing_global"]:
+        if role_lower in job["role"].lower():
+            return {"role": job["role"], "outlook": "growing"}
+    for job in JOB_MARKET_DATA["declining_roles"]:
+        if role_lower in job["role"].lower():
+            return {"role": job["role"], "outlook": "declining"}
+    return {"role": role, "outlook": "stable"}
+
+
+def _legacy_skills_gap(current_skills: list, target_role: str) -> dict:
+    current_lower = [s.lower() for s in current_skills]
+    role_skills = {k: list(v) for k, v in ROLE_SKILLS.items()}
+    needed = []
+    for key, skills in role_skills.items():
+        if key in target_role.lower():
+            needed = skills
+            break
+    if not needed:
+        needed = [s["skill"].lower() for s in JOB_MARKET_DATA["top_skills_global"][:6]]
+    return {"skills_matched": [s for s in needed if s in current_lower]}
+
+
+def _bench(name: str, fn, args: list) -> float:
+    start = time.perf_counter()
+    for a in args:
+        fn(*a)
+    per_call = (time.perf_counter() - start) / len(args) * 1e6
+    print(f"  {name:<38} {per_call:8.2f} µs/call")
+    return per_call
+
+
+def main(n: int = 10_000):
+    rnd = random.Random(42)
+    roles = [(rnd.choice(ROLE_QUERIES),) for _ in range(n)]
+    # Mostly unique free-text roles, as typed by users (defeats the outlook cache)
+    free_roles = [(f"{rnd.choice(ROLE_QUERIES)} {i}",) for i in range(n)]
+    gaps = [rnd.choice(GAP_QUERIES) for _ in range(n)]
+    fields = [(rnd.choice([None, "technology", "healthcare", "finance"]),) for _ in range(n)]
+
+    # Results must agree with the legacy scans, also for short and mid-word fragments
+    names = [job["role"] for job in JOB_MARKET_DATA["fastest_growing_global"] + JOB_MARKET_DATA["declining_roles"]]
+    fragments = {name.lower()[i:i + size] for name in names for size in (1, 2, 3, 6) for i in range(len(name))}
+    fragments |= {"", "/", "te", "ca", "se", "gineer", "zz", "engineer x"}
+    for role in [r for (r,) in roles[:200]] + sorted(fragments):
+        assert get_role_outlook(role)["role"] == _legacy_role_outlook(role)["role"], role
+    # Canonical matching finds everything exact matching did (and aliases on top)
+    for user_skills, role in GAP_QUERIES:
+        matched = get_skills_gap_analysis(user_skills, role)["skills_matched"]
+        assert set(_legacy_skills_gap(user_skills, role)["skills_matched"]) <= set(matched)
+
+    print(f"job_market micro-benchmark ({n:,} queries each)")
+    _bench("get_role_outlook (legacy scan)", _legacy_role_outlook, roles)
+    job_market._role_outlook.cache_clear()
+    _bench("get_role_outlook (indexed)", get_role_outlook, roles)
+    _bench("get_role_outlook free text (legacy)", _legacy_role_outlook, free_roles)
+    _bench("get_role_outlook free text (indexed)", get_role_outlook, free_roles)
+    _bench("get_skills_gap_analysis (legacy)", _legacy_skills_gap, gaps)
+    _bench("get_skills_gap_analysis (indexed)", get_skills_gap_analysis, gaps)
+    _bench("get_job_market_summary (indexed)", get_job_market_summary, fields)
+
+    # The shipped dataset has ~16 roles; show how lookups scale with a larger catalogue
+    big = dict(JOB_MARKET_DATA)
+    big["fastest_growing_global"] = JOB_MARKET_DATA["fastest_growing_global"] + [
+        {"role": f"Specialist {i} Engineer", "growth": "10%", "demand": "high", "salary_range_usd": "0"}
+        for i in range(5_000)
+    ]
+    index = job_market.JobMarketIndex(big, ROLE_SKILLS)
+    names = [job["role"].lower() for job in big["fastest_growing_global"] + big["declining_roles"]]
+
+    def scan(role):
+        role = role.lower()
+        return next((name for name in names if role in name), None)
+
+    for (role,) in free_roles[:200] + [("gineer 49",), ("ist 4",), ("",), ("/",)]:
+        found = index.find_role(role)
+        assert (found[1]["role"].lower() if found else None) == scan(role), role
+
+    # Normalizer throughput: uncached exact/trie path and the lru-cached path
+    variants = [alias for _, aliases, _ in skills.SKILLS.values() for alias in aliases]
+    variants += [name.upper() for name, _, _ in skills.SKILLS.values()]
+    raw = [variants[i % len(variants)] + f" {i}" for i in range(n)]  # Unique -> trie path
+    warm = [rnd.choice(variants) for _ in range(n)]
+    start = time.perf_counter()
+    for text in raw:
+        skills.normalize_skill.__wrapped__(text)
+    uncached = n / (time.perf_counter() - start)
+    start = time.perf_counter()
+    for text in warm:
+        skills.normalize_skill(text)
+    cached = n / (time.perf_counter() - start)
+    print(f"\nskill normalizer: {uncached:,.0f} skills/sec uncached, {cached:,.0f} skills/sec cached")
+
+    print(f"\nrole lookup with {len(names):,} roles (uncached)")
+    _bench("linear scan", scan, free_roles)
+    _bench("JobMarketIndex.find_role", index.find_role, free_roles)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
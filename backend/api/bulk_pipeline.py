@@ -0,0 +1,384 @@
+"""Bulk resume analysis pipeline for institutional uploads
+
+Stages: parse -> local pre-score -> bounded-concurrency LLM analysis -> batched DB writes.
+
+Every job lives in its own directory under BULK_JOB_DIR:
+    input.ndjson / input.zip   the uploaded file
+    meta.json                  job description and status
+    results.ndjson             one line per finished resume (the checkpoint)
+
+A crashed or disconnected job is resumed by replaying results.ndjson and
+skipping every ref it already contains.
+"""
+
+import asyncio
+import json
+import os
+import uuid
+import zipfile
+from datetime import datetime, timezone
+from typing import AsyncIterator, Iterator
+
+from config import settings
+from resume_text import content_hash, prescore_resume
+import db
+import extract
+import llm
+import resume_service
+
+ZIP_TYPES = ("application/zip", "application/x-zip-compressed")
+TEXT_SUFFIXES = (".txt", ".md")
+DOCUMENT_SUFFIXES = (".pdf", ".docx")  # Extracted in the extract worker process
+MAX_ENTRY_BYTES = 2 * 1024 * 1024  # Per-resume cap inside a ZIP (zip-bomb guard)
+
+_running: dict[str, dict] = {}  # job_id -> the job dict of the run that claimed it
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+class JobBusy(RuntimeError):
+    pass
+
+
+def _job_dir(job_id: str) -> str:
+    return os.path.join(settings.BULK_JOB_DIR, job_id)
+
+
+def _write_meta(job: dict) -> None:
+    path = os.path.join(_job_dir(job["job_id"]), "meta.json")
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(job, f)
+    os.replace(tmp, path)
+
+
+def load_job(job_id: str) -> dict | None:
+    """Load job metadata, or None if the job does not exist"""
+    if not job_id.isalnum():
+        return None
+    try:
+        with open(os.path.join(_job_dir(job_id), "meta.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+# ═══════════════════════════════════════════════════════════════
+# STAGE 1 - UPLOAD + PARSE
+# ═══════════════════════════════════════════════════════════════
+
+async def create_job(chunks: AsyncIterator[bytes], content_type: str,
+                     uploader_id: str, target_role: str = "") -> dict:
+    """Stream an upload (ZIP of .txt/.md/.pdf/.docx or NDJSON) to disk and register a job"""
+    fmt = "zip" if content_type.split(";")[0].strip() in ZIP_TYPES else "ndjson"
+    job_id = uuid.uuid4().hex
+    os.makedirs(_job_dir(job_id), exist_ok=True)
+    path = os.path.join(_job_dir(job_id), f"input.{fmt}")
+    limit = settings.BULK_MAX_UPLOAD_MB * 1024 * 1024
+
+    size = 0
+    with open(path, "wb") as f:
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > limit:
+                f.close()
+                _remove_job(job_id)
+                raise UploadTooLarge(f"Upload exceeds {settings.BULK_MAX_UPLOAD_MB}MB")
+            f.write(chunk)
+
+    job = {
+        "job_id": job_id,
+        "uploader_id": uploader_id,
+        "target_role": target_role,
+        "format": fmt,
+        "input": path,
+        "status": "pending",
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+    try:
+        job["total"] = _count_items(job)
+    except zipfile.BadZipFile:
+        _remove_job(job_id)
+        raise ValueError("Invalid ZIP file")
+    _write_meta(job)
+    return job
+
+
+def _remove_job(job_id: str) -> None:
+    directory = _job_dir(job_id)
+    for name in os.listdir(directory):
+        os.remove(os.path.join(directory, name))
+    os.rmdir(directory)
+
+
+def _is_entry(info: zipfile.ZipInfo) -> bool:
+    return not info.is_dir() and not os.path.basename(info.filename).startswith(".")
+
+
+def _count_items(job: dict) -> int:
+    """Count resumes without reading them"""
+    if job["format"] == "zip":
+        with zipfile.ZipFile(job["input"]) as zf:
+            return sum(1 for info in zf.infolist() if _is_entry(info))
+    with open(job["input"], "rb") as f:
+        return sum(1 for line in f if line.strip())
+
+
+def _iter_items(job: dict) -> Iterator[dict]:
+    """Yield {ref, user_id, target_role, resume_text} (or {ref, error}) per resume"""
+    if job["format"] == "zip":
+        with zipfile.ZipFile(job["input"]) as zf:
+            for info in zf.infolist():
+                if not _is_entry(info):
+                    continue
+                item = {"ref": info.filename, "user_id": job["uploader_id"], "target_role": job["target_role"]}
+                name = info.filename.lower()
+                if not name.endswith(TEXT_SUFFIXES + DOCUMENT_SUFFIXES):
+                    item["error"] = "unsupported file type"
+                elif info.file_size > MAX_ENTRY_BYTES:
+                    item["error"] = "file too large"
+                elif name.endswith(DOCUMENT_SUFFIXES):
+                    item["document"] = zf.read(info)
+                else:
+                    item["resume_text"] = zf.read(info).decode("utf-8", errors="replace")
+                yield item
+        return
+
+    with open(job["input"], "rb") as f:
+        for n, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                obj = json.loads(line)
+            except ValueError:
+                yield {"ref": f"line-{n}", "error": "invalid JSON"}
+                continue
+            ref = str(obj.get("id") or f"line-{n}")
+            # Everything in a job is saved to the uploader's account; rows naming anyone else are refused
+            if obj.get("user_id") not in (None, "", job["uploader_id"]):
+                yield {"ref": ref, "error": "user_id does not match the uploader"}
+                continue
+            yield {
+                "ref": ref,
+                "user_id": job["uploader_id"],
+                "target_role": obj.get("target_role") or job["target_role"],
+                "resume_text": obj.get("resume_text") or "",
+            }
+
+
+# ═══════════════════════════════════════════════════════════════
+# STAGES 2-4 - PRE-SCORE, LLM, BATCHED WRITES
+# ═══════════════════════════════════════════════════════════════
+
+async def _analyze(item: dict) -> dict:
+    """LLM stage for one resume (reuses stored analyses for identical content)"""
+    digest = content_hash(item["resume_text"])
+    result = {"ref": item["ref"], "user_id": item["user_id"], "prescore": item["prescore"]}
+    try:
+        analysis = await resume_service.find_cached_analysis(
+            digest, item["target_role"], llm.RESUME_PROMPT_VERSION
+        )
+        cached = analysis is not None
+        if not cached:
+            analysis = await llm.analyze_resume(item["resume_text"], item["target_role"])
+            resume_service.remember_analysis(digest, item["target_role"], llm.RESUME_PROMPT_VERSION, analysis)
+    except Exception as e:
+        return {**result, "status": "error", "error": str(e)}
+    degraded = llm.is_degraded(analysis)
+    return {
+        **result,
+        "status": "analyzed",
+        "cached": cached,
+        "analysis": analysis,
+        "_row": {
+            "user_id": item["user_id"],
+            "resume_text": item["resume_text"],
+            "target_role": resume_service.normalize_role(item["target_role"]),
+            "analysis": analysis,
+            # Fallback analyses are stored without hash/version so they are never reused
+            "content_hash": None if degraded else digest,
+            "prompt_version": None if degraded else llm.RESUME_PROMPT_VERSION,
+        },
+    }
+
+
+async def _produce(job: dict, done: set, work: asyncio.Queue, out: asyncio.Queue, workers: int) -> None:
+    """Parse + pre-score; items that do not need the LLM go straight to the writer"""
+    try:
+        for item in _iter_items(job):
+            if item["ref"] in done:
+                continue
+            if "document" in item:
+                try:
+                    item["resume_text"] = await extract.extract_bytes(item.pop("document"))
+                except extract.ExtractionError as e:
+                    item["error"] = str(e)
+            if "error" in item:
+                await out.put({"ref": item["ref"], "status": "skipped", "error": item["error"]})
+                continue
+            item["prescore"] = prescore_resume(item["resume_text"])
+            if not item["prescore"]["analyzable"]:
+                await out.put({"ref": item["ref"], "user_id": item["user_id"], "status": "skipped",
+                               "error": "resume text too short", "prescore": item["prescore"]})
+                continue
+            await work.put(item)
+    finally:
+        # Stop the workers on success and on errors (but not on cancellation)
+        if not asyncio.current_task().cancelling():
+            for _ in range(workers):
+                await work.put(None)
+
+
+async def _work(work: asyncio.Queue, out: asyncio.Queue) -> None:
+    while (item := await work.get()) is not None:
+        await out.put(await _analyze(item))
+    await out.put(None)
+
+
+async def _flush(job: dict, batch: list, checkpoint) -> list[str]:
+    """Write one batch to the DB, then to the checkpoint file; return NDJSON lines"""
+    analyzed = [r for r in batch if r.get("status") == "analyzed"]
+    if analyzed:
+        await db.ensure_users([r["user_id"] for r in analyzed])
+        ids = await db.save_resumes_batch([r.pop("_row") for r in analyzed])
+        for r, resume_id in zip(analyzed, ids):
+            r["resume_id"] = resume_id
+    lines = [json.dumps({"type": "result", **r}) + "\n" for r in batch]
+    checkpoint.writelines(lines)
+    checkpoint.flush()
+    os.fsync(checkpoint.fileno())
+    return lines
+
+
+def _drop_torn_line(path: str) -> None:
+    """Cut a partial last line (crash mid-write) so appended results start on a fresh line"""
+    with open(path, "rb+") as f:
+        pos = f.seek(0, os.SEEK_END)
+        while pos > 0:
+            step = min(pos, 64 * 1024)
+            f.seek(pos - step)
+            newline = f.read(step).rfind(b"\n")
+            if newline >= 0:
+                f.truncate(pos - step + newline + 1)
+                return
+            pos -= step
+        f.truncate(0)
+
+
+def _progress(job: dict, done: int) -> str:
+    return json.dumps({"type": "progress", "job_id": job["job_id"], "done": done, "total": job["total"]}) + "\n"
+
+
+def claim_job(job_id: str) -> dict:
+    """Mark a job as running before its stream starts; raises KeyError or JobBusy.
+
+    The claim is released when run_job() finishes (or via release_job() if the
+    stream never started).
+    """
+    job = load_job(job_id)
+    if not job:
+        raise KeyError(job_id)
+    if job_id in _running:
+        raise JobBusy(job_id)
+    _running[job_id] = job
+    return job
+
+
+def release_job(job: dict) -> None:
+    """Drop a claim taken by claim_job() (no-op if it was already released)"""
+    if _running.get(job["job_id"]) is job:
+        del _running[job["job_id"]]
+
+
+async def run_job(job: dict) -> AsyncIterator[str]:
+    """Run (or resume) a job claimed with claim_job(), streaming NDJSON result and progress lines.
+
+    Results already in the checkpoint are replayed first, so a client that
+    reconnects after a crash receives the complete result set.
+    """
+    job_id = job["job_id"]
+    results_path = os.path.join(_job_dir(job_id), "results.ndjson")
+    done: set = set()
+    tasks: list[asyncio.Task] = []
+    try:
+        yield json.dumps({"type": "job", "job_id": job_id, "total": job["total"]}) + "\n"
+        if os.path.exists(results_path):
+            _drop_torn_line(results_path)
+            with open(results_path) as f:
+                for line in f:
+                    try:
+                        done.add(json.loads(line)["ref"])
+                    except (ValueError, KeyError):
+                        continue
+                    yield line
+            yield _progress(job, len(done))
+
+        job["status"] = "running"
+        _write_meta(job)
+
+        workers = max(settings.BULK_LLM_CONCURRENCY, 1)
+        work: asyncio.Queue = asyncio.Queue(maxsize=workers * 2)
+        out: asyncio.Queue = asyncio.Queue()
+        tasks.append(asyncio.create_task(_produce(job, done, work, out, workers)))
+        tasks += [asyncio.create_task(_work(work, out)) for _ in range(workers)]
+
+        finished_workers = 0
+        batch: list = []
+        with open(results_path, "a") as checkpoint:
+            while finished_workers < workers:
+                result = await out.get()
+                if result is None:
+                    finished_workers += 1
+                else:
+                    batch.append(result)
+                if batch and (len(batch) >= settings.BULK_DB_BATCH_SIZE or finished_workers == workers):
+                    for line in await _flush(job, batch, checkpoint):
+                        yield line
+                    done.update(r["ref"] for r in batch)
+                    batch = []
+                    yield _progress(job, len(done))
+            # Errors from the producer (e.g. unreadable input) surface here
+            await tasks[0]
+
+        job["status"] = "completed"
+        _write_meta(job)
+        yield _progress(job, len(done))
+    finally:
+        for task in tasks:
+            task.cancel()
+        release_job(job)
+
+
+def is_running(job_id: str) -> bool:
+    return job_id in _running
+
+
+def job_progress(job_id: str) -> dict | None:
+    """Progress summary from metadata + checkpoint"""
+    job = load_job(job_id)
+    if not job:
+        return None
+    counts: dict = {}
+    results_path = os.path.join(_job_dir(job_id), "results.ndjson")
+    if os.path.exists(results_path):
+        with open(results_path) as f:
+            for line in f:
+                try:
+                    status = json.loads(line).get("status", "unknown")
+                except ValueError:
+                    continue
+                counts[status] = counts.get(status, 0) + 1
+    done = sum(counts.values())
+    status = job["status"]
+    if status == "running" and job_id not in _running:
+        status = "interrupted"  # Process died or client disconnected - resumable
+    return {
+        "job_id": job_id,
+        "status": status,
+        "total": job["total"],
+        "done": done,
+        "counts": counts,
+        "created_at": job["created_at"],
+    }
@@ -0,0 +1,108 @@
+"""Bounded in-process caches - sized for a 1GB RAM VPS"""
+
+import sys
+import weakref
+from collections import OrderedDict
+from itertools import islice
+from typing import Any
+
+_MISSING = object()
+_caches: "weakref.WeakSet[LRUCache]" = weakref.WeakSet()  # Every live LRUCache, for metrics
+SIZE_SAMPLE = 64  # Entries deep-sized per mapping by approx_mapping_size
+
+
+def all_caches() -> list:
+    return list(_caches)
+
+
+def approx_size(obj, _seen: set = None) -> int:
+    """Approximate deep size in bytes of dicts/lists/tuples/sets/strings (shared objects counted once)"""
+    seen = _seen if _seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(approx_size(k, seen) + approx_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(approx_size(item, seen) for item in obj)
+    elif hasattr(obj, "__slots__"):
+        size += sum(approx_size(getattr(obj, name), seen) for name in obj.__slots__ if hasattr(obj, name))
+    return size
+
+
+def approx_mapping_size(data: dict) -> int:
+    """approx_size of a large mapping, extrapolated from at most SIZE_SAMPLE evenly spaced entries.
+
+    Stats endpoints and scrapes run on the event loop; deep-walking every
+    entry of every cache there would stall it.
+    """
+    if len(data) <= SIZE_SAMPLE:
+        return approx_size(data)
+    step = len(data) // SIZE_SAMPLE
+    seen: set = set()
+    sampled = sum(approx_size(k, seen) + approx_size(v, seen) for k, v in islice(data.items(), 0, None, step))
+    return sys.getsizeof(data) + sampled * len(data) // len(range(0, len(data), step))
+
+
+class LRUCache:
+    """Small LRU cache with hit/miss accounting.
+
+    Not thread-safe; meant to be used from the event loop only.
+    """
+
+    def __init__(self, name: str, max_entries: int = 256, shrinkable: bool = True):
+        self.name = name
+        self.max_entries = max_entries
+        self.shrinkable = shrinkable  # May the memory governor evict entries under pressure
+        self._data: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        _caches.add(self)
+
+    def get(self, key, default=None) -> Any:
+        value = self._data.get(key, _MISSING)
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value) -> None:
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def pop(self, key, default=None) -> Any:
+        return self._data.pop(key, default)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def shrink(self, fraction: float) -> int:
+        """Evict the least recently used fraction of entries; returns how many"""
+        count = int(len(self._data) * fraction + 0.999)
+        for _ in range(count):
+            self._data.popitem(last=False)
+        return count
+
+    def __contains__(self, key) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "entries": len(self._data),
+            "approx_bytes": approx_mapping_size(self._data),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
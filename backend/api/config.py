@@ -9,7 +9,13 @@ class Settings(BaseSettings):
     # GitHub Models
     GITHUB_TOKEN: str = ""
     GITHUB_ORG: str = "imperialorg"
-    LLM_MODEL: str = "openai/gpt-4.1"
+    LLM_MODEL: str = "openai/gpt-4.1"  # Large tier: resume scoring/enhancement
+    LLM_MODEL_FAST: str = "openai/gpt-4.1-mini"  # Fast tier: answer evaluation, questions, quiz
+    LLM_TIMEOUT: float = 60.0
+    LLM_TIMEOUT_FAST: float = 20.0
+    LLM_ROUTES: str = ""  # Per-prompt tier overrides, e.g. "interview_evaluate=large,resume_rescore=fast"
+    LLM_ESCALATE: bool = True  # Retry invalid fast-tier output on the large tier
+    LLM_JSON_MODE: bool = True  # Ask for response_format=json_object on object-returning prompts
     
     # Supabase
     SUPABASE_URL: str = ""
@@ -26,6 +32,70 @@ class Settings(BaseSettings):
     N8N_WEBHOOK_URL: str = "http://localhost:5678/webhook"
     USE_N8N: bool = True  # Toggle to use n8n or direct GitHub Models
     
+    # Bulk resume ingestion
+    BULK_JOB_DIR: str = "/tmp/vidyamitra-bulk"  # Uploads + checkpoints for resumable jobs
+    BULK_MAX_UPLOAD_MB: int = 50
+    BULK_LLM_CONCURRENCY: int = 3
+    BULK_DB_BATCH_SIZE: int = 25
+    
+    # Server-side resume extraction (PDF/DOCX)
+    EXTRACT_WORKERS: int = 1  # Concurrent extractions (one process per file)
+    EXTRACT_MAX_FILE_MB: int = 5
+    EXTRACT_MAX_PAGES: int = 10
+    EXTRACT_MEMORY_MB: int = 384  # Address-space cap per worker process
+    EXTRACT_TIMEOUT: float = 30.0
+    
+    # Interview state (in-memory LRU, written through to interview_turns)
+    INTERVIEW_CACHE_ENTRIES: int = 256
+    
+    # Learning-plan progress (JSON Patch updates, coalesced writes)
+    PROGRESS_CACHE_ENTRIES: int = 512
+    
+    # Voice interview sessions (WebSocket)
+    VOICE_MAX_SESSIONS: int = 100
+    VOICE_IDLE_TIMEOUT: float = 300.0  # Seconds without messages before a session expires
+    VOICE_SPECULATE_AFTER: float = 0.6  # Pause in partial transcripts that starts a speculative evaluation
+    
+    # Semantic cache for quiz/question/learning-plan generation
+    SEMANTIC_CACHE: bool = True
+    SEMANTIC_CACHE_ENTRIES: int = 256  # Per function
+    LEARNING_MODULE_CACHE_ENTRIES: int = 1024  # Per-skill learning-plan modules (skill, role, time budget)
+    
+    # Job-market dataset (hot-reloaded when the file changes)
+    JOB_MARKET_DATA_FILE: str = "data/job_market.json"  # Relative to backend/api
+    JOB_MARKET_RELOAD_INTERVAL: float = 30.0  # Seconds between file checks; 0 disables
+    
+    # Public job-market endpoints (served pre-serialized with ETags)
+    MARKET_CACHE_MAX_AGE: int = 300  # Cache-Control max-age, seconds
+    
+    # Request tracing (Server-Timing header, JSON logs, optional OTLP export)
+    TRACING: bool = True
+    TRACE_LOG_MIN_MS: float = 1000.0  # Requests at least this slow are logged as JSON; 0 logs all, -1 none
+    TRACE_EXPORT_FILE: str = ""  # Append OTLP/JSON batches to this file
+    TRACE_OTLP_ENDPOINT: str = ""  # OTLP/HTTP JSON collector, e.g. http://localhost:4318/v1/traces
+    
+    # Prometheus metrics (GET /metrics)
+    METRICS_TOKEN: str = ""  # Required as "Authorization: Bearer <token>" when set
+    METRICS_DIR: str = ""  # Shared snapshot directory when running several workers
+    
+    # Event-loop watchdog (GET /api/admin/loop) - records where the loop is blocked
+    LOOP_WATCHDOG: bool = False
+    LOOP_BLOCK_THRESHOLD_MS: float = 100.0  # A loop stall at least this long captures the blocking stack
+    
+    # Memory governor - shrinks caches and holds back heavy requests above the watermark
+    MEMORY_GOVERNOR: bool = True
+    MEMORY_HIGH_WATERMARK_MB: int = 600  # RSS of the API process; the extraction worker has its own limit
+    MEMORY_LOW_WATERMARK_MB: int = 500  # Pressure ends (heavy requests admitted again) only below this RSS
+    MEMORY_CHECK_INTERVAL: float = 5.0  # Seconds between RSS checks (and between cache shrinks)
+    MEMORY_SHRINK_FRACTION: float = 0.5  # Share of each cache evicted per relief run
+    MEMORY_QUEUE_TIMEOUT: float = 10.0  # Seconds a heavy request waits for memory before a 503
+    MEMORY_QUEUE_MAX: int = 8  # Heavy requests allowed to wait at once; more are shed immediately
+    MEMORY_TRACEMALLOC_FRAMES: int = 0  # Start tracemalloc at boot with this many frames; 0 = off
+    HISTORY_MAX_ROWS: int = 100  # Rows returned by history lists (resumes, interviews, quizzes, ...)
+    
+    # Admin endpoints (/api/admin/*) - disabled while empty
+    ADMIN_TOKEN: str = ""
+    
     # App settings
     DEBUG: bool = False
     API_PREFIX: str = "/api"
@@ -1,8 +1,9 @@
 """Supabase client for VidyaMitra API"""
 
 import json
+import time
 from datetime import datetime, timezone
-from functools import lru_cache
+from functools import lru_cache, wraps
 from typing import Any
 
 try:
@@ -13,6 +14,8 @@ except ImportError:
     Client = None
 
 from config import settings
+import metrics
+from tracing import traced
 
 
 @lru_cache
@@ -43,10 +46,26 @@ def _now() -> str:
     return datetime.now(timezone.utc).isoformat()
 
 
+def _query(func):
+    """Trace a db function and record its latency (db_query_duration_seconds)"""
+    traced_func = traced()(func)
+    name = func.__name__
+
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await traced_func(*args, **kwargs)
+        finally:
+            metrics.DB_LATENCY.observe(time.perf_counter() - start, name)
+    return wrapper
+
+
 # ═══════════════════════════════════════════════════════════════
 # USER OPERATIONS
 # ═══════════════════════════════════════════════════════════════
 
+@_query
 async def get_user(clerk_id: str) -> dict | None:
     """Get user by clerk_id (from Clerk auth)"""
     client = _get_client()
@@ -60,6 +79,7 @@ async def get_user(clerk_id: str) -> dict | None:
         return None
 
 
+@_query
 async def upsert_user(clerk_id: str, email: str = None, full_name: str = None) -> dict | None:
     """Create or update user - matches Supabase schema"""
     client = _get_client()
@@ -90,6 +110,7 @@ async def upsert_user(clerk_id: str, email: str = None, full_name: str = None) -
         return None
 
 
+@_query
 async def ensure_user(clerk_id: str, email: str = None, full_name: str = None) -> str:
     """Ensure user exists, create if not. Returns clerk_id for use as user_id in other tables."""
     client = _get_client()
@@ -110,22 +131,53 @@ async def ensure_user(clerk_id: str, email: str = None, full_name: str = None) -
         return clerk_id
 
 
+@_query
+async def ensure_users(clerk_ids: list) -> None:
+    """Batch version of ensure_user - one select and one insert for many users"""
+    client = _get_client()
+    if not client or not clerk_ids:
+        return
+    try:
+        ids = list(dict.fromkeys(clerk_ids))
+        existing = client.table("users").select("clerk_id").in_("clerk_id", ids).execute()
+        known = {row["clerk_id"] for row in existing.data or []}
+        missing = [{"clerk_id": cid} for cid in ids if cid not in known]
+        if missing:
+            client.table("users").insert(missing).execute()
+    except Exception as e:
+        print(f"[DB] ensure_users error: {e}")
+
+
 # ═══════════════════════════════════════════════════════════════
 # RESUME OPERATIONS
 # ═══════════════════════════════════════════════════════════════
 
+@_query
 async def save_resume(user_id: str, file_url: str = None, resume_text: str = None, 
-                      target_role: str = None, analysis: dict = None) -> dict:
-    """Save resume analysis - matches Supabase schema"""
+                      target_role: str = None, analysis: dict = None,
+                      content_hash: str = None, prompt_version: str = None) -> dict:
+    """Save resume analysis - matches Supabase schema
+
+    When content_hash is given the text is stored once in resume_contents and
+    only referenced from the resumes row.
+    """
     client = _get_client()
     if not client:
         return {"id": "mock-no-db"}
     try:
+        if content_hash and resume_text:
+            client.table("resume_contents").upsert(
+                {"content_hash": content_hash, "resume_text": resume_text},
+                on_conflict="content_hash", ignore_duplicates=True
+            ).execute()
+            resume_text = None
         data = {
             "user_id": user_id,
             "file_url": file_url,
             "resume_text": resume_text,
             "target_role": target_role,
+            "content_hash": content_hash,
+            "prompt_version": prompt_version,
             "analysis_json": analysis,
             "analysis_score": analysis.get("score", 0) if analysis else None,
             "analysis_grade": analysis.get("grade") if analysis else None,
@@ -139,27 +191,128 @@ async def save_resume(user_id: str, file_url: str = None, resume_text: str = Non
         return {"id": "mock-no-db"}
 
 
-async def get_resumes(user_id: str) -> list:
-    """Get all resumes for a user"""
+@_query
+async def save_resumes_batch(rows: list) -> list:
+    """Insert many analyzed resumes in two round trips.
+
+    Each row: {user_id, resume_text, target_role, analysis, content_hash, prompt_version}.
+    Returns the inserted ids in row order ("mock-no-db" when unavailable).
+    """
+    client = _get_client()
+    if not client or not rows:
+        return ["mock-no-db"] * len(rows)
+    try:
+        contents = {r["content_hash"]: r["resume_text"] for r in rows if r.get("content_hash")}
+        if contents:
+            client.table("resume_contents").upsert(
+                [{"content_hash": h, "resume_text": t} for h, t in contents.items()],
+                on_conflict="content_hash", ignore_duplicates=True
+            ).execute()
+        data = []
+        for r in rows:
+            analysis = r.get("analysis") or {}
+            item = {
+                "user_id": r["user_id"],
+                "target_role": r.get("target_role") or "",
+                "content_hash": r.get("content_hash"),
+                "prompt_version": r.get("prompt_version"),
+                "analysis_json": analysis,
+                "analysis_score": analysis.get("score", 0),
+                "analysis_grade": analysis.get("grade"),
+            }
+            if not r.get("content_hash"):
+                item["resume_text"] = r.get("resume_text")
+            data.append({k: v for k, v in item.items() if v is not None})
+        result = client.table("resumes").insert(data).execute()
+        return [row["id"] for row in result.data or []] or ["mock-no-db"] * len(rows)
+    except Exception as e:
+        print(f"[DB] save_resumes_batch error: {e}")
+        return ["mock-no-db"] * len(rows)
+
+
+def _like_literal(value: str) -> str:
+    """Escape LIKE wildcards so ilike() matches value literally (case-insensitively)"""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _match_role(query, target_role: str):
+    """Filter on target_role, case-insensitively"""
+    role = target_role or ""
+    # PostgREST treats * as a wildcard in like patterns, so such roles are matched exactly
+    return query.eq("target_role", role) if "*" in role else query.ilike("target_role", _like_literal(role))
+
+
+@_query
+async def find_resume_analysis(content_hash: str, target_role: str, prompt_version: str) -> dict | None:
+    """Find a stored analysis for identical resume content, role (case-insensitive) and prompt version"""
+    client = _get_client()
+    if not client:
+        return None
+    try:
+        query = _match_role(client.table("resumes").select("analysis_json").eq("content_hash", content_hash), target_role)
+        result = query.eq(
+            "prompt_version", prompt_version
+        ).not_.is_("analysis_json", "null").order("created_at", desc=True).limit(1).execute()
+        return result.data[0]["analysis_json"] if result.data else None
+    except Exception as e:
+        print(f"[DB] find_resume_analysis error: {e}")
+        return None
+
+
+# Resume rows reference deduplicated text through content_hash
+_RESUME_SELECT = "*, resume_contents(resume_text)"
+
+
+def _with_resume_text(row: dict) -> dict:
+    """Flatten the joined resume_contents text back into resume_text"""
+    content = row.pop("resume_contents", None)
+    if content and not row.get("resume_text"):
+        row["resume_text"] = content.get("resume_text")
+    return row
+
+
+@_query
+async def get_resumes(user_id: str, limit: int = None) -> list:
+    """Get resumes for a user, newest first (at most HISTORY_MAX_ROWS unless limit is set)"""
     client = _get_client()
     if not client:
         return []
     try:
-        result = client.table("resumes").select("*").eq("user_id", user_id).order("created_at", desc=True).execute()
-        return result.data or []
+        result = client.table("resumes").select(_RESUME_SELECT).eq("user_id", user_id).order(
+            "created_at", desc=True
+        ).limit(limit or settings.HISTORY_MAX_ROWS).execute()
+        return [_with_resume_text(r) for r in result.data or []]
     except Exception as e:
         print(f"[DB] get_resumes error: {e}")
         return []
 
 
+@_query
+async def get_latest_resume(user_id: str, target_role: str, prompt_version: str) -> dict | None:
+    """The user's newest analyzed resume for a role (case-insensitive) and prompt version"""
+    client = _get_client()
+    if not client:
+        return None
+    try:
+        query = _match_role(client.table("resumes").select(_RESUME_SELECT).eq("user_id", user_id), target_role)
+        result = query.eq(
+            "prompt_version", prompt_version
+        ).not_.is_("analysis_json", "null").order("created_at", desc=True).limit(1).execute()
+        return _with_resume_text(result.data[0]) if result.data else None
+    except Exception as e:
+        print(f"[DB] get_latest_resume error: {e}")
+        return None
+
+
+@_query
 async def get_resume(resume_id: str) -> dict | None:
     """Get a single resume by ID"""
     client = _get_client()
     if not client:
         return None
     try:
-        result = client.table("resumes").select("*").eq("id", resume_id).single().execute()
-        return result.data
+        result = client.table("resumes").select(_RESUME_SELECT).eq("id", resume_id).single().execute()
+        return _with_resume_text(result.data) if result.data else None
     except Exception as e:
         print(f"[DB] get_resume error: {e}")
         return None
@@ -169,6 +322,7 @@ async def get_resume(resume_id: str) -> dict | None:
 # INTERVIEW OPERATIONS
 # ═══════════════════════════════════════════════════════════════
 
+@_query
 async def save_interview(user_id: str, domain: str, role: str, difficulty: str = "medium") -> dict:
     """Save a new interview session - matches Supabase schema"""
     client = _get_client()
@@ -189,13 +343,16 @@ async def save_interview(user_id: str, domain: str, role: str, difficulty: str =
         return {"id": "mock-no-db"}
 
 
-async def update_interview(interview_id: str, status: str = "completed") -> dict:
-    """Update interview status - matches Supabase schema"""
+@_query
+async def update_interview(interview_id: str, status: str = "completed", final_score: int = None) -> dict:
+    """Update interview status (and final score) - matches Supabase schema"""
     client = _get_client()
     if not client:
         return {"id": interview_id}
     try:
         data = {"status": status}
+        if final_score is not None:
+            data["final_score"] = final_score
         result = client.table("interviews").update(data).eq("id", interview_id).execute()
         return result.data[0] if result.data else {"id": interview_id}
     except Exception as e:
@@ -203,19 +360,23 @@ async def update_interview(interview_id: str, status: str = "completed") -> dict
         return {"id": interview_id}
 
 
-async def get_interviews(user_id: str) -> list:
-    """Get all interviews for a user"""
+@_query
+async def get_interviews(user_id: str, limit: int = None) -> list:
+    """Get a user's interviews, newest first (at most HISTORY_MAX_ROWS unless limit is set)"""
     client = _get_client()
     if not client:
         return []
     try:
-        result = client.table("interviews").select("*").eq("user_id", user_id).order("created_at", desc=True).execute()
+        result = client.table("interviews").select("*").eq("user_id", user_id).order(
+            "created_at", desc=True
+        ).limit(limit or settings.HISTORY_MAX_ROWS).execute()
         return result.data or []
     except Exception as e:
         print(f"[DB] get_interviews error: {e}")
         return []
 
 
+@_query
 async def get_interview(interview_id: str) -> dict | None:
     """Get a single interview by ID"""
     client = _get_client()
@@ -229,10 +390,72 @@ async def get_interview(interview_id: str) -> dict | None:
         return None
 
 
+@_query
+async def save_interview_turns(interview_id: str, questions: list) -> bool:
+    """Insert one interview_turns row per question (single round trip)"""
+    client = _get_client()
+    if not client or not questions:
+        return False
+    try:
+        rows = [
+            {
+                "interview_id": interview_id,
+                "question_index": i,
+                "question": q.get("text") or q.get("question") or "",
+                "question_json": q,
+            }
+            for i, q in enumerate(questions)
+        ]
+        client.table("interview_turns").insert(rows).execute()
+        return True
+    except Exception as e:
+        print(f"[DB] save_interview_turns error: {e}")
+        return False
+
+
+@_query
+async def update_interview_turn(interview_id: str, question_index: int, answer: str, evaluation: dict) -> bool:
+    """Store the answer and evaluation of one question"""
+    client = _get_client()
+    if not client:
+        return False
+    try:
+        data = {
+            "answer": answer,
+            "evaluation_json": evaluation,
+            "score": evaluation.get("score"),
+            "answered_at": _now(),
+        }
+        client.table("interview_turns").update(data).eq("interview_id", interview_id).eq(
+            "question_index", question_index
+        ).execute()
+        return True
+    except Exception as e:
+        print(f"[DB] update_interview_turn error: {e}")
+        return False
+
+
+@_query
+async def get_interview_turns(interview_id: str) -> list:
+    """All turns of an interview in question order"""
+    client = _get_client()
+    if not client:
+        return []
+    try:
+        result = client.table("interview_turns").select(
+            "question_index, question, question_json, answer, evaluation_json, score, answered_at"
+        ).eq("interview_id", interview_id).order("question_index").execute()
+        return result.data or []
+    except Exception as e:
+        print(f"[DB] get_interview_turns error: {e}")
+        return []
+
+
 # ═══════════════════════════════════════════════════════════════
 # LEARNING PLAN OPERATIONS
 # ═══════════════════════════════════════════════════════════════
 
+@_query
 async def save_learning_plan(user_id: str, target_role: str, plan: dict) -> dict:
     """Save a new learning plan - matches Supabase schema"""
     client = _get_client()
@@ -251,27 +474,47 @@ async def save_learning_plan(user_id: str, target_role: str, plan: dict) -> dict
         return {"id": "mock-no-db"}
 
 
-async def update_learning_progress(plan_id: str, plan_json: dict) -> dict:
-    """Update learning plan - matches Supabase schema"""
+@_query
+async def get_learning_progress(plan_id: str) -> dict | None:
+    """Owner, progress and version of a learning plan (plan_json is not fetched)"""
+    client = _get_client()
+    if not client:
+        return None
+    try:
+        result = client.table("learning_plans").select("id, user_id, progress, version").eq("id", plan_id).execute()
+        return result.data[0] if result.data else None
+    except Exception as e:
+        print(f"[DB] get_learning_progress error: {e}")
+        return None
+
+
+@_query
+async def update_learning_progress(plan_id: str, progress: dict, version: int, expected_version: int) -> bool:
+    """Write progress only if the stored version is still expected_version (optimistic concurrency)"""
     client = _get_client()
     if not client:
-        return {"id": plan_id}
+        return False
     try:
-        data = {"plan_json": plan_json}
-        result = client.table("learning_plans").update(data).eq("id", plan_id).execute()
-        return result.data[0] if result.data else {"id": plan_id}
+        data = {"progress": progress, "version": version}
+        result = client.table("learning_plans").update(data).eq("id", plan_id).eq(
+            "version", expected_version
+        ).execute()
+        return bool(result.data)
     except Exception as e:
         print(f"[DB] update_learning_progress error: {e}")
-        return {"id": plan_id}
+        return False
 
 
-async def get_learning_plans(user_id: str) -> list:
-    """Get all learning plans for a user"""
+@_query
+async def get_learning_plans(user_id: str, limit: int = None) -> list:
+    """Get a user's learning plans, newest first (at most HISTORY_MAX_ROWS unless limit is set)"""
     client = _get_client()
     if not client:
         return []
     try:
-        result = client.table("learning_plans").select("*").eq("user_id", user_id).order("created_at", desc=True).execute()
+        result = client.table("learning_plans").select("*").eq("user_id", user_id).order(
+            "created_at", desc=True
+        ).limit(limit or settings.HISTORY_MAX_ROWS).execute()
         return result.data or []
     except Exception as e:
         print(f"[DB] get_learning_plans error: {e}")
@@ -282,6 +525,7 @@ async def get_learning_plans(user_id: str) -> list:
 # QUIZ OPERATIONS
 # ═══════════════════════════════════════════════════════════════
 
+@_query
 async def save_quiz(user_id: str, skill: str, difficulty: str, questions: list) -> dict:
     """Save quiz - matches Supabase schema"""
     client = _get_client()
@@ -301,13 +545,16 @@ async def save_quiz(user_id: str, skill: str, difficulty: str, questions: list)
         return {"id": "mock-no-db"}
 
 
-async def get_quizzes(user_id: str) -> list:
-    """Get all quizzes for a user"""
+@_query
+async def get_quizzes(user_id: str, limit: int = None) -> list:
+    """Get a user's quizzes, newest first (at most HISTORY_MAX_ROWS unless limit is set)"""
     client = _get_client()
     if not client:
         return []
     try:
-        result = client.table("quizzes").select("*").eq("user_id", user_id).order("created_at", desc=True).execute()
+        result = client.table("quizzes").select("*").eq("user_id", user_id).order(
+            "created_at", desc=True
+        ).limit(limit or settings.HISTORY_MAX_ROWS).execute()
         return result.data or []
     except Exception as e:
         print(f"[DB] get_quizzes error: {e}")
@@ -318,6 +565,7 @@ async def get_quizzes(user_id: str) -> list:
 # JOB SEARCH OPERATIONS
 # ═══════════════════════════════════════════════════════════════
 
+@_query
 async def save_job_search(user_id: str, skills: list, role: str, results: list) -> dict:
     """Save job recommendation results to job_recommendations table"""
     client = _get_client()
@@ -344,13 +592,16 @@ async def save_job_search(user_id: str, skills: list, role: str, results: list)
         return {"id": "mock-no-db"}
 
 
-async def get_job_searches(user_id: str) -> list:
-    """Get job recommendation history for a user"""
+@_query
+async def get_job_searches(user_id: str, limit: int = None) -> list:
+    """Get job recommendation history for a user, newest first (at most HISTORY_MAX_ROWS unless limit is set)"""
     client = _get_client()
     if not client:
         return []
     try:
-        result = client.table("job_recommendations").select("*").eq("user_id", user_id).order("created_at", desc=True).execute()
+        result = client.table("job_recommendations").select("*").eq("user_id", user_id).order(
+            "created_at", desc=True
+        ).limit(limit or settings.HISTORY_MAX_ROWS).execute()
         return result.data or []
     except Exception as e:
         print(f"[DB] get_job_searches error: {e}")
@@ -361,6 +612,7 @@ async def get_job_searches(user_id: str) -> list:
 # DASHBOARD / STATS OPERATIONS
 # ═══════════════════════════════════════════════════════════════
 
+@_query
 async def get_user_stats(user_id: str) -> dict:
     """Get aggregated stats for user dashboard - matches Supabase schema"""
     client = _get_client()
@@ -377,7 +629,9 @@ async def get_user_stats(user_id: str) -> dict:
         # Get counts from each table
         quizzes = client.table("quizzes").select("id", count="exact").eq("user_id", user_id).execute()
         interviews = client.table("interviews").select("id", count="exact").eq("user_id", user_id).eq("status", "completed").execute()
-        resumes = client.table("resumes").select("id, analysis_score", count="exact").eq("user_id", user_id).execute()
+        resumes = client.table("resumes").select("id, analysis_score", count="exact").eq("user_id", user_id).order(
+            "analysis_score", desc=True, nullsfirst=False
+        ).limit(1).execute()
         learning = client.table("learning_plans").select("id", count="exact").eq("user_id", user_id).execute()
 
         # Calculate profile score from latest resume (analysis_score column)
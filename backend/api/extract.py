@@ -0,0 +1,240 @@
+"""Server-side resume text extraction (PDF/DOCX) in a worker process
+
+Each file is parsed in its own short-lived process (at most EXTRACT_WORKERS
+at once) so a slow or hostile file never blocks the event loop, and one that
+times out or blows its address-space limit is killed without touching
+anyone else's extraction. Uploads are streamed to a temp file and results
+are cached by file hash.
+"""
+
+import asyncio
+import hashlib
+import importlib.util
+import io
+import multiprocessing
+import os
+import tempfile
+import zipfile
+from typing import AsyncIterator
+from xml.etree import ElementTree
+
+from cache import LRUCache
+from config import settings
+
+PDF_AVAILABLE = importlib.util.find_spec("pypdf") is not None
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+MAX_DOCX_XML_BYTES = 10 * 1024 * 1024  # Uncompressed document.xml cap (zip-bomb guard)
+
+_slots = asyncio.Semaphore(settings.EXTRACT_WORKERS)
+_running: set = set()  # Live worker processes, killed on shutdown
+_context = None
+_cache = LRUCache("extraction", max_entries=128)
+
+
+class ExtractionError(ValueError):
+    pass
+
+
+class UnsupportedFormat(ExtractionError):
+    pass
+
+
+# ═══════════════════════════════════════════════════════════════
+# WORKER SIDE (runs in the child process)
+# ═══════════════════════════════════════════════════════════════
+
+def _limit_memory(memory_mb: int) -> None:
+    """Cap the worker's address space"""
+    try:
+        import resource
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ImportError, ValueError, OSError):
+        pass  # Not supported on this platform
+
+
+def _extract_pdf(data, max_pages: int) -> dict:
+    from pypdf import PdfReader
+    reader = PdfReader(data)
+    pages = len(reader.pages)
+    if pages > max_pages:
+        raise ExtractionError(f"PDF has {pages} pages (max {max_pages})")
+    text = "\n".join(page.extract_text() or "" for page in reader.pages)
+    return {"text": text, "pages": pages}
+
+
+def _extract_docx(data) -> dict:
+    with zipfile.ZipFile(data) as zf:
+        try:
+            info = zf.getinfo("word/document.xml")
+        except KeyError:
+            raise ExtractionError("Not a DOCX document")
+        if info.file_size > MAX_DOCX_XML_BYTES:
+            raise ExtractionError("DOCX document too large")
+        xml = zf.read(info)
+
+    paragraphs = []
+    for para in ElementTree.fromstring(xml).iter(f"{_W}p"):
+        parts = []
+        for node in para.iter():
+            if node.tag == f"{_W}t" and node.text:
+                parts.append(node.text)
+            elif node.tag == f"{_W}tab":
+                parts.append("\t")
+            elif node.tag in (f"{_W}br", f"{_W}cr"):
+                parts.append("\n")
+        paragraphs.append("".join(parts))
+    return {"text": "\n".join(paragraphs), "pages": None}
+
+
+def _extract_worker(source, kind: str, max_pages: int) -> dict:
+    """Extract text from a file path or raw bytes"""
+    data = io.BytesIO(source) if isinstance(source, bytes) else source
+    try:
+        if kind == "pdf":
+            return _extract_pdf(data, max_pages)
+        return _extract_docx(data)
+    except ExtractionError:
+        raise
+    except MemoryError:
+        raise ExtractionError("File needs too much memory to parse")
+    except Exception as e:
+        raise ExtractionError(f"Could not read {kind.upper()}: {e}")
+
+
+def _worker_main(conn, source, kind: str, max_pages: int, memory_mb: int) -> None:
+    """Worker process entry point: extract one file and send ("ok", result) or ("error", message)"""
+    _limit_memory(memory_mb)
+    try:
+        reply = ("ok", _extract_worker(source, kind, max_pages))
+    except ExtractionError as e:
+        reply = ("error", str(e))
+    conn.send(reply)
+    conn.close()
+
+
+# ═══════════════════════════════════════════════════════════════
+# EVENT-LOOP SIDE
+# ═══════════════════════════════════════════════════════════════
+
+def _get_context():
+    """forkserver (preloaded with this module, so a worker starts in milliseconds) where available"""
+    global _context
+    if _context is None:
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            _context = multiprocessing.get_context("forkserver")
+            _context.set_forkserver_preload([__name__])
+        else:
+            _context = multiprocessing.get_context("spawn")
+    return _context
+
+
+def shutdown() -> None:
+    """Kill running worker processes (called on app shutdown)"""
+    for proc in list(_running):
+        proc.kill()
+    _running.clear()
+
+
+def detect_kind(head: bytes) -> str:
+    """Identify PDF/DOCX from the first bytes of a file"""
+    if head.startswith(b"%PDF"):
+        return "pdf"
+    if head.startswith(b"PK\x03\x04"):
+        return "docx"
+    raise UnsupportedFormat("Only PDF and DOCX files are supported")
+
+
+async def _run(source, kind: str) -> dict:
+    if kind == "pdf" and not PDF_AVAILABLE:
+        raise UnsupportedFormat("PDF support not installed (pip install pypdf)")
+    async with _slots:
+        ctx = _get_context()
+        receiver, sender = ctx.Pipe(duplex=False)
+        proc = ctx.Process(
+            target=_worker_main,
+            args=(sender, source, kind, settings.EXTRACT_MAX_PAGES, settings.EXTRACT_MEMORY_MB),
+            daemon=True
+        )
+        try:
+            await asyncio.to_thread(proc.start)
+            _running.add(proc)
+            sender.close()  # The child holds the only write end, so its death ends recv() with EOFError
+            status, value = await asyncio.wait_for(asyncio.to_thread(receiver.recv), settings.EXTRACT_TIMEOUT)
+        except EOFError:
+            # The worker died without replying (memory cap / OOM)
+            raise ExtractionError("File could not be parsed within resource limits")
+        except asyncio.TimeoutError:
+            raise ExtractionError("Extraction timed out")
+        finally:
+            sender.close()
+            if proc.pid is not None:
+                # Only this file's worker is killed; a pending recv() thread then ends with EOFError
+                if proc.is_alive():
+                    proc.kill()
+                _running.discard(proc)
+                await asyncio.to_thread(proc.join, 5)
+            receiver.close()
+    if status == "error":
+        raise ExtractionError(value)
+    return value
+
+
+async def save_upload(chunks: AsyncIterator[bytes], max_bytes: int) -> tuple[str, str]:
+    """Stream an upload to a temp file while hashing it. Returns (path, sha256)."""
+    digest = hashlib.sha256()
+    size = 0
+    fd, path = tempfile.mkstemp(prefix="vm-upload-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ExtractionError(f"File exceeds {max_bytes // (1024 * 1024)}MB")
+                digest.update(chunk)
+                f.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    if not size:
+        os.remove(path)
+        raise ExtractionError("Empty upload")
+    return path, digest.hexdigest()
+
+
+async def extract_upload(chunks: AsyncIterator[bytes]) -> dict:
+    """Extract text from a streamed PDF/DOCX upload.
+
+    Returns {"resume_text", "format", "pages", "sha256", "cached"}.
+    """
+    path, sha = await save_upload(chunks, settings.EXTRACT_MAX_FILE_MB * 1024 * 1024)
+    try:
+        cached = _cache.get(sha)
+        if cached:
+            return {**cached, "sha256": sha, "cached": True}
+        with open(path, "rb") as f:
+            kind = detect_kind(f.read(8))
+        result = await _run(path, kind)
+    finally:
+        os.remove(path)
+
+    entry = {"resume_text": result["text"], "format": kind, "pages": result["pages"]}
+    _cache.set(sha, entry)
+    return {**entry, "sha256": sha, "cached": False}
+
+
+async def extract_bytes(data: bytes) -> str:
+    """Extract text from an in-memory PDF/DOCX (e.g. a bulk ZIP entry)"""
+    sha = hashlib.sha256(data).hexdigest()
+    cached = _cache.get(sha)
+    if cached:
+        return cached["resume_text"]
+    kind = detect_kind(data[:8])
+    result = await _run(data, kind)
+    _cache.set(sha, {"resume_text": result["text"], "format": kind, "pages": result["pages"]})
+    return result["text"]
+
+
+def get_stats() -> dict:
+    return {"pdf_available": PDF_AVAILABLE, "cache": _cache.stats()}
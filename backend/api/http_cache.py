@@ -0,0 +1,125 @@
+"""Pre-serialized JSON responses with ETags and pre-compressed bodies
+
+For read-only endpoints whose payload only changes with a dataset version:
+the payload is serialized once, gzip (and brotli, if installed) variants are
+built up front, and repeat requests are answered from bytes or with a 304.
+FastPathMiddleware serves such endpoints before FastAPI's router runs.
+"""
+
+import gzip
+import hashlib
+import importlib.util
+import json
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+
+from cache import LRUCache
+
+BROTLI_AVAILABLE = importlib.util.find_spec("brotli") is not None
+MIN_COMPRESS_BYTES = 512  # Smaller bodies are sent as-is
+
+
+class PreparedResponse:
+    """Serialized body plus compressed variants and their strong ETags"""
+
+    __slots__ = ("variants", "etags")
+
+    def __init__(self, payload):
+        # Same encoding as FastAPI's JSONResponse
+        body = json.dumps(payload, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+        tag = hashlib.sha256(body).hexdigest()[:32]
+        self.variants = {"identity": body}
+        if len(body) >= MIN_COMPRESS_BYTES:
+            self.variants["gzip"] = gzip.compress(body, compresslevel=9, mtime=0)
+            if BROTLI_AVAILABLE:
+                import brotli
+                self.variants["br"] = brotli.compress(body)
+        # Each encoding is a different representation, so it gets its own strong ETag
+        self.etags = {enc: f'"{tag}"' if enc == "identity" else f'"{tag}-{enc}"' for enc in self.variants}
+
+    def encoding_for(self, accept_encoding: str) -> str:
+        accepted = {part.split(";")[0].strip().lower() for part in accept_encoding.split(",")}
+        for enc in ("br", "gzip"):
+            if enc in self.variants and enc in accepted:
+                return enc
+        return "identity"
+
+    def not_modified(self, if_none_match: str) -> bool:
+        if not if_none_match:
+            return False
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or not tags.isdisjoint(self.etags.values())
+
+
+def respond(request: Request, prepared: PreparedResponse, max_age: int) -> Response:
+    """Serve a prepared payload: 304 on a matching If-None-Match, else the best encoding"""
+    encoding = prepared.encoding_for(request.headers.get("accept-encoding", ""))
+    headers = {
+        "ETag": prepared.etags[encoding],
+        "Cache-Control": f"public, max-age={max_age}",
+        "Vary": "Accept-Encoding",
+    }
+    if prepared.not_modified(request.headers.get("if-none-match", "")):
+        return Response(status_code=304, headers=headers)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(prepared.variants[encoding], media_type="application/json", headers=headers)
+
+
+class ResponseCache:
+    """Prepared responses keyed by request parameters, dropped when the data version changes"""
+
+    def __init__(self, name: str, max_entries: int = 64):
+        self._cache = LRUCache(name, max_entries=max_entries)
+        self._version = None
+
+    def get(self, key, version, build) -> PreparedResponse:
+        if version != self._version:
+            self._cache.clear()
+            self._version = version
+        prepared = self._cache.get(key)
+        if prepared is None:
+            prepared = PreparedResponse(build())
+            self._cache.set(key, prepared)
+        return prepared
+
+    def stats(self) -> dict:
+        return {**self._cache.stats(), "version": self._version}
+
+
+class FastPathMiddleware:
+    """Answer registered GET paths directly, skipping route matching.
+
+    routes maps a path (relative to prefix) to an async handler taking the
+    Request; a path ending in "/" matches one more path segment. The same
+    handlers stay registered as normal routes (docs, fallback).
+    """
+
+    def __init__(self, app, prefix: str, routes: dict):
+        self.app = app
+        self.exact = {prefix + path: handler for path, handler in routes.items() if not path.endswith("/")}
+        self.prefixes = [(prefix + path, handler) for path, handler in routes.items() if path.endswith("/")]
+        self.templates = {
+            handler: prefix + (path + "{value}" if path.endswith("/") else path) for path, handler in routes.items()
+        }
+
+    def _handler(self, path: str):
+        handler = self.exact.get(path)
+        if handler is None:
+            for prefix, candidate in self.prefixes:
+                tail = path[len(prefix):]
+                if path.startswith(prefix) and tail and "/" not in tail:
+                    return candidate
+        return handler
+
+    async def __call__(self, scope, receive, send):
+        handler = self._handler(scope["path"]) if scope["type"] == "http" and scope["method"] == "GET" else None
+        if handler is None:
+            await self.app(scope, receive, send)
+            return
+        scope["fast_path"] = self.templates[handler]  # Route label for metrics
+        response = await handler(Request(scope, receive))
+        if not isinstance(response, Response):
+            response = JSONResponse(response)
+        await response(scope, receive, send)
@@ -0,0 +1,129 @@
+"""Interview session store - questions, answers and scores kept server-side
+
+An in-memory LRU of interview state, written through to the interview_turns
+table. Questions are recorded when an interview starts and evaluations as
+they happen; a running score sum makes completion O(1), and history views
+are served from stored transcripts without LLM calls. Interviews not in
+memory are loaded back from the database on first access.
+"""
+
+import uuid
+
+from cache import LRUCache
+from config import settings
+import db
+
+NO_DB_ID = "mock-no-db"  # What db.save_interview returns without a database
+
+
+class InterviewState:
+    __slots__ = ("interview_id", "user_id", "info", "questions", "answers", "score_sum", "answered", "status")
+
+    def __init__(self, interview_id: str, user_id: str, questions: list, info: dict = None):
+        self.interview_id = interview_id
+        self.user_id = user_id
+        self.info = info or {}  # domain, role, created_at ... from the interviews row
+        self.questions = questions
+        self.answers: dict[int, dict] = {}  # question index -> {"answer", "evaluation"}
+        self.score_sum = 0
+        self.answered = 0
+        self.status = self.info.get("status", "in_progress")
+
+    def question(self, index: int) -> dict | None:
+        return self.questions[index] if 0 <= index < len(self.questions) else None
+
+    def final_score(self) -> int:
+        return self.score_sum // self.answered if self.answered else 0
+
+    def _apply(self, index: int, answer: str, evaluation: dict) -> None:
+        previous = self.answers.get(index)
+        if previous:
+            self.score_sum -= _score(previous["evaluation"])
+            self.answered -= 1
+        self.answers[index] = {"answer": answer, "evaluation": evaluation}
+        self.score_sum += _score(evaluation)
+        self.answered += 1
+
+    def transcript(self) -> list[dict]:
+        return [
+            {
+                "index": i,
+                "question": question,
+                "answer": self.answers.get(i, {}).get("answer"),
+                "evaluation": self.answers.get(i, {}).get("evaluation"),
+            }
+            for i, question in enumerate(self.questions)
+        ]
+
+    def summary(self) -> dict:
+        return {
+            **self.info,
+            "id": self.interview_id,
+            "status": self.status,
+            "final_score": self.final_score() if self.answered else self.info.get("final_score"),
+            "answered": self.answered,
+            "total": len(self.questions),
+        }
+
+
+def _score(evaluation: dict) -> int:
+    try:
+        return int(evaluation.get("score", 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+_states = LRUCache("interviews", max_entries=settings.INTERVIEW_CACHE_ENTRIES)
+
+
+async def start(user_id: str, interview_id: str | None, questions: list, **info) -> InterviewState:
+    """Register a new interview's questions (one batched insert)"""
+    if not interview_id or interview_id == NO_DB_ID:
+        interview_id = f"local-{uuid.uuid4().hex}"  # Memory only - no database configured
+    else:
+        await db.save_interview_turns(interview_id, questions)
+    state = InterviewState(interview_id, user_id, list(questions), info)
+    _states.set(interview_id, state)
+    return state
+
+
+async def get(interview_id: str, user_id: str) -> InterviewState | None:
+    """State of one of the user's interviews, loaded from the database if not cached"""
+    state = _states.get(interview_id)
+    if state is None and not interview_id.startswith("local-"):
+        row = await db.get_interview(interview_id)
+        if row:
+            turns = await db.get_interview_turns(interview_id)
+            state = InterviewState(interview_id, row.get("user_id"), [t.get("question_json") or {"text": t["question"]} for t in turns], row)
+            for t in turns:
+                if t.get("evaluation_json") is not None:
+                    state._apply(t["question_index"], t.get("answer"), t["evaluation_json"])
+            _states.set(interview_id, state)
+    if state is None or state.user_id != user_id:
+        return None
+    return state
+
+
+def is_known(interview_id: str) -> bool:
+    """True if the interview is in memory, whoever owns it"""
+    return interview_id in _states
+
+
+async def record(state: InterviewState, index: int, answer: str, evaluation: dict) -> None:
+    """Store an evaluated answer (memory + database)"""
+    state._apply(index, answer, evaluation)
+    if not state.interview_id.startswith("local-"):
+        await db.update_interview_turn(state.interview_id, index, answer, evaluation)
+
+
+async def complete(state: InterviewState) -> int:
+    """Mark completed; the final score comes from the stored evaluations"""
+    state.status = "completed"
+    score = state.final_score()
+    if not state.interview_id.startswith("local-"):
+        await db.update_interview(state.interview_id, status="completed", final_score=score)
+    return score
+
+
+def get_stats() -> dict:
+    return _states.stats()
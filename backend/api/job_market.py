@@ -1,5 +1,8 @@
 """Job Market Data - 2025-2030 Research-Based Insights
 
+The dataset is loaded from a versioned JSON file (settings.JOB_MARKET_DATA_FILE)
+and can be replaced at runtime; see the DATASET MANAGER section.
+
 Data sourced from:
 - World Economic Forum Future of Jobs Report 2025
 - Bureau of Labor Statistics
@@ -7,250 +10,506 @@ Data sourced from:
 - India Employment Forum
 """
 
+import asyncio
+import bisect
+import hashlib
+import importlib.util
+import inspect
+import json
+import os
+import re
+from datetime import datetime, timezone
+from functools import lru_cache
+
+from config import settings
+from skills import PhraseMatcher, expand_skills, skill_key, tokenize
+
+# The dataset itself lives in data/job_market.json (see DATASET MANAGER below)
+
+
+# Skills needed for common roles (role key is matched as a phrase in the target role)
+ROLE_SKILLS = {
+    "software engineer": ["python", "javascript", "sql", "git", "api development", "cloud computing"],
+    "data scientist": ["python", "sql", "machine learning", "data analytics", "statistics", "tensorflow"],
+    "ml engineer": ["python", "tensorflow", "pytorch", "mlops", "cloud computing", "docker"],
+    "devops engineer": ["kubernetes", "docker", "ci/cd", "aws", "terraform", "linux"],
+    "cybersecurity": ["security", "networking", "linux", "python", "compliance", "incident response"],
+    "cloud architect": ["aws", "azure", "gcp", "kubernetes", "networking", "security"],
+    "full stack": ["javascript", "react", "node.js", "python", "sql", "api development"],
+}
+
+
+# Role catalogue for local recommendations: title -> skills (+ optional market
+# fields). Growth/demand/salary come from fastest_growing_global when the
+# title is listed there; extra roles can carry their own or go without.
+ROLE_CATALOGUE = {
+    "Big Data Specialist": {"skills": ["python", "sql", "big data", "data engineering", "data analytics", "cloud computing"]},
+    "AI/ML Engineer": {"skills": ["python", "machine learning", "tensorflow", "pytorch", "mlops", "docker"]},
+    "FinTech Engineer": {"skills": ["java", "python", "sql", "api development", "security", "cloud computing"]},
+    "Cybersecurity Specialist": {"skills": ["security", "networking", "linux", "python", "compliance", "incident response"]},
+    "Cloud Architect": {"skills": ["aws", "azure", "gcp", "kubernetes", "networking", "security"]},
+    "Renewable Energy Engineer": {"skills": ["electrical engineering", "energy systems", "autocad", "project management", "data analytics"]},
+    "DevOps Engineer": {"skills": ["kubernetes", "docker", "ci/cd", "aws", "terraform", "linux"]},
+    "Full Stack Developer": {"skills": ["javascript", "react", "node.js", "python", "sql", "api development"]},
+    "Healthcare Professional": {"skills": ["patient care", "clinical knowledge", "communication", "health informatics"]},
+    "UX/UI Designer": {"skills": ["ux design", "figma", "user research", "html", "css", "communication"]},
+    # Roles outside the growth table (growth: BLS projections 2023-2033)
+    "Data Scientist": {"skills": ["python", "sql", "machine learning", "data analytics", "statistics", "tensorflow"],
+                       "growth": "36%", "demand": "very_high"},
+    "Software Engineer": {"skills": ["python", "javascript", "sql", "git", "api development", "cloud computing"],
+                          "growth": "17%", "demand": "high"},
+    "Backend Developer": {"skills": ["python", "sql", "api development", "docker", "postgresql", "git"]},
+    "Frontend Developer": {"skills": ["javascript", "typescript", "react", "html", "css", "git"]},
+    "Data Analyst": {"skills": ["sql", "excel", "data analytics", "statistics", "python", "tableau"]},
+    "Data Engineer": {"skills": ["python", "sql", "data engineering", "big data", "cloud computing", "airflow"]},
+    "Mobile Developer": {"skills": ["kotlin", "swift", "javascript", "react", "api development", "git"]},
+}
+
+# Common abbreviations/synonyms resolved to a canonical title (see resolve_role)
+ROLE_ALIASES = {
+    "sde": "Software Engineer", "swe": "Software Engineer", "software developer": "Software Engineer",
+    "software development engineer": "Software Engineer", "programmer": "Software Engineer",
+    "ml engineer": "AI/ML Engineer", "machine learning engineer": "AI/ML Engineer", "ai engineer": "AI/ML Engineer",
+    "sre": "DevOps Engineer", "site reliability engineer": "DevOps Engineer",
+    "backend engineer": "Backend Developer", "frontend engineer": "Frontend Developer",
+    "full stack engineer": "Full Stack Developer", "fullstack developer": "Full Stack Developer",
+    "ux designer": "UX/UI Designer", "ui designer": "UX/UI Designer",
+    "security engineer": "Cybersecurity Specialist", "android developer": "Mobile Developer",
+    "ios developer": "Mobile Developer",
+}
+
+# Local ranker weights (sum to 1) and lookup tables
+RANK_WEIGHTS = {"skills": 0.7, "growth": 0.15, "demand": 0.1, "salary": 0.05}
+TARGET_ROLE_BONUS = 0.1
+DEMAND_LEVELS = {"critical": 1.0, "very_high": 0.9, "high": 0.7, "medium": 0.5, "low": 0.3}
+SKILL_DEMAND_WEIGHTS = {"critical": 1.5, "very_high": 1.3, "high": 1.15}
+MIN_TITLE_PREFIX = 3  # Shortest abbreviation ("eng", "dev") matched against a title word
+_NUMBER = re.compile(r"\d[\d,]*(?:\.\d+)?")
+
+
+def _percent(value) -> float:
+    match = _NUMBER.search(str(value or ""))
+    return float(match.group().replace(",", "")) / 100 if match else 0.0
+
+
+def _salary_mid(value) -> float:
+    numbers = [float(n.replace(",", "")) for n in _NUMBER.findall(str(value or ""))]
+    return sum(numbers) / len(numbers) if numbers else 0.0
+
+
 # ═══════════════════════════════════════════════════════════════
-# JOB MARKET DATA (2025-2030)
+# QUERY INDEX
 # ═══════════════════════════════════════════════════════════════
 
-JOB_MARKET_DATA = {
-    "last_updated": "2026-02",
-    "sources": [
-        "World Economic Forum Future of Jobs Report 2025",
-        "U.S. Bureau of Labor Statistics",
-        "McKinsey Healthcare Outlook 2026",
-        "Indeed Jobs & Hiring Trends Report 2026",
-        "India Employment Forum"
-    ],
-    
-    # Fastest growing jobs globally (2025-2030)
-    "fastest_growing_global": [
-        {"role": "Big Data Specialist", "growth": "60%+", "demand": "very_high", "salary_range_usd": "90,000-180,000"},
-        {"role": "AI/ML Engineer", "growth": "55%+", "demand": "very_high", "salary_range_usd": "120,000-250,000"},
-        {"role": "FinTech Engineer", "growth": "50%+", "demand": "very_high", "salary_range_usd": "100,000-200,000"},
-        {"role": "Cybersecurity Specialist", "growth": "35%+", "demand": "very_high", "salary_range_usd": "95,000-175,000"},
-        {"role": "Cloud Architect", "growth": "30%+", "demand": "very_high", "salary_range_usd": "130,000-220,000"},
-        {"role": "Renewable Energy Engineer", "growth": "30%+", "demand": "high", "salary_range_usd": "80,000-140,000"},
-        {"role": "DevOps Engineer", "growth": "25%+", "demand": "very_high", "salary_range_usd": "100,000-180,000"},
-        {"role": "Full Stack Developer", "growth": "22%+", "demand": "high", "salary_range_usd": "90,000-160,000"},
-        {"role": "Healthcare Professional", "growth": "20%+", "demand": "very_high", "salary_range_usd": "60,000-150,000"},
-        {"role": "UX/UI Designer", "growth": "18%+", "demand": "high", "salary_range_usd": "75,000-140,000"},
-    ],
-    
-    # India-specific fastest growing (2025-2030)
-    "fastest_growing_india": [
-        {"role": "AI/ML Specialist", "growth": "65%+", "demand": "very_high", "salary_range_inr": "15,00,000-50,00,000"},
-        {"role": "Big Data Engineer", "growth": "60%+", "demand": "very_high", "salary_range_inr": "12,00,000-40,00,000"},
-        {"role": "Cloud Architect", "growth": "50%+", "demand": "very_high", "salary_range_inr": "18,00,000-55,00,000"},
-        {"role": "Cybersecurity Analyst", "growth": "45%+", "demand": "very_high", "salary_range_inr": "10,00,000-35,00,000"},
-        {"role": "DevOps Engineer", "growth": "40%+", "demand": "very_high", "salary_range_inr": "12,00,000-38,00,000"},
-        {"role": "Digital Marketing Manager", "growth": "35%+", "demand": "high", "salary_range_inr": "8,00,000-25,00,000"},
-        {"role": "Full Stack Developer", "growth": "30%+", "demand": "high", "salary_range_inr": "8,00,000-30,00,000"},
-        {"role": "Renewable Energy Engineer", "growth": "30%+", "demand": "high", "salary_range_inr": "7,00,000-20,00,000"},
-        {"role": "UX/UI Designer", "growth": "25%+", "demand": "high", "salary_range_inr": "6,00,000-22,00,000"},
-        {"role": "Healthcare IT Specialist", "growth": "25%+", "demand": "high", "salary_range_inr": "8,00,000-25,00,000"},
-    ],
-    
-    # Declining roles (automation risk)
-    "declining_roles": [
-        {"role": "Data Entry Clerk", "decline": "-30%", "automation_risk": "very_high"},
-        {"role": "Bank Teller", "decline": "-25%", "automation_risk": "very_high"},
-        {"role": "Postal Service Clerk", "decline": "-20%", "automation_risk": "high"},
-        {"role": "Cashier", "decline": "-15%", "automation_risk": "high"},
-        {"role": "Bookkeeping Clerk", "decline": "-12%", "automation_risk": "high"},
-        {"role": "Administrative Assistant", "decline": "-10%", "automation_risk": "medium"},
-    ],
-    
-    # Skills in highest demand (2025-2030)
-    "top_skills_global": [
-        {"skill": "AI/Machine Learning", "demand": "critical", "growth": "65%"},
-        {"skill": "Data Analytics & Big Data", "demand": "critical", "growth": "58%"},
-        {"skill": "Cloud Computing (AWS/Azure/GCP)", "demand": "critical", "growth": "45%"},
-        {"skill": "Cybersecurity", "demand": "critical", "growth": "40%"},
-        {"skill": "Python", "demand": "very_high", "growth": "35%"},
-        {"skill": "DevOps & CI/CD", "demand": "very_high", "growth": "32%"},
-        {"skill": "JavaScript/TypeScript", "demand": "very_high", "growth": "25%"},
-        {"skill": "SQL & Database Management", "demand": "high", "growth": "20%"},
-        {"skill": "Kubernetes & Containerization", "demand": "high", "growth": "38%"},
-        {"skill": "API Development", "demand": "high", "growth": "22%"},
-    ],
-    
-    # Soft skills in demand
-    "top_soft_skills": [
-        {"skill": "Creative Thinking", "importance": "critical"},
-        {"skill": "Analytical Thinking", "importance": "critical"},
-        {"skill": "Resilience & Adaptability", "importance": "very_high"},
-        {"skill": "Leadership & Mentoring", "importance": "very_high"},
-        {"skill": "Communication", "importance": "very_high"},
-        {"skill": "Problem Solving", "importance": "high"},
-        {"skill": "Collaboration", "importance": "high"},
-        {"skill": "Time Management", "importance": "high"},
-    ],
-    
-    # Industry outlook
-    "industry_outlook": {
-        "technology": {
-            "outlook": "very_strong",
-            "growth": "17-18%",
-            "trends": [
-                "AI integration across all roles",
-                "Skills-based hiring over degrees",
-                "Remote/hybrid work standard",
-                "Senior roles in high demand, junior market competitive"
-            ],
-            "hot_areas": ["AI/ML", "Cloud", "Security", "DevOps"]
-        },
-        "healthcare": {
-            "outlook": "very_strong",
-            "growth": "15-20%",
-            "trends": [
-                "Persistent workforce shortages",
-                "Telehealth expansion",
-                "Mental health focus",
-                "Tech-savvy talent preferred"
-            ],
-            "hot_areas": ["Nursing", "Mental Health", "Health IT", "Telehealth"]
-        },
-        "finance": {
-            "outlook": "stable",
-            "growth": "8-12%",
-            "trends": [
-                "Compliance and risk management priority",
-                "FinTech disruption",
-                "Data-driven decision making",
-                "AI in financial analysis"
-            ],
-            "hot_areas": ["FinTech", "Risk Management", "Data Analytics", "Compliance"]
-        },
-        "data_science": {
-            "outlook": "very_strong",
-            "growth": "35%+",
-            "trends": [
-                "Cross-functional skills valued",
-                "NLP and deep learning focus",
-                "Cloud skills essential",
-                "Business outcome orientation"
-            ],
-            "hot_areas": ["ML Engineering", "NLP", "Computer Vision", "MLOps"]
-        },
-        "marketing": {
-            "outlook": "moderate",
-            "growth": "6-10%",
-            "trends": [
-                "ROI-focused hiring",
-                "Digital/performance marketing priority",
-                "Content + analytics combo",
-                "Generalist roles declining"
-            ],
-            "hot_areas": ["Performance Marketing", "SEO", "Marketing Analytics", "Content Strategy"]
-        },
-        "renewable_energy": {
-            "outlook": "strong",
-            "growth": "30%+",
-            "trends": [
-                "Green transition acceleration",
-                "Government incentives",
-                "Solar and wind expansion",
-                "EV infrastructure growth"
-            ],
-            "hot_areas": ["Solar Engineering", "Wind Energy", "EV Technology", "Sustainability"]
+class JobMarketIndex:
+    """Read-only indexes over the market dataset, built once per dataset version.
+
+    - roles: inverted index token -> role ids plus a sorted token list for
+      prefix lookups ("dev" finds "DevOps Engineer")
+    - role skills: frozenset per role key, canonical skill keys and a phrase
+      matcher over role keys
+    - skill bitsets: one bit per canonical skill, an int mask per role, for
+      batch gap analysis
+    - catalogue: role candidates with weighted skills and normalized market
+      signals for the local recommendation ranker
+    - summaries: precomputed get_job_market_summary() responses
+    """
+
+    def __init__(self, data: dict, role_skills: dict, catalogue: dict = None):
+        self.data = data
+        # Content version - keys response caches built from this data
+        self.version = hashlib.sha256(json.dumps(
+            [data, role_skills, catalogue], sort_keys=True, default=str
+        ).encode()).hexdigest()[:16]
+
+        # Roles in lookup order: fastest growing first, then declining
+        self.roles = [("growing", job) for job in data["fastest_growing_global"]]
+        self.roles += [("declining", job) for job in data["declining_roles"]]
+        self.role_names = [job["role"].lower() for _, job in self.roles]
+        # All names in one string: a lookup is one str.find, first hit in dataset order
+        self.names_blob = "\n".join(self.role_names)
+        self.name_starts = []
+        offset = 0
+        for name in self.role_names:
+            self.name_starts.append(offset)
+            offset += len(name) + 1
+
+        self.role_skill_lists = {key: tuple(skills) for key, skills in role_skills.items()}
+        self.role_skills = {key: frozenset(skills) for key, skills in role_skills.items()}
+        self.role_order = {key: i for i, key in enumerate(role_skills)}
+        self.role_matcher = PhraseMatcher()
+        for key in role_skills:
+            self.role_matcher.add(key, key)
+        # Canonical role titles (dataset + catalogue) and a matcher to spot them in free text
+        self.role_titles = list(dict.fromkeys([job["role"] for _, job in self.roles] + list(catalogue or {})))
+        self.title_matcher = PhraseMatcher()
+        for title in self.role_titles:
+            self.title_matcher.add(title, title)
+        self.title_phrases = [(frozenset(tokenize(title)), title) for title in self.role_titles]
+        for alias, title in ROLE_ALIASES.items():
+            if title in self.role_titles:
+                self.title_matcher.add(alias, title)
+                self.title_phrases.append((frozenset(tokenize(alias)), title))
+        # Per-instance cache so a replaced index is not kept alive by a shared cache
+        self.needed_skills = lru_cache(maxsize=1024)(self._needed_skills)
+        self.default_skills = tuple(s["skill"].lower() for s in data["top_skills_global"][:6])
+        self.market_demand_skills = [s["skill"] for s in data["top_skills_global"][:5]]
+        self.skill_keys = {
+            skill: skill_key(skill)
+            for skill in (*(s for skills in role_skills.values() for s in skills), *self.default_skills)
         }
-    },
-    
-    # Certifications in demand
-    "top_certifications": [
-        {"name": "AWS Solutions Architect", "field": "Cloud", "value": "very_high"},
-        {"name": "Google Cloud Professional", "field": "Cloud", "value": "very_high"},
-        {"name": "Azure Administrator", "field": "Cloud", "value": "high"},
-        {"name": "CISSP", "field": "Cybersecurity", "value": "very_high"},
-        {"name": "CEH (Certified Ethical Hacker)", "field": "Cybersecurity", "value": "high"},
-        {"name": "PMP", "field": "Project Management", "value": "high"},
-        {"name": "Scrum Master", "field": "Agile", "value": "high"},
-        {"name": "TensorFlow Developer", "field": "AI/ML", "value": "high"},
-        {"name": "Kubernetes Administrator (CKA)", "field": "DevOps", "value": "high"},
-        {"name": "Data Engineering Professional", "field": "Data", "value": "high"},
-    ],
-    
-    # Salary benchmarks 2026 (USD)
-    "salary_benchmarks_usd": {
-        "entry_level": {
-            "software_engineer": "70,000-95,000",
-            "data_analyst": "55,000-75,000",
-            "cybersecurity_analyst": "65,000-85,000",
-            "devops_engineer": "75,000-100,000",
-            "ml_engineer": "85,000-115,000"
-        },
-        "mid_level": {
-            "software_engineer": "100,000-140,000",
-            "data_scientist": "95,000-135,000",
-            "cybersecurity_engineer": "100,000-140,000",
-            "devops_engineer": "110,000-150,000",
-            "ml_engineer": "130,000-180,000"
-        },
-        "senior": {
-            "software_engineer": "150,000-220,000",
-            "data_scientist": "140,000-200,000",
-            "security_architect": "160,000-230,000",
-            "cloud_architect": "170,000-250,000",
-            "ml_architect": "180,000-280,000"
+        self.skill_bits: dict[str, int] = {}
+        self.vocabulary: list[str] = []
+        for skill, key in self.skill_keys.items():
+            if key not in self.skill_bits:
+                self.skill_bits[key] = len(self.vocabulary)
+                self.vocabulary.append(skill)
+        self.role_profiles = {key: self.skills_profile(skills) for key, skills in self.role_skill_lists.items()}
+        self.catalogue = self._build_catalogue(catalogue or {})
+
+        self.summary = {
+            "fastest_growing": data["fastest_growing_global"][:5],
+            "top_skills": data["top_skills_global"][:5],
+            "industry_outlook": {k: v["outlook"] for k, v in data["industry_outlook"].items()},
+            "key_insights": data["key_insights"]
         }
-    },
-    
-    # Key insights
-    "key_insights": [
-        "39-40% of core job skills will change by 2030",
-        "AI will impact nearly every sector, creating new roles while automating others",
-        "Skills-based hiring is replacing degree requirements at many companies",
-        "Remote work remains standard for tech roles",
-        "India's tech sector targeting $500B revenue by 2030",
-        "Healthcare and green energy are recession-resistant growth areas",
-        "Upskilling in AI/ML provides the highest career ROI"
-    ]
+        self.field_summaries = {
+            field: {
+                "field": field,
+                "outlook": outlook,
+                "top_skills": data["top_skills_global"][:5],
+                "key_insights": data["key_insights"][:3]
+            }
+            for field, outlook in data["industry_outlook"].items()
+        }
+
+    def find_role(self, query: str) -> tuple[str, dict] | None:
+        """First role (in dataset order) whose name contains the query - same result as a linear scan"""
+        query = query.lower()
+        pos = self.names_blob.find(query) if "\n" not in query else -1
+        if pos < 0:
+            return None
+        return self.roles[bisect.bisect_right(self.name_starts, pos) - 1]
+
+    def _build_catalogue(self, catalogue: dict) -> list[dict]:
+        growing = {job["role"]: job for job in self.data["fastest_growing_global"]}
+        skill_weight = {
+            skill_key(s["skill"]): SKILL_DEMAND_WEIGHTS.get(s["demand"], 1.0) for s in self.data["top_skills_global"]
+        }
+        roles = []
+        for title, entry in catalogue.items():
+            market = {**entry, **growing.get(title, {})}
+            skills = [(skill, skill_key(skill)) for skill in entry["skills"]]
+            roles.append({
+                "title": title,
+                "skills": [(skill, key, skill_weight.get(key, 1.0)) for skill, key in skills],
+                "total_weight": sum(skill_weight.get(key, 1.0) for _, key in skills),
+                "tokens": frozenset(tokenize(title)),
+                "growth": _percent(market.get("growth")),
+                "demand": DEMAND_LEVELS.get(market.get("demand"), DEMAND_LEVELS["medium"]),
+                "salary_range_usd": market.get("salary_range_usd", ""),
+                "salary": _salary_mid(market.get("salary_range_usd")),
+            })
+        # Market signals relative to the best role in the catalogue
+        for signal in ("growth", "salary"):
+            top = max((role[signal] for role in roles), default=0) or 1
+            for role in roles:
+                role[f"{signal}_norm"] = role[signal] / top
+        return roles
+
+    def skills_mask(self, skills) -> int:
+        """Bitset of vocabulary skills (role skill names or canonical keys)"""
+        mask = 0
+        for skill in skills:
+            bit = self.skill_bits.get(self.skill_keys.get(skill, skill))
+            if bit is not None:
+                mask |= 1 << bit
+        return mask
+
+    def skills_profile(self, skills) -> tuple[int, tuple[int, ...], int]:
+        """(bitset, bits of repeated skills, skill count) for a required-skills list.
+
+        Two names can share a canonical key; the single gap analysis counts
+        each name, so repeats are kept beside the bitset to count them too.
+        """
+        mask, repeats = 0, []
+        for skill in skills:
+            bit = self.skill_bits.get(self.skill_keys.get(skill, skill))
+            if bit is None:
+                continue
+            if mask >> bit & 1:
+                repeats.append(bit)
+            mask |= 1 << bit
+        return mask, tuple(repeats), len(skills)
+
+    def title_by_prefix(self, text: str) -> str | None:
+        """Title (or alias) whose every word is in text, whole or abbreviated ("eng", "dev")
+
+        The phrase with the most words wins; ties go to the first title.
+        """
+        tokens = set(tokenize(text))
+        prefixes = [t for t in tokens if len(t) >= MIN_TITLE_PREFIX]
+        best, best_size = None, 0
+        for words, title in self.title_phrases:
+            if len(words) > best_size and all(
+                word in tokens or any(word.startswith(p) for p in prefixes) for word in words
+            ):
+                best, best_size = title, len(words)
+        return best
+
+    def _needed_skills(self, target_role: str) -> tuple[str, ...]:
+        """Skills for the first ROLE_SKILLS key found in target_role (else top skills)"""
+        matches = self.role_matcher.find_all(target_role)
+        if not matches:
+            return self.default_skills
+        return self.role_skill_lists[min(matches, key=self.role_order.__getitem__)]
+
+
+# ═══════════════════════════════════════════════════════════════
+# DATASET MANAGER
+# ═══════════════════════════════════════════════════════════════
+
+SCHEMA_VERSION = 1
+MSGPACK_AVAILABLE = importlib.util.find_spec("msgpack") is not None
+
+# Top-level key -> (container type, fields every entry must have)
+_REQUIRED = {
+    "fastest_growing_global": (list, ("role", "growth", "demand", "salary_range_usd")),
+    "fastest_growing_india": (list, ("role", "growth", "demand")),
+    "declining_roles": (list, ("role", "decline", "automation_risk")),
+    "top_skills_global": (list, ("skill", "demand")),
+    "top_soft_skills": (list, ("skill",)),
+    "top_certifications": (list, ("name",)),
+    "salary_benchmarks_usd": (dict, ()),
+    "industry_outlook": (dict, ("outlook",)),
+    "key_insights": (list, ()),
 }
 
 
+class DatasetError(ValueError):
+    pass
+
+
+def _dataset_path() -> str:
+    path = settings.JOB_MARKET_DATA_FILE
+    return path if os.path.isabs(path) else os.path.join(os.path.dirname(os.path.abspath(__file__)), path)
+
+
+def validate_dataset(data) -> dict:
+    """Check the structure the indexes and endpoints rely on; raise DatasetError if broken"""
+    if not isinstance(data, dict):
+        raise DatasetError("Dataset must be a JSON object")
+    if data.get("schema_version") != SCHEMA_VERSION:
+        raise DatasetError(f"schema_version must be {SCHEMA_VERSION}")
+    for key, (container, fields) in _REQUIRED.items():
+        value = data.get(key)
+        if not isinstance(value, container) or not value:
+            raise DatasetError(f"'{key}' must be a non-empty {container.__name__}")
+        entries = value.values() if container is dict else value
+        for entry in entries:
+            if fields and (not isinstance(entry, dict) or any(f not in entry for f in fields)):
+                raise DatasetError(f"Every '{key}' entry needs: {', '.join(fields)}")
+    if "mid_level" not in data["salary_benchmarks_usd"]:
+        raise DatasetError("'salary_benchmarks_usd' needs a mid_level entry")
+    return data
+
+
+def load_dataset(path: str) -> dict:
+    """Read and validate a dataset file (.json, or .msgpack when msgpack is installed)"""
+    msgpack = path.endswith(".msgpack")
+    if msgpack and not MSGPACK_AVAILABLE:
+        raise DatasetError("MessagePack dataset needs the msgpack package")
+    try:
+        with open(path, "rb") as f:
+            raw = f.read()
+        if msgpack:
+            import msgpack as mp
+            data = mp.unpackb(raw)
+        else:
+            data = json.loads(raw)
+    except (OSError, ValueError) as e:
+        raise DatasetError(f"Cannot read {path}: {e}")
+    return validate_dataset(data)
+
+
+def _file_stamp(path: str) -> tuple:
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+_index = JobMarketIndex(load_dataset(_dataset_path()), ROLE_SKILLS, ROLE_CATALOGUE)
+_state = {
+    "stamp": _file_stamp(_dataset_path()),
+    "rejected_stamp": None,
+    "loaded_at": datetime.now(timezone.utc).isoformat(),
+    "reloads": 0,
+    "last_error": None,
+}
+_listeners: list = []
+_reload_lock = asyncio.Lock()
+
+
+def on_reload(callback):
+    """Register a callback (sync or async) run after a new dataset is swapped in"""
+    _listeners.append(callback)
+    return callback
+
+
+def get_market_data() -> dict:
+    """The current dataset. Take one reference per request for a consistent view."""
+    return _index.data
+
+
+def dataset_info() -> dict:
+    return {
+        "version": _index.version,
+        "last_updated": _index.data.get("last_updated"),
+        "path": _dataset_path(),
+        "loaded_at": _state["loaded_at"],
+        "reloads": _state["reloads"],
+        "last_error": _state["last_error"],
+    }
+
+
+async def reload_dataset(force: bool = False) -> dict:
+    """Load the data file off the event loop and swap it in if its content changed.
+
+    Parsing, validation and index building run in a worker thread; requests
+    keep using the old index until the single reference swap. An invalid file
+    is rejected and the current version stays active.
+    """
+    global _index
+    async with _reload_lock:
+        path = _dataset_path()
+        stamp = _file_stamp(path)
+        if not force and stamp in (_state["stamp"], _state["rejected_stamp"]):
+            return {"reloaded": False, **dataset_info()}
+        try:
+            data = await asyncio.to_thread(load_dataset, path)
+        except DatasetError as e:
+            _state["rejected_stamp"] = stamp
+            _state["last_error"] = str(e)
+            raise
+        index = await asyncio.to_thread(JobMarketIndex, data, ROLE_SKILLS, ROLE_CATALOGUE)
+        _state["stamp"] = stamp
+        _state["last_error"] = None
+        if index.version == _index.version:
+            return {"reloaded": False, **dataset_info()}
+
+        previous = _index.version
+        _index = index
+        _role_outlook.cache_clear()
+        _state["loaded_at"] = datetime.now(timezone.utc).isoformat()
+        _state["reloads"] += 1
+        print(f"[JobMarket] dataset {previous} -> {index.version} ({data.get('last_updated')})")
+
+        for callback in _listeners:
+            try:
+                result = callback()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                print(f"[JobMarket] reload listener {getattr(callback, '__name__', callback)} failed: {e}")
+        return {"reloaded": True, "previous_version": previous, **dataset_info()}
+
+
+async def replace_dataset(data: dict) -> dict:
+    """Validate a new dataset, write it atomically over the data file and load it"""
+    validate_dataset(data)
+    path = _dataset_path()
+
+    def write():
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    if path.endswith(".msgpack"):
+        raise DatasetError("Upload JSON datasets only; the data file is MessagePack")
+    await asyncio.to_thread(write)
+    return await reload_dataset(force=True)
+
+
+async def watch_dataset(interval: float) -> None:
+    """Background task: poll the data file and reload it when it changes"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await reload_dataset()
+        except DatasetError as e:
+            print(f"[JobMarket] rejected new dataset, keeping {_index.version}: {e}")
+        except Exception as e:
+            print(f"[JobMarket] reload error: {e}")
+
+
+# ═══════════════════════════════════════════════════════════════
+# PUBLIC QUERIES
+# ═══════════════════════════════════════════════════════════════
+
+def dataset_version() -> str:
+    """Version of the data currently served (changes whenever the index is rebuilt from new data)"""
+    return _index.version
+
+
+def get_role_titles() -> list[str]:
+    """Canonical role titles known to the current dataset and catalogue"""
+    return list(_index.role_titles)
+
+
+def resolve_role(text: str) -> str | None:
+    """Map a free-text role to a canonical title ("Sr. devops eng at X" -> "DevOps Engineer")
+
+    Tries a dataset role inside the text, then a full title or alias phrase,
+    then titles whose words all appear, whole or abbreviated.
+    """
+    if not text or not text.strip():
+        return None
+    found = _index.find_role(text)
+    if found:
+        return found[1]["role"]
+    matches = _index.title_matcher.find_all(text)
+    if matches:
+        return max(matches, key=len)
+    return _index.title_by_prefix(text)
+
+
 def get_job_market_summary(field: str = None) -> dict:
     """Get job market summary, optionally filtered by field"""
-    if field and field.lower() in JOB_MARKET_DATA["industry_outlook"]:
+    if field and field.lower() in _index.field_summaries:
+        summary = _index.field_summaries[field.lower()]
+        return summary if field == summary["field"] else {**summary, "field": field}
+    return _index.summary
+
+
+@lru_cache(maxsize=1024)
+def _role_outlook(role_lower: str) -> dict:
+    found = _index.find_role(role_lower)
+    if found is None:
+        return {}
+    kind, job = found
+    if kind == "growing":
         return {
-            "field": field,
-            "outlook": JOB_MARKET_DATA["industry_outlook"][field.lower()],
-            "top_skills": [s for s in JOB_MARKET_DATA["top_skills_global"][:5]],
-            "key_insights": JOB_MARKET_DATA["key_insights"][:3]
+            "role": job["role"],
+            "outlook": "growing",
+            "growth_rate": job["growth"],
+            "demand": job["demand"],
+            "salary_range": job["salary_range_usd"],
+            "recommendation": "Strong career choice with excellent growth prospects"
         }
     return {
-        "fastest_growing": JOB_MARKET_DATA["fastest_growing_global"][:5],
-        "top_skills": JOB_MARKET_DATA["top_skills_global"][:5],
-        "industry_outlook": {k: v["outlook"] for k, v in JOB_MARKET_DATA["industry_outlook"].items()},
-        "key_insights": JOB_MARKET_DATA["key_insights"]
+        "role": job["role"],
+        "outlook": "declining",
+        "decline_rate": job["decline"],
+        "automation_risk": job["automation_risk"],
+        "recommendation": "Consider upskilling to adjacent tech-enabled roles"
     }
 
 
 def get_role_outlook(role: str) -> dict:
     """Get outlook for a specific role"""
-    role_lower = role.lower()
-    
-    # Check fastest growing
-    for job in JOB_MARKET_DATA["fastest_growing_global"]:
-        if role_lower in job["role"].lower():
-            return {
-                "role": job["role"],
-                "outlook": "growing",
-                "growth_rate": job["growth"],
-                "demand": job["demand"],
-                "salary_range": job["salary_range_usd"],
-                "recommendation": "Strong career choice with excellent growth prospects"
-            }
-    
-    # Check declining
-    for job in JOB_MARKET_DATA["declining_roles"]:
-        if role_lower in job["role"].lower():
-            return {
-                "role": job["role"],
-                "outlook": "declining",
-                "decline_rate": job["decline"],
-                "automation_risk": job["automation_risk"],
-                "recommendation": "Consider upskilling to adjacent tech-enabled roles"
-            }
-    
+    outlook = _role_outlook(role.lower())
+    if outlook:
+        return dict(outlook)
     return {
         "role": role,
         "outlook": "stable",
@@ -259,34 +518,12 @@ def get_role_outlook(role: str) -> dict:
 
 
 def get_skills_gap_analysis(current_skills: list, target_role: str) -> dict:
-    """Analyze skill gaps based on market demand"""
-    current_lower = [s.lower() for s in current_skills]
-    
-    # Skills needed for common roles
-    role_skills = {
-        "software engineer": ["python", "javascript", "sql", "git", "api development", "cloud computing"],
-        "data scientist": ["python", "sql", "machine learning", "data analytics", "statistics", "tensorflow"],
-        "ml engineer": ["python", "tensorflow", "pytorch", "mlops", "cloud computing", "docker"],
-        "devops engineer": ["kubernetes", "docker", "ci/cd", "aws", "terraform", "linux"],
-        "cybersecurity": ["security", "networking", "linux", "python", "compliance", "incident response"],
-        "cloud architect": ["aws", "azure", "gcp", "kubernetes", "networking", "security"],
-        "full stack": ["javascript", "react", "node.js", "python", "sql", "api development"],
-    }
+    """Analyze skill gaps based on market demand (skills compared by canonical ID)"""
+    current = expand_skills(current_skills)
+    needed_skills = _index.needed_skills(target_role.lower())
     
-    target_lower = target_role.lower()
-    needed_skills = []
-    
-    for role_key, skills in role_skills.items():
-        if role_key in target_lower:
-            needed_skills = skills
-            break
-    
-    if not needed_skills:
-        # Default to high-demand skills
-        needed_skills = [s["skill"].lower() for s in JOB_MARKET_DATA["top_skills_global"][:6]]
-    
-    missing = [s for s in needed_skills if s not in current_lower]
-    matched = [s for s in needed_skills if s in current_lower]
+    missing = [s for s in needed_skills if _index.skill_keys[s] not in current]
+    matched = [s for s in needed_skills if _index.skill_keys[s] in current]
     
     return {
         "target_role": target_role,
@@ -294,5 +531,79 @@ def get_skills_gap_analysis(current_skills: list, target_role: str) -> dict:
         "skills_missing": missing,
         "match_percent": int((len(matched) / len(needed_skills)) * 100) if needed_skills else 0,
         "priority_skills": missing[:3],
-        "market_demand_skills": [s["skill"] for s in JOB_MARKET_DATA["top_skills_global"][:5]]
+        "market_demand_skills": list(_index.market_demand_skills)
     }
+
+
+MAX_BATCH_USERS = 1000
+
+
+def batch_skills_gap(users: list[list], roles: list[str] = None, top: int = 3) -> dict:
+    """Skill gaps for N users x M roles in one pass over skill bitsets.
+
+    Every user and role is encoded as an int bitset over the canonical skill
+    vocabulary, so each (user, role) pair costs one AND plus a popcount.
+    Match percentages count required skills exactly like
+    get_skills_gap_analysis, so both endpoints agree.
+    Roles default to every role with a known skill profile. Missing skills
+    are returned as indexes into "skills" to keep the response compact.
+    """
+    if roles:
+        role_names = list(roles)
+        profiles = [_index.skills_profile(_index.needed_skills(r.lower())) for r in roles]
+    else:
+        role_names = list(_index.role_profiles)
+        profiles = list(_index.role_profiles.values())
+    results = []
+    for skills in users:
+        user = _index.skills_mask(expand_skills(skills))
+        match, missing = [], []
+        for mask, repeats, size in profiles:
+            matched = (mask & user).bit_count() + sum(user >> bit & 1 for bit in repeats)
+            match.append(int((matched / size) * 100) if size else 0)
+            gap, bits = mask & ~user, []
+            while gap:
+                low = gap & -gap
+                bits.append(low.bit_length() - 1)
+                gap ^= low
+            missing.append(bits)
+        ranked = sorted(range(len(profiles)), key=lambda i: (-match[i], len(missing[i])))
+        results.append({"match_percent": match, "missing": missing, "best_fit": ranked[:top]})
+    return {"roles": role_names, "skills": list(_index.vocabulary), "results": results}
+
+
+def recommend_roles(current_skills: list, target_role: str = "", top: int = 5) -> list[dict]:
+    """Rank catalogue roles for a skill set without an LLM call.
+
+    score = weighted skill overlap (in-demand skills weigh more) + growth,
+    demand and salary from the dataset, plus a bonus for roles named like
+    the target role. Returns the top-k in the job recommendation format.
+    """
+    current = expand_skills(current_skills)
+    target = frozenset(tokenize(target_role))
+    ranked = []
+    for role in _index.catalogue:
+        matched = [(skill, weight) for skill, key, weight in role["skills"] if key in current]
+        missing = [skill for skill, key, _ in role["skills"] if key not in current]
+        overlap = sum(weight for _, weight in matched) / role["total_weight"] if role["total_weight"] else 0.0
+        score = (RANK_WEIGHTS["skills"] * overlap
+                 + RANK_WEIGHTS["growth"] * role["growth_norm"]
+                 + RANK_WEIGHTS["demand"] * role["demand"]
+                 + RANK_WEIGHTS["salary"] * role["salary_norm"])
+        if target and role["tokens"]:
+            score += TARGET_ROLE_BONUS * len(role["tokens"] & target) / len(role["tokens"])
+        ranked.append((score, overlap, role, [skill for skill, _ in matched], missing))
+
+    ranked.sort(key=lambda r: (-r[0], r[2]["title"]))
+    return [
+        {
+            "title": role["title"],
+            "match_percent": int(overlap * 100),
+            "score": round(score * 100, 1),
+            "skills_matched": matched,
+            "skills_to_learn": missing,
+            "salary_range_usd": role["salary_range_usd"],
+            "growth_outlook": "strong" if role["growth"] >= 0.25 else "moderate",
+        }
+        for score, overlap, role, matched, missing in ranked[:top]
+    ]
@@ -0,0 +1,299 @@
+"""Learning-plan progress - JSON Patch / per-item updates with versioning
+
+Progress lives in its own learning_plans.progress column, so ticking one
+item never rewrites plan_json. An update is a list of RFC 6902 JSON Patch
+operations or per-item deltas; each accepted update bumps the plan's
+version, and one made against an older version is rejected. An update is
+acknowledged only once it is written: each plan has one writer, and updates
+that arrive while a write is in flight are coalesced into the next single
+conditional UPDATE. If another process wrote first, the queued updates are
+rebased onto the stored progress and written again.
+"""
+
+import asyncio
+import copy
+
+from cache import LRUCache
+from config import settings
+import db
+
+
+class PatchError(ValueError):
+    pass
+
+
+class VersionConflict(Exception):
+    def __init__(self, view: dict):
+        super().__init__(f"plan {view['id']} is at version {view['version']}")
+        self.view = view
+
+
+class ProgressUnavailable(Exception):
+    """The update could not be written - nothing was applied, the client may retry"""
+
+
+class ProgressState:
+    """The stored progress of one plan (only ever what the database holds) plus queued updates"""
+    __slots__ = ("plan_id", "user_id", "progress", "version", "queue", "writer")
+
+    def __init__(self, plan_id: str, user_id: str, progress: dict, version: int):
+        self.plan_id = plan_id
+        self.user_id = user_id
+        self.progress = progress  # Replaced, never mutated
+        self.version = version
+        self.queue: list[_Update] = []
+        self.writer: asyncio.Task | None = None
+
+    def view(self, progress: dict = None, version: int = None) -> dict:
+        return {
+            "id": self.plan_id,
+            "progress": self.progress if progress is None else progress,
+            "version": self.version if version is None else version,
+        }
+
+
+class _Update:
+    __slots__ = ("progress", "patch", "items", "version", "done")
+
+    def __init__(self, progress: dict | None, patch: list | None, items: dict | None, version: int | None):
+        self.progress = progress
+        self.patch = patch
+        self.items = items
+        self.version = version
+        self.done = asyncio.get_running_loop().create_future()
+
+    def apply(self, current: dict) -> dict:
+        new = current if self.progress is None else self.progress
+        if self.patch:
+            new = apply_patch(new, self.patch)
+        if self.items:
+            new = merge_items(new, self.items)
+        if not isinstance(new, dict):
+            raise PatchError("progress must remain a JSON object")
+        return new
+
+    def resolve(self, result=None, error: Exception = None) -> None:
+        if not self.done.done():  # The request may have been cancelled
+            if error is None:
+                self.done.set_result(result)
+            else:
+                self.done.set_exception(error)
+
+
+# ═══════════════════════════════════════════════════════════════
+# JSON PATCH (RFC 6902)
+# ═══════════════════════════════════════════════════════════════
+
+def _pointer(path) -> list[str]:
+    if path == "":
+        return []
+    if not isinstance(path, str) or not path.startswith("/"):
+        raise PatchError(f"invalid JSON pointer: {path!r}")
+    return [token.replace("~1", "/").replace("~0", "~") for token in path[1:].split("/")]
+
+
+def _index(container: list, token: str, appending: bool = False) -> int:
+    if appending and token == "-":
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token[0] == "0"):
+        raise PatchError(f"invalid array index: {token!r}")
+    index = int(token)
+    if index > len(container) or (index == len(container) and not appending):
+        raise PatchError(f"array index out of range: {index}")
+    return index
+
+
+def _walk(doc, tokens: list[str]):
+    """The container holding the value at tokens (tokens must be non-empty)"""
+    for token in tokens[:-1]:
+        if isinstance(doc, dict) and token in doc:
+            doc = doc[token]
+        elif isinstance(doc, list):
+            doc = doc[_index(doc, token)]
+        else:
+            raise PatchError(f"path not found: /{'/'.join(tokens)}")
+    return doc
+
+
+def _get(doc, tokens: list[str]):
+    if not tokens:
+        return doc
+    parent, token = _walk(doc, tokens), tokens[-1]
+    if isinstance(parent, dict) and token in parent:
+        return parent[token]
+    if isinstance(parent, list):
+        return parent[_index(parent, token)]
+    raise PatchError(f"path not found: /{'/'.join(tokens)}")
+
+
+def _add(doc, tokens: list[str], value):
+    if not tokens:
+        return value
+    parent, token = _walk(doc, tokens), tokens[-1]
+    if isinstance(parent, dict):
+        parent[token] = value
+    elif isinstance(parent, list):
+        parent.insert(_index(parent, token, appending=True), value)
+    else:
+        raise PatchError(f"cannot add to a scalar at /{'/'.join(tokens)}")
+    return doc
+
+
+def _remove(doc, tokens: list[str]):
+    if not tokens:
+        raise PatchError("cannot remove the whole document")
+    parent, token = _walk(doc, tokens), tokens[-1]
+    if isinstance(parent, dict) and token in parent:
+        return parent.pop(token)
+    if isinstance(parent, list):
+        return parent.pop(_index(parent, token))
+    raise PatchError(f"path not found: /{'/'.join(tokens)}")
+
+
+def apply_patch(doc, operations: list):
+    """Apply JSON Patch operations to a copy of doc; all-or-nothing"""
+    doc = copy.deepcopy(doc)
+    for op in operations:
+        if not isinstance(op, dict) or "path" not in op:
+            raise PatchError(f"invalid operation: {op!r}")
+        name, path = op.get("op"), _pointer(op["path"])
+        if name in ("add", "replace", "test") and "value" not in op:
+            raise PatchError(f"{name} requires a value")
+        if name == "add":
+            doc = _add(doc, path, copy.deepcopy(op["value"]))
+        elif name == "remove":
+            _remove(doc, path)
+        elif name == "replace":
+            if path:
+                _remove(doc, path)
+            doc = _add(doc, path, copy.deepcopy(op["value"]))
+        elif name in ("move", "copy"):
+            source = _pointer(op.get("from"))
+            if name == "move" and path[:len(source)] == source and path != source:
+                raise PatchError("cannot move a value into itself")
+            value = _remove(doc, source) if name == "move" else copy.deepcopy(_get(doc, source))
+            doc = _add(doc, path, value)
+        elif name == "test":
+            if _get(doc, path) != op["value"]:
+                raise PatchError(f"test failed at {op['path']}")
+        else:
+            raise PatchError(f"unknown operation: {name!r}")
+    return doc
+
+
+def merge_items(progress: dict, items: dict) -> dict:
+    """Per-item deltas: each item's fields are merged into progress[item] (None removes the item)"""
+    merged = dict(progress)
+    for key, delta in items.items():
+        if delta is None:
+            merged.pop(key, None)
+        elif isinstance(delta, dict) and isinstance(merged.get(key), dict):
+            merged[key] = {**merged[key], **delta}
+        else:
+            merged[key] = delta
+    return merged
+
+
+# ═══════════════════════════════════════════════════════════════
+# STORE
+# ═══════════════════════════════════════════════════════════════
+
+MAX_REBASES = 3  # Conflicting writes by other processes retried before giving up with 503
+
+_states = LRUCache("learning_progress", max_entries=settings.PROGRESS_CACHE_ENTRIES)
+_writers: set[asyncio.Task] = set()  # Running plan writers, also those of evicted states
+
+
+async def _load(plan_id: str, user_id: str) -> ProgressState | None:
+    state = _states.get(plan_id)
+    if state is None:
+        row = await db.get_learning_progress(plan_id)
+        if not row:
+            return None
+        state = _states.get(plan_id)  # Loaded by a concurrent request meanwhile - one writer per plan
+        if state is None:
+            state = ProgressState(plan_id, row.get("user_id"), row.get("progress") or {}, row.get("version") or 0)
+            _states.set(plan_id, state)
+    return state if state.user_id == user_id else None
+
+
+async def update(plan_id: str, user_id: str, patch: list = None, items: dict = None,
+                 progress: dict = None, version: int = None) -> dict | None:
+    """Apply one update and return the plan once it is stored; None if the plan is not the user's.
+
+    version is the version the client last saw - VersionConflict if the plan
+    has moved on since (omit it for last-writer-wins). progress replaces the
+    whole progress object (the pre-patch API). PatchError for an invalid
+    update, ProgressUnavailable if it could not be written. Without a database
+    the update is applied to empty progress and echoed back, not stored.
+    """
+    if not db._get_client():
+        progress = _Update(progress, patch, items, version).apply({})
+        return {"id": plan_id, "progress": progress, "version": (version or 0) + 1}
+    state = await _load(plan_id, user_id)
+    if state is None:
+        return None
+    entry = _Update(progress, patch, items, version)
+    state.queue.append(entry)
+    if state.writer is None:
+        state.writer = asyncio.create_task(_drain(state))
+        _writers.add(state.writer)
+        state.writer.add_done_callback(_writers.discard)
+    return await entry.done
+
+
+async def _drain(state: ProgressState) -> None:
+    """The plan's writer: commits queued updates, one write per batch, until the queue is empty"""
+    try:
+        while state.queue:
+            batch, state.queue = state.queue, []
+            await _commit(state, batch)
+    finally:
+        state.writer = None
+        for entry in state.queue:  # Only left behind if the writer was cancelled
+            entry.resolve(error=ProgressUnavailable("server shutting down"))
+        state.queue = []
+
+
+async def _commit(state: ProgressState, batch: list[_Update]) -> None:
+    """Write a batch as one conditional UPDATE, rebasing onto newer stored progress on conflict"""
+    for _ in range(MAX_REBASES):
+        progress, version, accepted = state.progress, state.version, []
+        for entry in batch:
+            if entry.version is not None and entry.version != version:
+                entry.resolve(error=VersionConflict(state.view(progress, version)))
+                continue
+            try:
+                progress = entry.apply(progress)
+            except PatchError as e:
+                entry.resolve(error=e)
+                continue
+            version += 1
+            accepted.append((entry, state.view(progress, version)))
+        if not accepted:
+            return
+        if await db.update_learning_progress(state.plan_id, progress, version, state.version):
+            state.progress, state.version = progress, version
+            for entry, view in accepted:
+                entry.resolve(view)
+            return
+        row = await db.get_learning_progress(state.plan_id)
+        if not row or (row.get("version") or 0) == state.version:
+            break  # The write failed rather than lost a race
+        # Another process wrote first: rebase the batch onto what it stored
+        print(f"[Progress] plan {state.plan_id} moved to version {row.get('version')}, rebasing {len(accepted)} update(s)")
+        state.progress, state.version = row.get("progress") or {}, row.get("version") or 0
+        batch = [entry for entry, _ in accepted]
+    print(f"[Progress] could not write plan {state.plan_id}, {len(accepted)} update(s) rejected")
+    for entry, _ in accepted:
+        entry.resolve(error=ProgressUnavailable(f"progress of plan {state.plan_id} could not be saved"))
+
+
+async def flush_all() -> None:
+    """Wait for in-flight writes to finish (shutdown)"""
+    if _writers:
+        await asyncio.gather(*_writers, return_exceptions=True)
+
+
+def get_stats() -> dict:
+    return {**_states.stats(), "writing": len(_writers)}
@@ -1,7 +1,19 @@
 """GitHub Models LLM client - optimized for low memory"""
 
+import asyncio
 import json
+import time
 from config import settings
+from resume_text import chunk_sections, compact_resume, estimate_tokens, record_stats
+from cache import LRUCache, approx_size
+from job_market import get_market_data, get_role_outlook, get_role_titles, on_reload, resolve_role
+from skills import display_name, exact_skill_key, normalize_skills, skill_key
+from semantic_cache import SemanticCache
+import memory_governor
+import metrics
+import prompts
+import structured
+import tracing
 
 ENDPOINT = f"https://models.github.ai/orgs/{settings.GITHUB_ORG}/inference/chat/completions"
 HEADERS = {
@@ -11,140 +23,429 @@ HEADERS = {
 }
 
 
-async def chat(messages: list, model: str = None, max_tokens: int = 2048) -> str:
-    """Chat completion using shared HTTP client"""
+# ═══════════════════════════════════════════════════════════════
+# MODEL ROUTING
+# ═══════════════════════════════════════════════════════════════
+
+# Tier -> (model, timeout). Each prompt template names its tier; LLM_ROUTES overrides per prompt.
+TIERS = {
+    "large": (settings.LLM_MODEL, settings.LLM_TIMEOUT),
+    "fast": (settings.LLM_MODEL_FAST, settings.LLM_TIMEOUT_FAST),
+}
+ESCALATION = {"fast": "large"}  # Where invalid output is retried
+
+
+def _parse_routes(spec: str) -> dict[str, str]:
+    routes = {}
+    for item in spec.split(","):
+        name, _, tier = item.partition("=")
+        name, tier = name.strip(), tier.strip()
+        if not name:
+            continue
+        if name not in prompts.names() or tier not in TIERS:
+            print(f"[LLM] Ignoring route {item.strip()!r} - expected <prompt>={'|'.join(TIERS)}")
+            continue
+        routes[name] = tier
+    return routes
+
+
+_routes = _parse_routes(settings.LLM_ROUTES)
+
+
+def route(template: prompts.PromptTemplate) -> str:
+    """Tier a template's calls run on"""
+    return _routes.get(template.name, template.tier)
+
+
+# Per-model latency and routing decisions since process start
+_model_stats: dict[str, dict] = {}
+
+
+def _record_model(model: str, prompt: str, latency: float, error: bool = False, escalated: bool = False) -> None:
+    stats = _model_stats.get(model)
+    if stats is None:
+        stats = _model_stats[model] = {
+            "calls": 0, "errors": 0, "escalations_in": 0,
+            "latency_total": 0.0, "latency_max": 0.0, "prompts": {},
+        }
+    stats["calls"] += 1
+    stats["errors"] += error
+    stats["escalations_in"] += escalated
+    stats["latency_total"] += latency
+    stats["latency_max"] = max(stats["latency_max"], latency)
+    stats["prompts"][prompt] = stats["prompts"].get(prompt, 0) + 1
+    metrics.LLM_CALLS.inc(prompt, model, "error" if error else "ok")
+    metrics.LLM_LATENCY.observe(latency, prompt)
+
+
+def get_model_stats() -> dict:
+    return {
+        "tiers": {tier: {"model": model, "timeout": timeout} for tier, (model, timeout) in TIERS.items()},
+        "routes": {name: route(prompts.get(name)) for name in prompts.names()},
+        "models": {
+            model: {
+                **stats,
+                "latency_total": round(stats["latency_total"], 3),
+                "latency_max": round(stats["latency_max"], 3),
+                "avg_latency": round(stats["latency_total"] / stats["calls"], 3) if stats["calls"] else 0.0,
+            }
+            for model, stats in _model_stats.items()
+        },
+    }
+
+
+# Models that rejected response_format are asked again without it (and not again after)
+_json_mode_unsupported: set[str] = set()
+
+
+async def _post(messages: list, model: str = None, max_tokens: int = 2048, json_mode: bool = False,
+                timeout: float = None) -> dict:
+    """Raw chat completion response using shared HTTP client"""
     from main import get_http_client
     client = get_http_client()
+    model = model or settings.LLM_MODEL
+    timeout = timeout or settings.LLM_TIMEOUT
+    body = {
+        "model": model,
+        "messages": messages,
+        "max_tokens": max_tokens
+    }
+    json_mode = json_mode and settings.LLM_JSON_MODE and model not in _json_mode_unsupported
+    if json_mode:
+        body["response_format"] = {"type": "json_object"}
+    
+    async def send(c) -> dict:
+        res = await c.post(ENDPOINT, headers=HEADERS, json=body, timeout=timeout)
+        if json_mode and res.status_code in (400, 422) and "response_format" in res.text:
+            print(f"[LLM] {model} rejected response_format - retrying without JSON mode")
+            _json_mode_unsupported.add(model)
+            del body["response_format"]
+            res = await c.post(ENDPOINT, headers=HEADERS, json=body, timeout=timeout)
+        res.raise_for_status()
+        return res.json()
     
     if not client:
         import httpx
-        async with httpx.AsyncClient(timeout=60) as c:
-            res = await c.post(ENDPOINT, headers=HEADERS, json={
-                "model": model or settings.LLM_MODEL,
-                "messages": messages,
-                "max_tokens": max_tokens
-            })
-            res.raise_for_status()
-            return res.json()["choices"][0]["message"]["content"]
-    
-    res = await client.post(ENDPOINT, headers=HEADERS, json={
-        "model": model or settings.LLM_MODEL,
-        "messages": messages,
-        "max_tokens": max_tokens
-    })
-    res.raise_for_status()
-    return res.json()["choices"][0]["message"]["content"]
+        async with httpx.AsyncClient(timeout=timeout) as c:
+            return await send(c)
+    return await send(client)
 
 
-def _parse_json(text: str, fallback=None):
-    """Parse JSON from LLM response, handling markdown blocks"""
+async def _stream_post(messages: list, model: str, max_tokens: int, json_mode: bool = False,
+                       timeout: float = None, finish: dict = None):
+    """Streamed chat completion: yields content deltas; finish["reason"] is set at the end"""
+    from main import get_http_client
+    import httpx
+    client = get_http_client()
+    own_client = client is None
+    if own_client:
+        client = httpx.AsyncClient(timeout=timeout or settings.LLM_TIMEOUT)
+    body = {"model": model, "messages": messages, "max_tokens": max_tokens, "stream": True}
+    json_mode = json_mode and settings.LLM_JSON_MODE and model not in _json_mode_unsupported
+    if json_mode:
+        body["response_format"] = {"type": "json_object"}
     try:
-        # Try direct parse first
-        return json.loads(text.strip())
-    except:
-        pass
-    
+        for _ in range(2):
+            async with client.stream("POST", ENDPOINT, headers=HEADERS, json=body,
+                                     timeout=timeout or settings.LLM_TIMEOUT) as res:
+                if json_mode and res.status_code in (400, 422):
+                    await res.aread()
+                    if "response_format" in res.text:
+                        print(f"[LLM] {model} rejected response_format - retrying without JSON mode")
+                        _json_mode_unsupported.add(model)
+                        del body["response_format"]
+                        json_mode = False
+                        continue
+                res.raise_for_status()
+                async for line in res.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    choices = json.loads(data).get("choices") or []
+                    if not choices:
+                        continue
+                    if choices[0].get("finish_reason") and finish is not None:
+                        finish["reason"] = choices[0]["finish_reason"]
+                    delta = (choices[0].get("delta") or {}).get("content")
+                    if delta:
+                        yield delta
+                return
+    finally:
+        if own_client:
+            await client.aclose()
+
+
+@tracing.traced("llm.chat")
+async def chat(messages: list, model: str = None, max_tokens: int = 2048) -> str:
+    """Chat completion using shared HTTP client"""
+    data = await _post(messages, model, max_tokens)
+    return data["choices"][0]["message"]["content"]
+
+
+async def _call(template: prompts.PromptTemplate, messages: list, max_tokens: int,
+                tier: str, escalated: bool = False) -> tuple[str, bool]:
+    """One accounted call for a template on a tier's model; returns (content, truncated)"""
+    model, timeout = TIERS[tier]
+    start = time.perf_counter()
     try:
-        # Handle ```json blocks
-        if "```json" in text:
-            text = text.split("```json")[1].split("```")[0]
-        elif "```" in text:
-            text = text.split("```")[1].split("```")[0]
-        return json.loads(text.strip())
-    except:
-        pass
-    
+        with tracing.span("llm.call", prompt=template.name, model=model):
+            data = await _post(messages, model, max_tokens, json_mode=template.json_mode, timeout=timeout)
+    except Exception:
+        latency = time.perf_counter() - start
+        template.record(messages, latency, error=True)
+        _record_model(model, template.name, latency, error=True, escalated=escalated)
+        raise
+    latency = time.perf_counter() - start
+    choice = data["choices"][0]
+    content = choice["message"]["content"] or ""
+    truncated = choice.get("finish_reason") == "length"
+    usage = data.get("usage") or {}
+    template.record(messages, latency, usage, content, truncated=truncated)
+    _record_model(model, template.name, latency, escalated=escalated)
+    for kind in ("prompt", "completion"):
+        if usage.get(f"{kind}_tokens"):
+            metrics.LLM_TOKENS.inc(template.name, kind, amount=usage[f"{kind}_tokens"])
+    return content, truncated
+
+
+async def complete(name: str, max_tokens: int = None, **fields) -> str:
+    """Render a registered prompt template, call its routed model and record token/latency stats"""
+    template = prompts.get(name)
+    content, _ = await _call(template, template.render(**fields), max_tokens or template.max_tokens, route(template))
+    return content
+
+
+REPAIR_ECHO_CHARS = 4000  # Invalid reply quoted back in the repair request
+
+
+async def complete_structured(name: str, fallback=None, max_tokens: int = None, **fields):
+    """complete() parsed against the template's output schema.
+
+    An unusable reply gets one targeted repair call: a truncated reply is
+    asked again for a shorter answer with more room, anything else is sent
+    back with the validation error. The repair runs on the next larger tier
+    (LLM_ESCALATE). If that fails too, fallback is returned (called with the
+    raw reply if it is callable); a dict fallback comes back as a copy with
+    "degraded": True, see is_degraded().
+    """
+    template = prompts.get(name)
+    max_tokens = max_tokens or template.max_tokens
+    messages = template.render(**fields)
+    tier = route(template)
+    content, truncated = await _call(template, messages, max_tokens, tier)
     try:
-        # Find JSON array or object in text
-        import re
-        match = re.search(r'(\[[\s\S]*\]|\{[\s\S]*\})', text)
-        if match:
-            return json.loads(match.group(1))
-    except:
-        pass
-    
-    return fallback
+        with tracing.span("llm.parse", prompt=name):
+            result = structured.parse(content, template.output)
+        template.record_parse("ok")
+        return result
+    except structured.OutputError as e:
+        return await _repair(template, messages, max_tokens, tier, content, truncated, e, fallback)
+
+
+async def _repair(template: prompts.PromptTemplate, messages: list, max_tokens: int, tier: str,
+                  content: str, truncated: bool, error: Exception, fallback):
+    """The single repair attempt of complete_structured()"""
+    if truncated:
+        repair = messages + [{"role": "user", "content": "Your previous reply was cut off. Answer again, more briefly, as complete JSON."}]
+        max_tokens = int(max_tokens * 1.5)
+    else:
+        repair = messages + [
+            {"role": "assistant", "content": content[:REPAIR_ECHO_CHARS]},
+            {"role": "user", "content": f"That reply is not usable ({error}). Return only the corrected JSON: {template.schema}"},
+        ]
+    repair_tier = ESCALATION.get(tier, tier) if settings.LLM_ESCALATE else tier
+    if repair_tier != tier:
+        template.stats["escalations"] += 1
+    try:
+        content, _ = await _call(template, repair, max_tokens, repair_tier, escalated=repair_tier != tier)
+        result = structured.parse(content, template.output)
+        template.record_parse("repaired")
+        return result
+    except Exception as e:
+        print(f"[LLM] {template.name}: unusable output after repair - {e}")
+        template.record_parse("failed")
+        result = fallback(content) if callable(fallback) else fallback
+        return {**result, "degraded": True} if isinstance(result, dict) else result
+
+
+def is_degraded(result) -> bool:
+    """True for a dict fallback from complete_structured() - never cache or persist it as an answer"""
+    return isinstance(result, dict) and result.get("degraded") is True
+
+
+# Market context prompt fragments: one per canonical role, rebuilt per dataset
+# version. Free-text roles are resolved to a canonical title through a bounded
+# LRU, so user input never grows the fragment table.
+_market_fragments: dict[str, str] = {}
+_role_resolutions = LRUCache("market_context_roles", max_entries=512)
+
+
+@on_reload
+def _build_market_fragments():
+    """Precompute the context for every canonical role of the current dataset"""
+    data = get_market_data()
+    header = f"""
+MARKET DATA (2025-2030):
+- Hot Skills: {', '.join(s['skill'] for s in data['top_skills_global'][:5])}
+- Top Certs: {', '.join(c['name'] for c in data['top_certifications'][:4])}
+- Declining: {', '.join(j['role'] for j in data['declining_roles'][:3])}
+"""
+    by_outlook: dict[str, str] = {}  # Roles with the same outlook share one string
+
+    def fragment(outlook: str) -> str:
+        if outlook not in by_outlook:
+            by_outlook[outlook] = f"{header}- Role: {outlook}\n"
+        return by_outlook[outlook]
+
+    fragments = {"": fragment("stable")}
+    for title in get_role_titles():
+        fragments[title] = fragment(get_role_outlook(title)["outlook"])
+    global _market_fragments
+    _market_fragments = fragments
+    _role_resolutions.clear()
 
 
-# Market context - lazy loaded
-_market_context_cache = {}
+_build_market_fragments()
+
 
 def _get_market_context(target_role: str = "") -> str:
-    """Get job market context (cached)"""
-    cache_key = target_role.lower()[:20]
-    if cache_key in _market_context_cache:
-        return _market_context_cache[cache_key]
-    
-    from job_market import JOB_MARKET_DATA, get_role_outlook
-    role_outlook = get_role_outlook(target_role) if target_role else {}
-    
-    ctx = f"""
-MARKET DATA (2025-2030):
-- Hot Skills: {', '.join(s['skill'] for s in JOB_MARKET_DATA['top_skills_global'][:5])}
-- Top Certs: {', '.join(c['name'] for c in JOB_MARKET_DATA['top_certifications'][:4])}
-- Declining: {', '.join(j['role'] for j in JOB_MARKET_DATA['declining_roles'][:3])}
-- Role: {role_outlook.get('outlook', 'stable')}
-"""
-    _market_context_cache[cache_key] = ctx
-    return ctx
+    """Job market context for a prompt (precomputed per canonical role)"""
+    key = " ".join(target_role.lower().split())[:100]
+    if not key:
+        return _market_fragments[""]
+    title = _role_resolutions.get(key)
+    if title is None:
+        title = resolve_role(key) or ""
+        _role_resolutions.set(key, title)
+    return _market_fragments.get(title, _market_fragments[""])
+
+
+def get_market_context_stats() -> dict:
+    return {
+        "fragments": len(_market_fragments),
+        "distinct_texts": len({id(f) for f in _market_fragments.values()}),
+        "approx_bytes": approx_size(_market_fragments),
+        "role_resolutions": _role_resolutions.stats(),
+    }
 
 
-RESUME_ANALYSIS_PROMPT = """Expert ATS analyzer. Score resumes on: Contact(10), Summary(15), Experience(30), Skills(15), Education(10), ATS(10), Impact(10). Consider hot/outdated skills."""
+# Stored analyses are reused only for the same prompt version (see prompts.py)
+RESUME_PROMPT_VERSION = prompts.get("resume_analyze").version
 
-async def analyze_resume(text: str, target_role: str = "") -> dict:
-    """Analyze resume with scoring + market context"""
-    prompt = f"""{_get_market_context(target_role)}
-{"Target: " + target_role if target_role else ""}
-Return JSON: {{"score":0-100,"grade":"A-F","summary":"...","skills_found":[],"skills_hot":[],"skills_outdated":[],"gaps":[],"improvements":[{{"priority":"high","issue":"...","fix":"..."}}],"certifications_recommended":[],"market_readiness":"high|medium|low","career_trajectory":"growing|stable|at_risk"}}
+# Token budgets for the resume body sent to the LLM
+RESUME_TOKEN_BUDGET = 1200
+ENHANCE_TOKEN_BUDGET = 1800
+# Resumes above this many tokens are digested chunk-by-chunk (map) before scoring (reduce)
+MAP_REDUCE_THRESHOLD = 3600
+MAP_CHUNK_TOKENS = 1200
+MAP_CONCURRENCY = 3
 
-Resume:
-{text[:4000]}"""
 
-    result = await chat([
-        {"role": "system", "content": RESUME_ANALYSIS_PROMPT},
-        {"role": "user", "content": prompt}
-    ], max_tokens=1500)
-    
-    return _parse_json(result) or {"score": 50, "grade": "C", "summary": "Parse error", "skills_found": [], "gaps": []}
+async def _digest_chunk(chunk: str, sem: asyncio.Semaphore) -> dict:
+    """Map step - extract facts from one section-aligned chunk"""
+    async with sem:
+        return await complete_structured("resume_digest_chunk", {}, chunk=chunk)
 
 
-async def enhance_resume(text: str, target_role: str = "", focus_areas: list = None) -> dict:
-    """Enhance resume for market competitiveness"""
-    focus = ", ".join(focus_areas) if focus_areas else "ATS optimization"
-    
-    prompt = f"""{_get_market_context(target_role)}
-Enhance for: {focus}. Target: {target_role or "general"}
-Return JSON: {{"enhanced_resume":"markdown","changes_made":[{{"section":"...","before":"...","after":"..."}}],"score_before":0,"score_after":0,"market_readiness_before":"low","market_readiness_after":"high"}}
+async def _map_reduce_resume(text: str) -> tuple[str, int]:
+    """Digest every chunk concurrently and merge into one compact fact sheet.
 
-Resume:
-{text[:4000]}"""
+    Returns (digest_text, tokens_sent_in_map_calls).
+    """
+    chunks = chunk_sections(text, MAP_CHUNK_TOKENS)
+    sem = asyncio.Semaphore(MAP_CONCURRENCY)
+    parts = await asyncio.gather(*(_digest_chunk(c, sem) for c in chunks), return_exceptions=True)
 
-    result = await chat([
-        {"role": "system", "content": "Expert resume writer. Use action verbs, quantify achievements, add hot skills."},
-        {"role": "user", "content": prompt}
-    ], max_tokens=2000)
-    
-    return _parse_json(result) or {"enhanced_resume": result, "changes_made": []}
+    merged = {"skills": [], "highlights": [], "education": [], "issues": []}
+    for part in parts:
+        if not isinstance(part, dict):
+            continue
+        for key, items in merged.items():
+            for item in part.get(key) or []:
+                item = str(item).strip()
+                if item and item not in items:
+                    items.append(item)
+
+    digest = "\n".join(
+        f"## {key.upper()} (full document)\n" + "\n".join(f"- {i}" for i in items[:25])
+        for key, items in merged.items() if items
+    )
+    return digest, sum(estimate_tokens(c) for c in chunks)
+
+
+async def analyze_resume(text: str, target_role: str = "") -> dict:
+    """Analyze resume with scoring + market context"""
+    resume, stats = compact_resume(text, RESUME_TOKEN_BUDGET)
+    strategy = "compact"
+    if stats["truncated"] and stats["tokens_original"] > MAP_REDUCE_THRESHOLD:
+        # Long resume: keep a smaller verbatim excerpt plus a digest of everything
+        resume, stats = compact_resume(text, RESUME_TOKEN_BUDGET // 2)
+        digest, map_tokens = await _map_reduce_resume(text)
+        resume = f"{resume}\n\n{digest}"
+        stats["tokens_sent"] = estimate_tokens(resume) + map_tokens
+        stats["tokens_saved"] = max(stats["tokens_original"] - stats["tokens_sent"], 0)
+        strategy = "map_reduce"
+    record_stats(stats, strategy)
+
+    return await complete_structured(
+        "resume_analyze",
+        {"score": 50, "grade": "C", "summary": "Parse error", "skills_found": [], "gaps": []},
+        market_context=_get_market_context(target_role),
+        target_line=f"Target: {target_role}" if target_role else "",
+        resume=resume
+    )
+
+
+async def rescore_sections(changed: list, removed: list, previous: dict, target_role: str = "") -> dict:
+    """Re-score only the edited sections of a resume against its previous analysis"""
+    sections = "\n\n".join(f"## {name.upper()}\n{body}" for name, body in changed)
+    return await complete_structured(
+        "resume_rescore",
+        {},
+        target_line=f"Target: {target_role}" if target_role else "",
+        score=previous.get("score", 50),
+        grade=previous.get("grade", "C"),
+        skills=", ".join(previous.get("skills_found", [])[:20]),
+        gaps=", ".join(str(g) for g in previous.get("gaps", [])[:10]),
+        removed=", ".join(removed) or "none",
+        sections=sections
+    )
 
 
-RESUME_SYS = "Expert resume writer. ATS-friendly, action verbs, quantified achievements, hot skills: AI/ML, Cloud, Data."
+async def enhance_resume(text: str, target_role: str = "", focus_areas: list = None) -> dict:
+    """Enhance resume for market competitiveness"""
+    focus = ", ".join(focus_areas) if focus_areas else "ATS optimization"
+    # The rewrite must cover the whole resume, so no map-reduce here - just a larger budget
+    resume, stats = compact_resume(text, ENHANCE_TOKEN_BUDGET)
+    record_stats(stats)
+    
+    return await complete_structured(
+        "resume_enhance",
+        lambda raw: {"enhanced_resume": raw, "changes_made": []},
+        market_context=_get_market_context(target_role),
+        focus=focus,
+        target=target_role or "general",
+        resume=resume
+    )
 
 
 async def generate_resume(data: dict, target_role: str = "") -> str:
     """Generate resume from user data"""
     d = data
-    prompt = f"""{_get_market_context(target_role)}
-Create markdown resume:
-Name: {d.get('name')} | {d.get('email')} | {d.get('phone')} | {d.get('location')}
-Experience: {_format_experience(d.get('experience', []))}
-Education: {_format_education(d.get('education', []))}
-Skills: {', '.join(d.get('technical_skills', []))}
-Target: {target_role or 'general'}"""
-
-    return await chat([
-        {"role": "system", "content": RESUME_SYS},
-        {"role": "user", "content": prompt}
-    ], max_tokens=1500)
+    return await complete(
+        "resume_generate",
+        market_context=_get_market_context(target_role),
+        name=d.get('name'),
+        email=d.get('email'),
+        phone=d.get('phone'),
+        location=d.get('location'),
+        experience=_format_experience(d.get('experience', [])),
+        education=_format_education(d.get('education', [])),
+        skills=', '.join(d.get('technical_skills', [])),
+        target=target_role or 'general'
+    )
 
 
 def _format_experience(exp: list) -> str:
@@ -158,56 +459,212 @@ def _format_education(edu: list) -> str:
 
 
 # ═══════════════════════════════════════════════════════════════
-# INTERVIEW FUNCTIONS
+# SEMANTIC CACHE (generation prompts)
 # ═══════════════════════════════════════════════════════════════
 
-INTERVIEW_SYS = "Senior interviewer. Test theory + practice. STAR for behavioral. Easy→hard progression."
+# Per-prompt similarity thresholds over canonicalized request text. Quizzes
+# are partitioned by exact skill key, so only synonyms share a quiz; learning
+# plans are cached per skill instead (see LEARNING PLANS below).
+_semantic = {
+    name: SemanticCache(name, threshold, max_entries=settings.SEMANTIC_CACHE_ENTRIES)
+    for name, threshold in (("quiz_generate", 0.9), ("interview_questions", 0.85))
+}
+for _cache in _semantic.values():
+    memory_governor.register(_cache)
+
+
+def _canonical_role(role: str) -> str:
+    return (resolve_role(role) or " ".join(role.split())).lower()
+
+
+async def _cached_generation(name: str, partition: tuple, text: str, fallback, **fields):
+    """complete_structured() behind the prompt's semantic cache (fallback results are not cached)"""
+    cache = _semantic[name] if settings.SEMANTIC_CACHE else None
+    if cache is not None:
+        hit = cache.get(partition, text)
+        if hit is not None:
+            return hit
+    result = await complete_structured(name, fallback, **fields)
+    if cache is not None and result is not fallback and result and not is_degraded(result):
+        cache.set(partition, text, result)
+    return result
+
+
+def get_semantic_cache_stats() -> dict:
+    return {
+        "enabled": settings.SEMANTIC_CACHE,
+        **{name: cache.stats() for name, cache in _semantic.items()},
+        "learning_modules": _learning_modules.stats(),
+    }
+
+
+# ═══════════════════════════════════════════════════════════════
+# INTERVIEW FUNCTIONS
+# ═══════════════════════════════════════════════════════════════
 
 async def generate_questions(domain: str, role: str, count: int = 5, difficulty_mix: bool = True) -> list:
     """Generate interview questions"""
-    prompt = f"""Generate {count} interview questions for {role} in {domain}.
-Return JSON: [{{"text":"...","type":"technical|behavioral","expected_points":[],"difficulty":"easy|medium|hard"}}]"""
+    return await _cached_generation(
+        "interview_questions",
+        (count,),
+        f"{_canonical_role(role)} | {' '.join(domain.lower().split())}",
+        [{"text": "Tell me about yourself", "expected_points": [], "difficulty": "easy", "type": "behavioral"}],
+        count=count, role=role, domain=domain
+    )
+
 
-    result = await chat([
-        {"role": "system", "content": INTERVIEW_SYS},
-        {"role": "user", "content": prompt}
-    ], max_tokens=1000)
-    return _parse_json(result) or [{"text": "Tell me about yourself", "expected_points": [], "difficulty": "easy", "type": "behavioral"}]
+def _evaluation_fallback() -> dict:
+    return {"score": 50, "grade": "C", "feedback": "Could not evaluate"}
 
 
 async def evaluate_answer(question: str, answer: str, expected_points: list = None) -> dict:
     """Evaluate interview answer"""
-    prompt = f"""Question: {question}
-Expected: {', '.join(expected_points or [])}
-Answer: {answer[:1500]}
-Return JSON: {{"score":0-100,"grade":"A-F","feedback":"...","strengths":[],"improvements":[],"would_hire":bool}}"""
-
-    result = await chat([
-        {"role": "system", "content": "Fair interviewer. Score: relevance, depth, examples, communication."},
-        {"role": "user", "content": prompt}
-    ], max_tokens=500)
-    return _parse_json(result) or {"score": 50, "grade": "C", "feedback": "Could not evaluate"}
+    return await complete_structured(
+        "interview_evaluate",
+        _evaluation_fallback(),
+        question=question,
+        expected=", ".join(expected_points or []),
+        answer=answer[:1500]
+    )
+
+
+async def stream_evaluation(question: str, answer: str, expected_points: list = None, on_feedback=None) -> dict:
+    """evaluate_answer() with the completion streamed: the "feedback" text is passed to
+    the async on_feedback callback as it is generated. Same result and repair path."""
+    template = prompts.get("interview_evaluate")
+    messages = template.render(question=question, expected=", ".join(expected_points or []), answer=answer[:1500])
+    tier = route(template)
+    model, timeout = TIERS[tier]
+    feedback = structured.StringFieldStream("feedback")
+    parts, finish = [], {}
+    start = time.perf_counter()
+    try:
+        with tracing.span("llm.stream", prompt=template.name, model=model):
+            async for delta in _stream_post(messages, model, template.max_tokens, template.json_mode, timeout, finish):
+                parts.append(delta)
+                text = feedback.feed(delta)
+                if text and on_feedback:
+                    await on_feedback(text)
+    except Exception:
+        latency = time.perf_counter() - start
+        template.record(messages, latency, error=True)
+        _record_model(model, template.name, latency, error=True)
+        raise
+    latency = time.perf_counter() - start
+    content = "".join(parts)
+    truncated = finish.get("reason") == "length"
+    template.record(messages, latency, None, content, truncated=truncated)
+    _record_model(model, template.name, latency)
+    try:
+        with tracing.span("llm.parse", prompt=template.name):
+            result = structured.parse(content, template.output)
+        template.record_parse("ok")
+        return result
+    except structured.OutputError as e:
+        return await _repair(template, messages, template.max_tokens, tier, content, truncated, e, _evaluation_fallback())
 
 
-async def generate_learning_plan(gaps: list, role: str, time_available: str = "2h/day") -> list:
-    """Generate learning plan for skill gaps"""
-    prompt = f"""Learning plan for: {', '.join(gaps[:5])}. Role: {role}
-Return JSON: [{{"skill":"...","priority":"high|low","resources":[{{"title":"...","type":"course|video","platform":"..."}}]}}]"""
+# ═══════════════════════════════════════════════════════════════
+# LEARNING PLANS
+# ═══════════════════════════════════════════════════════════════
 
-    result = await chat([{"role": "user", "content": prompt}], max_tokens=1000)
-    return _parse_json(result) or []
+# A plan is one module per skill gap. Modules are cached by (exact skill key,
+# canonical role, time budget), so overlapping gap sets are assembled from
+# cached modules and only unseen skills go to the LLM.
+MAX_PLAN_SKILLS = 5
+DEFAULT_TIME_AVAILABLE = "2h/day"
+_learning_modules = LRUCache("learning_modules", max_entries=settings.LEARNING_MODULE_CACHE_ENTRIES)
+
+
+def _plan_skills(gaps: list) -> dict[str, str]:
+    """Exact skill key -> gap as given, de-duplicated, at most MAX_PLAN_SKILLS"""
+    skills = {}
+    for gap in gaps:
+        key = exact_skill_key(str(gap))
+        if key and key not in skills:
+            skills[key] = str(gap)
+            if len(skills) == MAX_PLAN_SKILLS:
+                break
+    return skills
+
+
+def _plan_context(role: str, time_available: str) -> tuple:
+    return _canonical_role(role), " ".join((time_available or DEFAULT_TIME_AVAILABLE).lower().split())
+
+
+def _store_modules(skills: dict[str, str], context: tuple, plan: list) -> dict[str, dict]:
+    """Assign generated items to the requested skills and cache them; returns key -> module
+
+    An item named differently than asked ("Kubernetes (K8s)") is matched when
+    exactly one open skill shares its canonical skill; anything else is dropped
+    rather than cached under a skill it was not written for.
+    """
+    modules, dropped = {}, 0
+    for item in plan:
+        if not isinstance(item, dict):
+            continue
+        name = str(item.get("skill", ""))
+        key = exact_skill_key(name)
+        if key not in skills:
+            broad = skill_key(name)
+            candidates = [k for k in skills if k not in modules and skill_key(skills[k]) == broad]
+            key = candidates[0] if len(candidates) == 1 else None
+        if key in skills and key not in modules:
+            modules[key] = item
+        else:
+            dropped += 1
+    if dropped:
+        print(f"[LLM] learning_plan: dropped {dropped} module(s) not matching a requested skill")
+    for key, module in modules.items():
+        _learning_modules.set((key, *context), module)
+    return modules
+
+
+def cached_learning_plan(gaps: list, role: str, time_available: str = DEFAULT_TIME_AVAILABLE) -> list | None:
+    """The plan if every skill's module is cached, else None"""
+    context = _plan_context(role, time_available)
+    modules = [_learning_modules.get((key, *context)) for key in _plan_skills(gaps)]
+    return modules if modules and None not in modules else None
+
+
+def remember_learning_plan(gaps: list, role: str, plan: list, time_available: str = DEFAULT_TIME_AVAILABLE) -> None:
+    """Cache the modules of a plan generated elsewhere (the n8n workflow)"""
+    if isinstance(plan, list):
+        _store_modules(_plan_skills(gaps), _plan_context(role, time_available), plan)
+
+
+async def generate_learning_plan(gaps: list, role: str, time_available: str = DEFAULT_TIME_AVAILABLE) -> list:
+    """Generate learning plan for skill gaps (cached modules reused, the LLM asked only for unseen skills)"""
+    skills = _plan_skills(gaps)
+    context = _plan_context(role, time_available)
+    modules = {}
+    for key in skills:
+        module = _learning_modules.get((key, *context))
+        if module is not None:
+            modules[key] = module
+    missing = {key: gap for key, gap in skills.items() if key not in modules}
+    if missing:
+        fallback = []
+        plan = await complete_structured(
+            "learning_plan",
+            fallback,
+            gaps=", ".join(missing.values()), role=role, time_available=context[1]
+        )
+        if plan is not fallback:
+            modules.update(_store_modules(missing, context, plan))
+    return [modules[key] for key in skills if key in modules]
 
 
 async def generate_quiz(skill: str, count: int = 5, difficulty: str = "medium") -> list:
-    """Generate quiz questions"""
-    prompt = f"""Generate {count} MCQ for {skill} ({difficulty}).
-Return JSON: [{{"question":"...","options":["A)...","B)...","C)...","D)..."],"correct":"A","explanation":"..."}}]"""
-
-    result = await chat([
-        {"role": "system", "content": "Educator. Test understanding, plausible wrong answers, code if relevant."},
-        {"role": "user", "content": prompt}
-    ], max_tokens=1000)
-    return _parse_json(result) or []
+    """Generate quiz questions (cached per exact skill, a quiz is never reused for a related one)"""
+    key = exact_skill_key(skill)
+    return await _cached_generation(
+        "quiz_generate",
+        (count, difficulty.lower().strip(), key),
+        key,
+        [],
+        count=count, skill=skill, difficulty=difficulty
+    )
 
 
 def evaluate_quiz(questions: list, answers: list) -> dict:
@@ -246,14 +703,27 @@ def evaluate_quiz(questions: list, answers: list) -> dict:
 # JOB RECOMMENDATIONS
 # ═══════════════════════════════════════════════════════════════
 
-async def get_job_recommendations(skills: list, role: str, location: str = "") -> list:
-    """Get job recommendations based on skills"""
-    from job_market import get_skills_gap_analysis
-    gap = get_skills_gap_analysis(skills, role)
-    
-    prompt = f"""Suggest 5 jobs for: {role}
-Skills: {', '.join(skills[:8])}. Match: {gap['match_percent']}%
-Return JSON: [{{"title":"...","match_percent":0-100,"skills_matched":[],"skills_to_learn":[],"salary_range_usd":"...","growth_outlook":"strong|moderate"}}]"""
+async def enrich_job_recommendations(jobs: list, skills: list, role: str, location: str = "") -> list:
+    """Optional LLM pass over locally ranked jobs: adds a one-line "advice" per job.
 
-    result = await chat([{"role": "user", "content": prompt}], max_tokens=800)
-    return _parse_json(result) or []
+    Ranking, match percentages and skills come from job_market.recommend_roles;
+    on any LLM failure the jobs are returned unchanged.
+    """
+    if not jobs:
+        return jobs
+    unique = [display_name(key) for key in normalize_skills(skills)]
+    titles = "; ".join(f"{job['title']} (missing: {', '.join(job['skills_to_learn'][:3]) or 'none'})" for job in jobs)
+    try:
+        result = await complete_structured(
+            "job_advice",
+            [],
+            skills=", ".join(unique[:8]),
+            role=role or "open",
+            location=location or "any",
+            jobs=titles
+        )
+    except Exception as e:  # HTTP errors, timeouts, open circuit: advice is optional
+        print(f"[LLM] job_advice failed, returning jobs without advice - {e}")
+        return jobs
+    advice = {item["title"]: item["advice"] for item in result}
+    return [{**job, "advice": advice[job["title"]]} if advice.get(job["title"]) else job for job in jobs]
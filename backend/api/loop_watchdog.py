@@ -0,0 +1,193 @@
+"""Event-loop watchdog - lag measurement and blocking-call sites
+
+A loop timer records a heartbeat every tick; the lag of each tick (how late
+it ran) is kept for the last minute. A daemon thread checks the heartbeat,
+and when the loop has not ticked for LOOP_BLOCK_THRESHOLD_MS it captures the
+loop thread's stack - the code that is blocking it. Captures are aggregated
+per site (innermost frame in this app + the innermost frame overall), and
+the tick that ends the stall adds its duration. Off unless LOOP_WATCHDOG.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+from config import settings
+import metrics
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+LAG_WINDOW = 60.0  # Seconds of tick lags kept for percentiles
+STACK_DEPTH = 15  # Frames kept per sample stack
+MAX_SITES = 200  # Distinct blocking sites kept; later new sites count as "other"
+
+
+class BlockingSite:
+    __slots__ = ("site", "call", "count", "total_ms", "max_ms", "last_seen", "stack")
+
+    def __init__(self, site: str, call: str, stack: list[str]):
+        self.site = site
+        self.call = call
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.last_seen = 0.0
+        self.stack = stack
+
+    def as_dict(self) -> dict:
+        return {
+            "site": self.site,
+            "blocking_call": self.call,
+            "count": self.count,
+            "total_ms": round(self.total_ms, 1),
+            "max_ms": round(self.max_ms, 1),
+            "avg_ms": round(self.total_ms / self.count, 1) if self.count else 0.0,
+            "last_seen": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(self.last_seen)),
+            "stack": self.stack,
+        }
+
+
+class LoopWatchdog:
+    def __init__(self, threshold_ms: float):
+        self.threshold = threshold_ms / 1000
+        self.interval = min(self.threshold / 2, 0.05)  # Tick and check period
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread = None
+        self._handle = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()  # sites / _pending are shared with the watcher thread
+        self._beat = 0.0
+        self._expected = 0.0
+        self._captured_beat = None  # Heartbeat whose stall was already captured
+        self._pending: BlockingSite | None = None  # Captured stall waiting for its duration
+        self.lags: deque = deque(maxlen=int(LAG_WINDOW / self.interval))
+        self.sites: dict[tuple, BlockingSite] = {}
+        self.blocks = 0
+        self.unattributed = 0  # Stalls over the threshold that ended before a stack was taken
+        self.started_at = 0.0
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        self.loop = loop
+        self._loop_thread = threading.get_ident()
+        self.started_at = time.time()
+        self._beat = time.monotonic()
+        self._expected = self._beat + self.interval
+        self._handle = loop.call_later(self.interval, self._tick)
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        print(f"[Watchdog] watching event loop (threshold {self.threshold * 1000:.0f}ms)")
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._handle:
+            self._handle.cancel()
+
+    # ── loop side ──
+    def _tick(self) -> None:
+        now = time.monotonic()
+        lag = max(now - self._expected, 0.0)
+        self.lags.append(lag)
+        self._beat = now
+        self._expected = now + self.interval
+        self._handle = self.loop.call_later(self.interval, self._tick)
+        if lag >= self.threshold:
+            self.blocks += 1
+            metrics.LOOP_BLOCKS.inc()
+            with self._lock:
+                site, self._pending = self._pending, None
+                if site is None:
+                    self.unattributed += 1
+                    return
+                site.total_ms += lag * 1000
+                site.max_ms = max(site.max_ms, lag * 1000)
+
+    # ── watcher thread ──
+    def _watch(self) -> None:
+        while not self._stop.wait(self.interval / 2):
+            beat = self._beat
+            if beat == self._captured_beat or time.monotonic() - beat < self.threshold:
+                continue
+            self._captured_beat = beat
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is not None:
+                self._capture(traceback.extract_stack(frame))
+            del frame
+
+    def _capture(self, stack: traceback.StackSummary) -> None:
+        frames = [f for f in stack if not f.filename.startswith(os.path.join(APP_DIR, "loop_watchdog"))]
+        if not frames:
+            return
+        app = next((f for f in reversed(frames) if f.filename.startswith(APP_DIR)), None)
+        leaf = frames[-1]
+        site = f"{os.path.relpath(app.filename, APP_DIR)}:{app.lineno} {app.name}" if app else "(outside app)"
+        call = f"{os.path.basename(leaf.filename)}:{leaf.lineno} {leaf.name}"
+        key = (site, call)
+        with self._lock:
+            entry = self.sites.get(key)
+            if entry is None:
+                if len(self.sites) >= MAX_SITES:
+                    key = ("other", "")
+                    entry = self.sites.get(key)
+                if entry is None:
+                    lines = traceback.format_list(frames[-STACK_DEPTH:])
+                    entry = self.sites[key] = BlockingSite(*key, [line.rstrip() for line in lines])
+            entry.count += 1
+            entry.last_seen = time.time()
+            self._pending = entry
+
+    # ── report ──
+    def report(self) -> dict:
+        lags = sorted(self.lags)
+
+        def pct(p: float) -> float:
+            return round(lags[min(int(len(lags) * p), len(lags) - 1)] * 1000, 2) if lags else 0.0
+
+        with self._lock:
+            sites = sorted(self.sites.values(), key=lambda s: s.total_ms, reverse=True)
+            return {
+                "enabled": True,
+                "threshold_ms": self.threshold * 1000,
+                "tick_ms": self.interval * 1000,
+                "since": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(self.started_at)),
+                "lag_ms": {"p50": pct(0.5), "p99": pct(0.99), "max": pct(1.0), "window_s": LAG_WINDOW},
+                "blocks": self.blocks,
+                "unattributed": self.unattributed,
+                "sites": [s.as_dict() for s in sites],
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self.sites.clear()
+            self._pending = None
+        self.blocks = 0
+        self.unattributed = 0
+        self.lags.clear()
+        self.started_at = time.time()
+
+
+watchdog: LoopWatchdog | None = None
+
+
+def start() -> None:
+    """Start watching the running loop if LOOP_WATCHDOG is on"""
+    global watchdog
+    if settings.LOOP_WATCHDOG and watchdog is None:
+        watchdog = LoopWatchdog(settings.LOOP_BLOCK_THRESHOLD_MS)
+        watchdog.start(asyncio.get_running_loop())
+
+
+def stop() -> None:
+    global watchdog
+    if watchdog:
+        watchdog.stop()
+        watchdog = None
+
+
+def report() -> dict:
+    if watchdog is None:
+        return {"enabled": False, "hint": "set LOOP_WATCHDOG=true to record event-loop stalls"}
+    return watchdog.report()
@@ -1,10 +1,20 @@
 """VidyaMitra API - Optimized for 1GB RAM VPS"""
 
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from config import settings
+from http_cache import FastPathMiddleware
+import extract
+import job_market
+import learning_progress
+import loop_watchdog
+import memory_governor
+import metrics
+import tracing
+import voice
 
 # Shared HTTP client for LLM calls (reused across requests)
 _http_client = None
@@ -18,8 +28,38 @@ async def lifespan(app: FastAPI):
         timeout=60,
         limits=httpx.Limits(max_connections=10, max_keepalive_connections=5)
     )
+    watcher = None
+    if settings.JOB_MARKET_RELOAD_INTERVAL > 0:
+        watcher = asyncio.create_task(job_market.watch_dataset(settings.JOB_MARKET_RELOAD_INTERVAL))
+    sweeper = asyncio.create_task(voice.sweep_sessions())
+    exporter = None
+    if settings.TRACE_EXPORT_FILE or settings.TRACE_OTLP_ENDPOINT:
+        exporter = asyncio.create_task(tracing.export_loop())
+    lag_monitor = asyncio.create_task(metrics.monitor_loop_lag())
+    metrics_dumper = asyncio.create_task(metrics.dump_loop()) if settings.METRICS_DIR else None
+    governor = asyncio.create_task(memory_governor.govern_loop()) if settings.MEMORY_GOVERNOR else None
+    if settings.MEMORY_TRACEMALLOC_FRAMES > 0:
+        memory_governor.start_tracing(settings.MEMORY_TRACEMALLOC_FRAMES)
+    loop_watchdog.start()
     yield
+    loop_watchdog.stop()
+    if governor:
+        governor.cancel()
+    if watcher:
+        watcher.cancel()
+    sweeper.cancel()
+    lag_monitor.cancel()
+    if metrics_dumper:
+        metrics_dumper.cancel()
+    await learning_progress.flush_all()
+    if exporter:
+        exporter.cancel()
+        try:
+            await exporter
+        except asyncio.CancelledError:
+            pass
     await _http_client.aclose()
+    extract.shutdown()
 
 def get_http_client():
     return _http_client
@@ -32,16 +72,26 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+from routes.jobs import FAST_PATHS
+# Added before CORS so CORS still wraps the fast path
+app.add_middleware(FastPathMiddleware, prefix=f"{settings.API_PREFIX}/jobs", routes=FAST_PATHS)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000", "https://*.vercel.app", "*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+app.add_middleware(metrics.MetricsMiddleware)
+# Added last = outermost, so Server-Timing covers the whole request (metrics included)
+app.add_middleware(tracing.TracingMiddleware)
+
 from routes import api_router
 app.include_router(api_router, prefix=settings.API_PREFIX)
+app.include_router(metrics.router)
 
 
 @app.get("/")
@@ -0,0 +1,254 @@
+"""Memory governor - keeps the process under its RSS budget on a 1GB VPS
+
+A background task reads RSS every MEMORY_CHECK_INTERVAL seconds. Above
+MEMORY_HIGH_WATERMARK_MB it evicts the least recently used part of every
+shrinkable cache, collects garbage and hands freed heap back to the OS.
+Pressure ends only below MEMORY_LOW_WATERMARK_MB, so admission does not
+flap around one threshold. Memory-heavy endpoints depend on admit_heavy():
+under pressure new requests wait for it to end, and are shed with a 503
+when the wait queue is full or the wait times out. tracemalloc snapshots can be taken at
+runtime for debugging.
+"""
+
+import asyncio
+import ctypes
+import ctypes.util
+import gc
+import time
+import tracemalloc
+
+from fastapi import HTTPException, Request
+
+from cache import all_caches
+from config import settings
+import metrics
+
+MB = 1024 * 1024
+QUEUE_POLL = 0.5  # Seconds between memory checks while a heavy request waits
+
+_extra_caches: list = []  # Non-LRUCache caches with name/shrink()/stats()
+_counters = {"relief_runs": 0, "evicted": 0, "queued": 0, "admitted_after_wait": 0, "shed": 0}
+_last_relief = {"at": None, "rss_before_mb": None, "rss_after_mb": None, "evicted": 0}
+_last_relief_time = 0.0
+_waiting = 0
+_pressure = False  # Entered at the high watermark, left below the low one
+_baseline: tracemalloc.Snapshot | None = None  # Previous snapshot, for growth diffs
+
+
+def register(cache) -> None:
+    """Let the governor shrink a cache that is not an LRUCache (needs name, shrink(), stats())"""
+    _extra_caches.append(cache)
+
+
+def _shrinkable() -> list:
+    return [c for c in all_caches() if c.shrinkable] + _extra_caches
+
+
+def _high_watermark() -> int:
+    return settings.MEMORY_HIGH_WATERMARK_MB * MB
+
+
+def _low_watermark() -> int:
+    return min(settings.MEMORY_LOW_WATERMARK_MB * MB, _high_watermark())
+
+
+def under_pressure() -> bool:
+    """Over the high watermark, and until RSS is back under the low watermark"""
+    global _pressure
+    if not settings.MEMORY_GOVERNOR:
+        return False
+    rss = metrics.rss_bytes()
+    if rss >= _high_watermark():
+        _pressure = True
+    elif rss < _low_watermark():
+        _pressure = False
+    return _pressure
+
+
+# ═══════════════════════════════════════════════════════════════
+# RELIEF
+# ═══════════════════════════════════════════════════════════════
+
+def _load_malloc_trim():
+    try:
+        return ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6").malloc_trim
+    except (OSError, AttributeError):
+        return None  # Not glibc
+
+
+_malloc_trim = _load_malloc_trim()
+
+
+def relieve(fraction: float = None) -> dict:
+    """Shrink every shrinkable cache by fraction, collect and trim the heap"""
+    global _last_relief_time
+    fraction = settings.MEMORY_SHRINK_FRACTION if fraction is None else fraction
+    before = metrics.rss_bytes()
+    evicted = sum(cache.shrink(fraction) for cache in _shrinkable())
+    gc.collect()
+    if _malloc_trim is not None:
+        _malloc_trim(0)
+    after = metrics.rss_bytes()
+    _last_relief_time = time.monotonic()
+    _counters["relief_runs"] += 1
+    _counters["evicted"] += evicted
+    metrics.MEMORY_EVICTIONS.inc(amount=evicted)
+    _last_relief.update({
+        "at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "rss_before_mb": round(before / MB, 1),
+        "rss_after_mb": round(after / MB, 1),
+        "evicted": evicted,
+    })
+    print(f"[Memory] RSS {before / MB:.0f}MB -> {after / MB:.0f}MB, evicted {evicted} cache entries")
+    return dict(_last_relief)
+
+
+def check() -> None:
+    """Relieve pressure if over the high watermark (at most once per check interval)"""
+    if under_pressure() and time.monotonic() - _last_relief_time >= settings.MEMORY_CHECK_INTERVAL:
+        relieve()
+
+
+async def govern_loop(interval: float = None) -> None:
+    """Background task: check RSS every MEMORY_CHECK_INTERVAL seconds"""
+    while True:
+        await asyncio.sleep(interval or settings.MEMORY_CHECK_INTERVAL)
+        check()
+
+
+# ═══════════════════════════════════════════════════════════════
+# ADMISSION FOR HEAVY REQUESTS
+# ═══════════════════════════════════════════════════════════════
+
+def _shed(request: Request, reason: str) -> HTTPException:
+    _counters["shed"] += 1
+    metrics.MEMORY_SHED.inc(metrics.route_template(request.scope))
+    return HTTPException(
+        status_code=503,
+        detail=f"Server is low on memory ({reason}), please retry shortly",
+        headers={"Retry-After": str(max(int(settings.MEMORY_QUEUE_TIMEOUT), 1))},
+    )
+
+
+async def admit_heavy(request: Request) -> None:
+    """Dependency for memory-heavy endpoints: wait out memory pressure, or 503"""
+    global _waiting
+    if not under_pressure():
+        return
+    if _waiting >= settings.MEMORY_QUEUE_MAX:
+        raise _shed(request, "queue full")
+    _waiting += 1
+    _counters["queued"] += 1
+    try:
+        deadline = time.monotonic() + settings.MEMORY_QUEUE_TIMEOUT
+        while time.monotonic() < deadline:
+            check()
+            await asyncio.sleep(QUEUE_POLL)
+            if not under_pressure():
+                _counters["admitted_after_wait"] += 1
+                return
+        raise _shed(request, "timed out waiting")
+    finally:
+        _waiting -= 1
+
+
+# ═══════════════════════════════════════════════════════════════
+# TRACEMALLOC
+# ═══════════════════════════════════════════════════════════════
+
+_SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+
+def start_tracing(frames: int = 1) -> dict:
+    global _baseline
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+        _baseline = None
+        print(f"[Memory] tracemalloc started ({frames} frame(s))")
+    return tracing_info()
+
+
+def stop_tracing() -> dict:
+    global _baseline
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+        print("[Memory] tracemalloc stopped")
+    _baseline = None
+    return tracing_info()
+
+
+def tracing_info() -> dict:
+    if not tracemalloc.is_tracing():
+        return {"tracing": False}
+    current, peak = tracemalloc.get_traced_memory()
+    return {
+        "tracing": True,
+        "frames": tracemalloc.get_traceback_limit(),
+        "traced_mb": round(current / MB, 2),
+        "peak_traced_mb": round(peak / MB, 2),
+        "overhead_mb": round(tracemalloc.get_tracemalloc_memory() / MB, 2),
+    }
+
+
+def _stat(stat) -> dict:
+    out = {
+        "where": [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+        "kb": round(stat.size / 1024, 1),
+        "count": stat.count,
+    }
+    if hasattr(stat, "size_diff"):
+        out["kb_diff"] = round(stat.size_diff / 1024, 1)
+        out["count_diff"] = stat.count_diff
+    return out
+
+
+def _snapshot_report(limit: int, group_by: str) -> dict:
+    global _baseline
+    snapshot = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+    report = {
+        **tracing_info(),
+        "group_by": group_by,
+        "top": [_stat(s) for s in snapshot.statistics(group_by)[:limit]],
+    }
+    if _baseline is not None:
+        growth = snapshot.compare_to(_baseline, group_by)
+        report["growth_since_last_snapshot"] = [_stat(s) for s in growth[:limit] if s.size_diff > 0]
+    _baseline = snapshot
+    return report
+
+
+async def snapshot(limit: int = 25, group_by: str = "lineno") -> dict | None:
+    """Top allocation sites, plus growth since the previous snapshot; None if not tracing"""
+    if not tracemalloc.is_tracing():
+        return None
+    return await asyncio.to_thread(_snapshot_report, limit, group_by)
+
+
+# ═══════════════════════════════════════════════════════════════
+# STATS
+# ═══════════════════════════════════════════════════════════════
+
+def get_stats() -> dict:
+    rss = metrics.rss_bytes()
+    caches = sorted((c.stats() for c in all_caches() + _extra_caches), key=lambda s: s["approx_bytes"], reverse=True)
+    return {
+        "enabled": settings.MEMORY_GOVERNOR,
+        "rss_mb": round(rss / MB, 1),
+        "high_watermark_mb": settings.MEMORY_HIGH_WATERMARK_MB,
+        "low_watermark_mb": round(_low_watermark() / MB),
+        "under_pressure": under_pressure(),
+        "waiting_requests": _waiting,
+        **_counters,
+        "last_relief": dict(_last_relief),
+        "cache_total_mb": round(sum(s["approx_bytes"] for s in caches) / MB, 2),
+        "caches": [
+            {"name": s["name"], "entries": s["entries"], "max_entries": s["max_entries"], "approx_bytes": s["approx_bytes"]}
+            for s in caches
+        ],
+        "tracemalloc": tracing_info(),
+    }
@@ -0,0 +1,347 @@
+"""Prometheus metrics - in-process registry and /metrics text exposition
+
+Counters, gauges and histograms are plain dicts keyed by label tuples, so
+recording costs a dict update (no client library, no locks - event loop
+only). Cache, memory and event-loop figures are read from their sources at
+scrape time.
+
+With several workers each process has its own registry: set METRICS_DIR
+and every worker writes a snapshot there periodically; /metrics then sums
+counters and histograms over all snapshots (exited workers included, so
+totals never go backwards) and reports gauges per live worker (pid label).
+"""
+
+import asyncio
+import bisect
+import fcntl
+import json
+import os
+import resource
+import time
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response
+
+from config import settings
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+FAST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SLOW_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+DUMP_INTERVAL = 5.0  # Seconds between snapshots written to METRICS_DIR
+LAG_INTERVAL = 0.5  # Seconds between event-loop lag probes
+RETIRED = "retired.json"  # METRICS_DIR file with the summed totals of exited workers
+
+_registry: dict[str, "_Metric"] = {}
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values: dict[tuple, object] = {}
+        _registry[name] = self
+
+    def _series(self, labels: tuple, names: tuple, extra: str = "") -> str:
+        pairs = [f'{k}="{_escape(v)}"' for k, v in zip(names, labels)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, *labels, amount: float = 1.0) -> None:
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def set_total(self, value: float, *labels) -> None:
+        """For totals counted elsewhere (cache hits) and copied in at scrape time"""
+        self.values[labels] = float(value)
+
+    def render(self, values: dict, names: tuple = None) -> list[str]:
+        names = names or self.labels
+        return [f"{self.name}{self._series(k, names)} {_number(v)}" for k, v in values.items()]
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def set(self, value: float, *labels) -> None:
+        self.values[labels] = float(value)
+
+    render = Counter.render
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = FAST_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = buckets
+
+    def observe(self, value: float, *labels) -> None:
+        counts = self.values.get(labels)
+        if counts is None:
+            # Per-bucket counts (non-cumulative), then +Inf, sum
+            counts = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def render(self, values: dict, names: tuple = None) -> list[str]:
+        names = names or self.labels
+        lines = []
+        for labels, counts in values.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{self._series(labels, names, le)} {cumulative}")
+            series = self._series(labels, names)
+            lines.append(f"{self.name}_sum{series} {_number(counts[-1])}")
+            lines.append(f"{self.name}_count{series} {cumulative}")
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+# ═══════════════════════════════════════════════════════════════
+# METRICS
+# ═══════════════════════════════════════════════════════════════
+
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests", ("method", "route", "status"))
+HTTP_LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency", ("method", "route"))
+LLM_CALLS = Counter("llm_calls_total", "LLM calls per prompt (llm function) and model", ("prompt", "model", "outcome"))
+LLM_LATENCY = Histogram("llm_call_duration_seconds", "LLM call latency", ("prompt",), SLOW_BUCKETS)
+LLM_TOKENS = Counter("llm_tokens_total", "LLM tokens used", ("prompt", "kind"))
+N8N_CALLS = Counter("n8n_calls_total", "n8n workflow calls", ("endpoint", "outcome"))
+N8N_LATENCY = Histogram("n8n_call_duration_seconds", "n8n workflow call latency", ("endpoint",), SLOW_BUCKETS)
+DB_LATENCY = Histogram("db_query_duration_seconds", "Database call latency per db function", ("function",))
+CACHE_HITS = Counter("cache_hits_total", "In-process cache hits", ("cache",))
+CACHE_MISSES = Counter("cache_misses_total", "In-process cache misses", ("cache",))
+CACHE_ENTRIES = Gauge("cache_entries", "In-process cache entries", ("cache",))
+LOOP_LAG = Gauge("event_loop_lag_seconds", "Last measured event-loop scheduling delay")
+LOOP_LAG_MAX = Gauge("event_loop_lag_max_seconds", "Largest event-loop scheduling delay since start")
+LOOP_BLOCKS = Counter("event_loop_blocks_total", "Event-loop stalls over LOOP_BLOCK_THRESHOLD_MS (LOOP_WATCHDOG)")
+MEMORY_EVICTIONS = Counter("memory_cache_evictions_total", "Cache entries evicted by the memory governor")
+MEMORY_SHED = Counter("memory_shed_requests_total", "Heavy requests rejected under memory pressure", ("route",))
+RSS = Gauge("process_resident_memory_bytes", "Resident memory")
+CPU = Counter("process_cpu_seconds_total", "CPU time (user + system)")
+START = Gauge("process_start_time_seconds", "Process start time (unix)")
+START.set(time.time())
+
+
+# ═══════════════════════════════════════════════════════════════
+# HTTP MIDDLEWARE
+# ═══════════════════════════════════════════════════════════════
+
+class MetricsMiddleware:
+    """Count and time HTTP requests per route template (not raw path)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            template = route_template(scope)
+            HTTP_REQUESTS.inc(scope["method"], template, status)
+            HTTP_LATENCY.observe(time.perf_counter() - start, scope["method"], template)
+
+
+def route_template(scope) -> str:
+    template = getattr(scope.get("route"), "path", None)
+    if template is None:
+        return scope.get("fast_path") or "unmatched"
+    # Included routers may report their path without the API_PREFIX they are mounted under
+    prefix = settings.API_PREFIX
+    if not template.startswith(prefix) and scope["path"].startswith(prefix + "/"):
+        template = prefix + template
+    return template
+
+
+# ═══════════════════════════════════════════════════════════════
+# SCRAPE-TIME SOURCES
+# ═══════════════════════════════════════════════════════════════
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # Peak, not current (non-Linux)
+
+
+def _collect() -> None:
+    from cache import all_caches
+    import llm
+    RSS.set(rss_bytes())
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    CPU.set_total(usage.ru_utime + usage.ru_stime)
+    caches = [(c.name, c.hits, c.misses, len(c)) for c in all_caches()]
+    semantic = llm.get_semantic_cache_stats()
+    caches += [
+        (stats["name"], stats["exact_hits"] + stats["semantic_hits"], stats["misses"], stats["entries"])
+        for stats in semantic.values() if isinstance(stats, dict) and "semantic_hits" in stats
+    ]
+    for name, hits, misses, entries in caches:
+        CACHE_HITS.set_total(hits, name)
+        CACHE_MISSES.set_total(misses, name)
+        CACHE_ENTRIES.set(entries, name)
+
+
+async def monitor_loop_lag(interval: float = LAG_INTERVAL) -> None:
+    """Background task: how late the event loop wakes a sleeping task"""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(loop.time() - start - interval, 0.0)
+        LOOP_LAG.set(lag)
+        if lag > LOOP_LAG_MAX.values.get((), 0.0):
+            LOOP_LAG_MAX.set(lag)
+
+
+# ═══════════════════════════════════════════════════════════════
+# EXPOSITION (single process or merged METRICS_DIR snapshots)
+# ═══════════════════════════════════════════════════════════════
+
+def snapshot() -> dict:
+    _collect()
+    return {
+        "pid": os.getpid(),
+        "metrics": {name: [[list(k), v] for k, v in m.values.items()] for name, m in _registry.items()},
+    }
+
+
+def _write(snap: dict, name: str = None) -> None:
+    """Write a snapshot to METRICS_DIR (atomic replace)"""
+    path = os.path.join(settings.METRICS_DIR, name or f"{snap['pid']}.json")
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(snap, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+async def dump_loop(interval: float = DUMP_INTERVAL) -> None:
+    """Background task (METRICS_DIR only): keep this worker's snapshot fresh"""
+    os.makedirs(settings.METRICS_DIR, exist_ok=True)
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            # Snapshot on the loop (registry is not thread-safe), write in a thread
+            await asyncio.to_thread(_write, snapshot())
+    finally:
+        _write(snapshot())
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+def _sum(snaps: list[dict]) -> dict[str, dict]:
+    """Counters and histograms summed over snapshots: name -> {labels: value}"""
+    totals: dict[str, dict] = {name: {} for name, m in _registry.items() if not isinstance(m, Gauge)}
+    for snap in snaps:
+        for name, values in snap["metrics"].items():
+            target = totals.get(name)
+            if target is None:
+                continue
+            for labels, value in values:
+                current = target.get(tuple(labels))
+                if current is None:
+                    target[tuple(labels)] = value
+                elif isinstance(value, list):
+                    target[tuple(labels)] = [a + b for a, b in zip(current, value)]
+                else:
+                    target[tuple(labels)] = current + value
+    return totals
+
+
+def _merged(own: dict) -> dict[str, dict]:
+    """name -> {labels: value} over every worker snapshot: totals summed (exited workers
+    included), gauges of live workers only. Exited workers' files are folded into one."""
+    _write(own)
+    with open(os.path.join(settings.METRICS_DIR, ".lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)  # One worker compacts at a time
+        live, dead = [], []
+        for entry in os.scandir(settings.METRICS_DIR):
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                with open(entry.path) as f:
+                    snap = json.load(f)
+            except (OSError, ValueError):
+                continue
+            (dead if snap.get("retired") or not _alive(snap["pid"]) else live).append((entry.path, snap))
+        if len(dead) > 1 or (dead and not dead[0][1].get("retired")):
+            retired = {"pid": 0, "retired": True, "metrics": {
+                name: [[list(k), v] for k, v in values.items()] for name, values in _sum([s for _, s in dead]).items()
+            }}
+            _write(retired, RETIRED)
+            for path, snap in dead:
+                if not snap.get("retired"):
+                    os.remove(path)
+            dead = [(None, retired)]
+    snaps = [s for _, s in live + dead]
+    merged = _sum(snaps)
+    for name, metric in _registry.items():
+        if isinstance(metric, Gauge):
+            merged[name] = {
+                (*labels, snap["pid"]): value for _, snap in live for labels, value in snap["metrics"].get(name, [])
+            }
+    return merged
+
+
+def render(values: dict[str, dict], per_worker: bool = False) -> str:
+    lines = []
+    for name, metric in _registry.items():
+        lines.append(f"# HELP {name} {metric.help}")
+        lines.append(f"# TYPE {name} {metric.type}")
+        names = (*metric.labels, "pid") if per_worker and isinstance(metric, Gauge) else None
+        lines.extend(metric.render(values[name], names))
+    return "\n".join(lines) + "\n"
+
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    """Prometheus scrape endpoint (Bearer METRICS_TOKEN when set)"""
+    if settings.METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {settings.METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    if settings.METRICS_DIR:
+        own = snapshot()
+        body = await asyncio.to_thread(lambda: render(_merged(own), per_worker=True))
+    else:
+        _collect()
+        body = render({name: m.values for name, m in _registry.items()})
+    return Response(body, media_type=CONTENT_TYPE)
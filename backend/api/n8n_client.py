@@ -1,7 +1,11 @@
 """n8n webhook client - proxies requests to n8n workflows"""
 
+import time
+
 import httpx
 from config import settings
+import metrics
+from tracing import traced
 
 # n8n webhook endpoints
 N8N_ENDPOINTS = {
@@ -15,6 +19,7 @@ N8N_ENDPOINTS = {
 }
 
 
+@traced("n8n.call")
 async def call_n8n(endpoint: str, payload: dict) -> dict:
     """
     Call n8n webhook endpoint.
@@ -31,20 +36,28 @@ async def call_n8n(endpoint: str, payload: dict) -> dict:
     
     url = f"{settings.N8N_WEBHOOK_URL}{N8N_ENDPOINTS[endpoint]}"
     
+    start = time.perf_counter()
+    outcome = "ok"
     async with httpx.AsyncClient(timeout=60.0) as client:
         try:
             response = await client.post(url, json=payload)
             response.raise_for_status()
             return response.json()
         except httpx.TimeoutException:
+            outcome = "timeout"
             print(f"[n8n] Timeout calling {endpoint}")
             return {"error": "n8n timeout", "status": "error"}
         except httpx.HTTPStatusError as e:
+            outcome = f"http_{e.response.status_code}"
             print(f"[n8n] HTTP error {e.response.status_code}: {e.response.text}")
             return {"error": f"n8n error: {e.response.status_code}", "status": "error"}
         except Exception as e:
+            outcome = "error"
             print(f"[n8n] Error calling {endpoint}: {e}")
             return {"error": str(e), "status": "error"}
+        finally:
+            metrics.N8N_CALLS.inc(endpoint, outcome)
+            metrics.N8N_LATENCY.observe(time.perf_counter() - start, endpoint)
 
 
 async def is_n8n_available() -> bool:
@@ -0,0 +1,311 @@
+"""Prompt registry - named, versioned templates with token accounting
+
+Templates are compiled once at import: static text is whitespace-compacted
+and JSON schema examples are minified; field values are inserted as given. Every LLM call made through a
+template records estimated and actual token usage and latency, so prompt
+sizes and max_tokens budgets can be tuned from data. Templates with an
+output schema are parsed by structured.py; parse outcomes are counted too.
+
+Prompts that live in the n8n workflow JSON are not covered here.
+"""
+
+import importlib.util
+import re
+from collections import deque
+
+from pydantic import BaseModel
+
+from resume_text import estimate_tokens
+import structured
+
+TIKTOKEN_AVAILABLE = importlib.util.find_spec("tiktoken") is not None
+MESSAGE_OVERHEAD_TOKENS = 4  # Role/formatting tokens per chat message
+
+_encoder = None
+
+
+def count_tokens(text: str) -> int:
+    """Token count via tiktoken when installed, else the chars/4 estimate"""
+    global _encoder
+    if TIKTOKEN_AVAILABLE:
+        if _encoder is None:
+            import tiktoken
+            _encoder = tiktoken.get_encoding("o200k_base")
+        return len(_encoder.encode(text, disallowed_special=()))
+    return estimate_tokens(text)
+
+
+def compact_text(text: str) -> str:
+    """Collapse runs of spaces and drop blank lines (keeps line structure)"""
+    lines = (" ".join(line.split()) for line in text.split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+_SCHEMA_SPACE = re.compile(r'("(?:[^"\\]|\\.)*")|\s+')
+
+
+def compact_schema(schema: str) -> str:
+    """Minify a JSON schema example, keeping whitespace inside strings"""
+    return _SCHEMA_SPACE.sub(lambda m: m.group(1) or "", schema)
+
+
+# ═══════════════════════════════════════════════════════════════
+# TEMPLATES
+# ═══════════════════════════════════════════════════════════════
+
+class PromptTemplate:
+    """A system prompt plus a user template with {fields}; "{schema}" is filled at compile time.
+
+    output is the pydantic schema (a model or list[model]) the reply is
+    validated against; object outputs are requested in JSON mode. tier
+    picks the model ("large" or "fast", see llm.TIERS).
+    """
+
+    def __init__(self, name: str, version: str, user: str, system: str = "",
+                 schema: str = "", max_tokens: int = 1000, output=None, tier: str = "large"):
+        self.name = name
+        self.version = version
+        self.max_tokens = max_tokens
+        self.tier = tier
+        self.output = output
+        self.json_mode = isinstance(output, type) and issubclass(output, BaseModel)
+        self.system = compact_text(system)
+        self.schema = compact_schema(schema)
+        self._user = compact_text(user).replace("{schema}", self.schema.replace("{", "{{").replace("}", "}}"))
+        self.static_tokens = count_tokens(self.system) + count_tokens(self._user.format_map(_Blank()))
+        self.stats = {
+            "calls": 0, "errors": 0, "prompt_tokens_est": 0, "prompt_tokens": 0, "completion_tokens": 0,
+            "truncated": 0, "latency_total": 0.0, "latency_max": 0.0,
+            "parse_ok": 0, "parse_repaired": 0, "parse_failed": 0, "escalations": 0,
+        }
+        self._completions: deque = deque(maxlen=200)  # Recent completion sizes for budget suggestions
+
+    def render(self, **fields) -> list[dict]:
+        """Chat messages for one call; field values go in verbatim (code answers keep their indentation)"""
+        messages = [{"role": "system", "content": self.system}] if self.system else []
+        messages.append({"role": "user", "content": self._user.format(**fields)})
+        return messages
+
+    def record(self, messages: list, latency: float, usage: dict = None,
+               completion: str = "", truncated: bool = False, error: bool = False) -> None:
+        """Account one call; usage is the API's token usage block when available"""
+        stats = self.stats
+        stats["calls"] += 1
+        stats["latency_total"] += latency
+        stats["latency_max"] = max(stats["latency_max"], latency)
+        stats["prompt_tokens_est"] += estimate_messages(messages)
+        if error:
+            stats["errors"] += 1
+            return
+        usage = usage or {}
+        completion_tokens = usage.get("completion_tokens") or count_tokens(completion)
+        stats["prompt_tokens"] += usage.get("prompt_tokens") or estimate_messages(messages)
+        stats["completion_tokens"] += completion_tokens
+        stats["truncated"] += truncated
+        self._completions.append(completion_tokens)
+
+    def record_parse(self, outcome: str) -> None:
+        """Count a structured parse outcome: ok, repaired (after one retry) or failed"""
+        self.stats[f"parse_{outcome}"] += 1
+
+    def summary(self) -> dict:
+        stats = self.stats
+        ok = stats["calls"] - stats["errors"]
+        recent = sorted(self._completions)
+        p95 = recent[min(int(len(recent) * 0.95), len(recent) - 1)] if recent else 0
+        parsed = stats["parse_ok"] + stats["parse_repaired"] + stats["parse_failed"]
+        return {
+            "version": self.version,
+            "tier": self.tier,
+            "max_tokens": self.max_tokens,
+            "static_tokens": self.static_tokens,
+            **stats,
+            "latency_total": round(stats["latency_total"], 3),
+            "latency_max": round(stats["latency_max"], 3),
+            "avg_latency": round(stats["latency_total"] / stats["calls"], 3) if stats["calls"] else 0.0,
+            "avg_prompt_tokens": stats["prompt_tokens"] // ok if ok else 0,
+            "avg_completion_tokens": stats["completion_tokens"] // ok if ok else 0,
+            "p95_completion_tokens": p95,
+            # Headroom over the observed p95, never below what the longest recent reply needed
+            "suggested_max_tokens": max(int(p95 * 1.25), recent[-1]) if recent else self.max_tokens,
+            "json_mode": self.json_mode,
+            # Share of first replies that could not be used as-is / at all
+            "parse_failure_rate": round((stats["parse_repaired"] + stats["parse_failed"]) / parsed, 3) if parsed else 0.0,
+            "unrecovered_rate": round(stats["parse_failed"] / parsed, 3) if parsed else 0.0,
+        }
+
+
+class _Blank(dict):
+    def __missing__(self, key):
+        return ""
+
+
+def estimate_messages(messages: list) -> int:
+    return sum(count_tokens(m["content"]) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+_registry: dict[str, PromptTemplate] = {}
+
+
+def register(template: PromptTemplate) -> PromptTemplate:
+    _registry[template.name] = template
+    return template
+
+
+def get(name: str) -> PromptTemplate:
+    return _registry[name]
+
+
+def names() -> list[str]:
+    return list(_registry)
+
+
+def get_stats() -> dict:
+    """Per-template token and latency statistics since process start"""
+    return {name: template.summary() for name, template in _registry.items()}
+
+
+# ═══════════════════════════════════════════════════════════════
+# RESUME
+# ═══════════════════════════════════════════════════════════════
+
+RESUME_ANALYSIS_SYS = ("Expert ATS analyzer. Score resumes on: Contact(10), Summary(15), Experience(30), "
+                       "Skills(15), Education(10), ATS(10), Impact(10). Consider hot/outdated skills.")
+
+# Bump the version when the analysis prompt changes so stored analyses are not reused
+register(PromptTemplate(
+    "resume_analyze", "v2",
+    system=RESUME_ANALYSIS_SYS,
+    schema="""{"score":0-100,"grade":"A-F","summary":"...","skills_found":[],"skills_hot":[],"skills_outdated":[],
+    "gaps":[],"improvements":[{"priority":"high","issue":"...","fix":"..."}],"certifications_recommended":[],
+    "market_readiness":"high|medium|low","career_trajectory":"growing|stable|at_risk"}""",
+    user="""{market_context}
+{target_line}
+Return JSON: {schema}
+
+Resume:
+{resume}""",
+    max_tokens=1500,
+    output=structured.ResumeAnalysis,
+))
+
+register(PromptTemplate(
+    "resume_digest_chunk", "v1",
+    system="Extract resume facts. Be terse.",
+    schema='{"skills":[],"highlights":[],"education":[],"issues":[]}',
+    user="""Return JSON: {schema}
+
+Resume part:
+{chunk}""",
+    max_tokens=400,
+    output=structured.ResumeDigest,
+    tier="fast",
+))
+
+register(PromptTemplate(
+    "resume_rescore", "v1",
+    system=RESUME_ANALYSIS_SYS,
+    schema="""{"score":0-100,"grade":"A-F","summary":"...","skills_added":[],"skills_removed":[],"gaps_resolved":[],
+    "gaps_added":[],"improvements":[{"priority":"high","issue":"...","fix":"..."}]}""",
+    user="""{target_line}
+Previous analysis: score {score}, grade {grade}
+Skills found: {skills}
+Gaps: {gaps}
+Removed sections: {removed}
+Only these sections changed. Re-score the whole resume given the changes.
+Return JSON: {schema}
+
+Changed sections:
+{sections}""",
+    max_tokens=600,
+    output=structured.ResumeRescore,
+))
+
+register(PromptTemplate(
+    "resume_enhance", "v1",
+    system="Expert resume writer. Use action verbs, quantify achievements, add hot skills.",
+    schema="""{"enhanced_resume":"markdown","changes_made":[{"section":"...","before":"...","after":"..."}],
+    "score_before":0,"score_after":0,"market_readiness_before":"low","market_readiness_after":"high"}""",
+    user="""{market_context}
+Enhance for: {focus}. Target: {target}
+Return JSON: {schema}
+
+Resume:
+{resume}""",
+    max_tokens=2000,
+    output=structured.ResumeEnhancement,
+))
+
+register(PromptTemplate(
+    "resume_generate", "v1",
+    system="Expert resume writer. ATS-friendly, action verbs, quantified achievements, hot skills: AI/ML, Cloud, Data.",
+    user="""{market_context}
+Create markdown resume:
+Name: {name} | {email} | {phone} | {location}
+Experience: {experience}
+Education: {education}
+Skills: {skills}
+Target: {target}""",
+    max_tokens=1500,
+))
+
+# ═══════════════════════════════════════════════════════════════
+# INTERVIEW / LEARNING / QUIZ / JOBS
+# ═══════════════════════════════════════════════════════════════
+
+register(PromptTemplate(
+    "interview_questions", "v1",
+    system="Senior interviewer. Test theory + practice. STAR for behavioral. Easy→hard progression.",
+    schema='[{"text":"...","type":"technical|behavioral","expected_points":[],"difficulty":"easy|medium|hard"}]',
+    user="""Generate {count} interview questions for {role} in {domain}.
+Return JSON: {schema}""",
+    max_tokens=1000,
+    output=list[structured.InterviewQuestion],
+    tier="fast",
+))
+
+register(PromptTemplate(
+    "interview_evaluate", "v1",
+    system="Fair interviewer. Score: relevance, depth, examples, communication.",
+    schema='{"score":0-100,"grade":"A-F","feedback":"...","strengths":[],"improvements":[],"would_hire":bool}',
+    user="""Question: {question}
+Expected: {expected}
+Answer: {answer}
+Return JSON: {schema}""",
+    max_tokens=500,
+    output=structured.AnswerEvaluation,
+    tier="fast",  # Voice path - latency matters more than depth
+))
+
+register(PromptTemplate(
+    "learning_plan", "v2",
+    schema='[{"skill":"...","priority":"high|low","resources":[{"title":"...","type":"course|video","platform":"..."}]}]',
+    user="""Learning plan for: {gaps}. Role: {role}. Time: {time_available}
+One item per skill, in the order given.
+Return JSON: {schema}""",
+    max_tokens=1000,
+    output=list[structured.LearningItem],
+    tier="fast",
+))
+
+register(PromptTemplate(
+    "quiz_generate", "v1",
+    system="Educator. Test understanding, plausible wrong answers, code if relevant.",
+    schema='[{"question":"...","options":["A)...","B)...","C)...","D)..."],"correct":"A","explanation":"..."}]',
+    user="""Generate {count} MCQ for {skill} ({difficulty}).
+Return JSON: {schema}""",
+    max_tokens=1000,
+    output=list[structured.QuizQuestion],
+    tier="fast",
+))
+
+register(PromptTemplate(
+    "job_advice", "v1",
+    schema='[{"title":"...","advice":"..."}]',
+    user="""Candidate skills: {skills}. Target: {role}. Location: {location}
+Jobs: {jobs}
+For each job give one concrete next step. Return JSON: {schema}""",
+    max_tokens=400,
+    output=list[structured.JobAdvice],
+    tier="fast",
+))
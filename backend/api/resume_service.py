@@ -0,0 +1,184 @@
+"""Resume analysis with content-hash dedup and analysis reuse
+
+Resumes are keyed by a hash of their normalized text. An analysis for the
+same (hash, target_role, prompt version) is served from memory or from the
+stored analysis_json instead of calling the LLM again, and identical text is
+stored once in resume_contents.
+
+In incremental mode a re-submitted resume is diffed against the user's most
+recent stored version for the same role and prompt version, and only the
+edited sections are re-scored.
+"""
+
+from cache import LRUCache
+from resume_text import content_hash, diff_sections, estimate_tokens
+import db
+import llm
+import n8n_client
+
+# Prompt version used for analyses produced by the n8n Resume Analyzer workflow
+N8N_PROMPT_VERSION = "n8n-v1"
+
+# Fall back to a full analysis when more than this share of the resume changed
+INCREMENTAL_MAX_CHANGE = 0.5
+
+_analysis_cache = LRUCache("resume_analysis", max_entries=256)
+_stats = {"lookups": 0, "memory_hits": 0, "db_hits": 0, "misses": 0, "incremental": 0, "incremental_skipped": 0}
+
+
+def normalize_role(target_role: str) -> str:
+    """Target role as stored and looked up: whitespace collapsed (matched case-insensitively)"""
+    return " ".join((target_role or "").split())
+
+
+def _analysis_key(digest: str, target_role: str, prompt_version: str) -> tuple:
+    return (digest, normalize_role(target_role).lower(), prompt_version)
+
+
+def remember_analysis(digest: str, target_role: str, prompt_version: str, analysis: dict) -> None:
+    """Make a fresh analysis available to later lookups without a DB round trip (fallbacks are skipped)"""
+    if analysis and not llm.is_degraded(analysis):
+        _analysis_cache.set(_analysis_key(digest, target_role, prompt_version), analysis)
+
+
+async def find_cached_analysis(digest: str, target_role: str, prompt_version: str) -> dict | None:
+    """Look up a previous analysis in memory, then in the resumes table"""
+    _stats["lookups"] += 1
+    key = _analysis_key(digest, target_role, prompt_version)
+    analysis = _analysis_cache.get(key)
+    if analysis is not None:
+        _stats["memory_hits"] += 1
+        return analysis
+
+    analysis = await db.find_resume_analysis(digest, normalize_role(target_role), prompt_version)
+    if analysis:
+        _stats["db_hits"] += 1
+        _analysis_cache.set(key, analysis)
+        return analysis
+
+    _stats["misses"] += 1
+    return None
+
+
+def _merge_analysis(previous: dict, delta: dict, changed: list, base_id: str) -> dict:
+    """Apply a partial re-score on top of the previous full analysis"""
+    merged = {key: value for key, value in previous.items() if key not in ("degraded", "incremental")}
+    for key in ("score", "grade", "summary"):
+        if delta.get(key) not in (None, ""):
+            merged[key] = delta[key]
+
+    removed_skills = {s.lower() for s in delta.get("skills_removed", [])}
+    skills = [s for s in previous.get("skills_found", []) if s.lower() not in removed_skills]
+    skills += [s for s in delta.get("skills_added", []) if s not in skills]
+    merged["skills_found"] = skills
+
+    resolved = {str(g).lower() for g in delta.get("gaps_resolved", [])}
+    gaps = [g for g in previous.get("gaps", []) if str(g).lower() not in resolved]
+    gaps += [g for g in delta.get("gaps_added", []) if g not in gaps]
+    merged["gaps"] = gaps
+
+    if delta.get("improvements"):
+        merged["improvements"] = delta["improvements"]
+    merged["incremental"] = {"base_resume_id": base_id, "changed_sections": [name for name, _ in changed]}
+    return merged
+
+
+async def _analyze_incremental(user_id: str, resume_text: str, target_role: str) -> dict | None:
+    """Re-score only changed sections against the latest stored resume for the same target_role.
+
+    Only analyses from the current prompt version are built on, and never a
+    fallback. Returns the merged analysis, or None when a full analysis is needed.
+    """
+    previous = await db.get_latest_resume(user_id, target_role, llm.RESUME_PROMPT_VERSION)
+    if not previous or not previous.get("resume_text") or not previous.get("analysis_json"):
+        return None
+    if llm.is_degraded(previous["analysis_json"]):
+        return None
+
+    diff = diff_sections(previous["resume_text"], resume_text)
+    if not diff["changed"] and not diff["removed"]:
+        _stats["incremental"] += 1
+        return previous["analysis_json"]
+    changed_tokens = sum(estimate_tokens(body) for _, body in diff["changed"])
+    if diff["change_ratio"] > INCREMENTAL_MAX_CHANGE or changed_tokens > llm.RESUME_TOKEN_BUDGET:
+        _stats["incremental_skipped"] += 1
+        return None
+
+    delta = await llm.rescore_sections(diff["changed"], diff["removed"], previous["analysis_json"], target_role)
+    if not delta or llm.is_degraded(delta):
+        return None
+    _stats["incremental"] += 1
+    print(f"[Resume] incremental re-score of {[name for name, _ in diff['changed']]} "
+          f"({diff['change_ratio']:.0%} changed)")
+    return _merge_analysis(previous["analysis_json"], delta, diff["changed"], previous.get("id"))
+
+
+async def analyze_and_save(user_id: str, resume_text: str, target_role: str = "",
+                           file_url: str = None, n8n_payload: dict = None,
+                           incremental: bool = False) -> dict:
+    """Analyze a resume (reusing previous results when possible) and save it.
+
+    When n8n_payload is given the n8n Resume Analyzer workflow is tried first.
+    With incremental=True only sections edited since the user's last resume
+    are re-scored.
+    Returns {"analysis", "resume_id", "cached"}.
+    """
+    target_role = normalize_role(target_role)
+    digest = content_hash(resume_text)
+    lookup_version = N8N_PROMPT_VERSION if n8n_payload else llm.RESUME_PROMPT_VERSION
+
+    analysis = await find_cached_analysis(digest, target_role, lookup_version)
+    cached = analysis is not None
+    prompt_version = lookup_version
+
+    if not cached and incremental:
+        analysis = await _analyze_incremental(user_id, resume_text, target_role)
+        if analysis is not None:
+            prompt_version = llm.RESUME_PROMPT_VERSION
+
+    if analysis is None and n8n_payload:
+        result = await n8n_client.call_n8n("resume_analyze", n8n_payload)
+        if result.get("status") != "error":
+            # n8n returns: { status, analysis: { score, grade, summary, strengths, improvements, missing_keywords } }
+            # An empty analysis counts as a failure and falls through to the LLM
+            analysis = result.get("analysis") or None
+
+    if analysis is None:
+        # Direct LLM (or fallback when n8n fails)
+        prompt_version = llm.RESUME_PROMPT_VERSION
+        analysis = await llm.analyze_resume(resume_text, target_role)
+
+    degraded = llm.is_degraded(analysis)
+    if not cached:
+        remember_analysis(digest, target_role, prompt_version, analysis)
+
+    # A fallback analysis is saved without hash/version so later uploads never reuse it
+    saved = await db.save_resume(
+        user_id=user_id,
+        file_url=file_url,
+        resume_text=resume_text,
+        target_role=target_role,
+        analysis=analysis,
+        content_hash=None if degraded else digest,
+        prompt_version=None if degraded else prompt_version
+    )
+    if cached:
+        print(f"[Resume] reused analysis for {digest[:12]} ({target_role or 'general'}), "
+              f"hit rate {get_stats()['hit_rate']:.0%}")
+
+    return {
+        "analysis": analysis,
+        "resume_id": saved.get("id") if saved else None,
+        "cached": cached
+    }
+
+
+def get_stats() -> dict:
+    """Analysis reuse hit rates since process start"""
+    lookups = _stats["lookups"]
+    hits = _stats["memory_hits"] + _stats["db_hits"]
+    return {
+        **_stats,
+        "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+        "memory_cache": _analysis_cache.stats(),
+    }
@@ -0,0 +1,339 @@
+"""Resume text preprocessing - whitespace cleanup, section detection, token budgeting
+
+PDF extraction output is whitespace-heavy and resumes vary wildly in length.
+Instead of blindly cutting at a character offset, resumes are split into
+sections and packed into a token budget with high-signal sections first.
+"""
+
+import hashlib
+import re
+
+from skills import extract_skills, normalize_skill
+
+# ═══════════════════════════════════════════════════════════════
+# SECTION DETECTION
+# ═══════════════════════════════════════════════════════════════
+
+# Canonical section -> header aliases (lowercase, no trailing colon)
+SECTION_ALIASES = {
+    "summary": ["summary", "professional summary", "profile", "career objective", "objective", "about me", "about"],
+    "experience": ["experience", "work experience", "professional experience", "employment history",
+                   "work history", "employment", "internships", "internship experience"],
+    "skills": ["skills", "technical skills", "key skills", "core competencies", "technologies",
+               "tech stack", "tools", "skills & tools", "skills and tools"],
+    "education": ["education", "academic background", "academics", "qualifications", "educational qualifications"],
+    "projects": ["projects", "personal projects", "academic projects", "key projects"],
+    "certifications": ["certifications", "certificates", "licenses", "licenses & certifications", "courses"],
+    "achievements": ["achievements", "awards", "honors", "honours", "accomplishments", "awards & achievements"],
+    "publications": ["publications", "research"],
+    "volunteering": ["volunteering", "volunteer experience", "extracurricular activities", "activities"],
+    "languages": ["languages"],
+    "interests": ["interests", "hobbies", "hobbies & interests"],
+    "references": ["references"],
+}
+
+# Higher weight = kept first and given a larger share of the budget.
+# "contact" is the header block before the first detected section.
+SECTION_WEIGHTS = {
+    "skills": 10,
+    "experience": 9,
+    "summary": 7,
+    "education": 6,
+    "projects": 6,
+    "certifications": 5,
+    "contact": 4,
+    "achievements": 4,
+    "publications": 3,
+    "other": 2,
+    "volunteering": 2,
+    "languages": 1,
+    "interests": 0,
+    "references": 0,
+}
+
+_HEADER_LOOKUP = {alias: name for name, aliases in SECTION_ALIASES.items() for alias in aliases}
+_HEADER_CLEAN = re.compile(r"[^a-z& ]+")
+_BULLETS = re.compile(r"^[•●▪◦‣⁃∙·*\-–—]+\s*")
+_SPACES = re.compile(r"[ \t\u00a0\u2000-\u200b\u3000]+")
+
+
+def normalize_whitespace(text: str) -> str:
+    """Collapse PDF-extraction whitespace, unify bullets, drop blank runs"""
+    lines = []
+    blank = False
+    for raw in text.replace("\r\n", "\n").replace("\r", "\n").split("\n"):
+        line = _SPACES.sub(" ", raw).strip()
+        if not line:
+            if lines and not blank:
+                lines.append("")
+            blank = True
+            continue
+        blank = False
+        if _BULLETS.match(line):
+            line = "- " + _BULLETS.sub("", line)
+        lines.append(line)
+    return "\n".join(lines).strip()
+
+
+def _section_for_header(line: str) -> str | None:
+    """Return canonical section name if the line looks like a section header"""
+    if len(line) > 40:
+        return None
+    key = _HEADER_CLEAN.sub("", line.lower()).strip()
+    key = " ".join(key.split())
+    return _HEADER_LOOKUP.get(key)
+
+
+def detect_sections(text: str) -> list[tuple[str, str]]:
+    """Split normalized text into (section, body) pairs in document order.
+
+    Text before the first header is treated as the contact block. Repeated
+    headers (e.g. two "Projects" blocks) are merged into the first occurrence.
+    """
+    sections: dict[str, list[str]] = {}
+    current = "contact"
+    for line in text.split("\n"):
+        name = _section_for_header(line)
+        if name:
+            current = name
+            sections.setdefault(current, [])
+            continue
+        sections.setdefault(current, []).append(line)
+
+    result = []
+    for name, lines in sections.items():
+        body = "\n".join(lines).strip()
+        if body:
+            result.append((name, body))
+    return result
+
+
+def content_hash(text: str) -> str:
+    """Stable hash of resume content, insensitive to extraction whitespace noise"""
+    return hashlib.sha256(normalize_whitespace(text).encode("utf-8")).hexdigest()
+
+
+# ═══════════════════════════════════════════════════════════════
+# TOKEN BUDGETING
+# ═══════════════════════════════════════════════════════════════
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 chars/token for English prose)"""
+    return (len(text) + 3) // 4 if text else 0
+
+
+def _truncate_lines(body: str, budget: int) -> str:
+    """Keep whole lines from the top of a section until the budget is used"""
+    kept = []
+    used = 0
+    for line in body.split("\n"):
+        cost = estimate_tokens(line) + 1
+        if used + cost > budget:
+            break
+        kept.append(line)
+        used += cost
+    return "\n".join(kept)
+
+
+def _render(sections: list[tuple[str, str]]) -> str:
+    return "\n\n".join(body if name == "contact" else f"## {name.upper()}\n{body}" for name, body in sections)
+
+
+def compact_resume(text: str, budget_tokens: int = 1000, keep_low_signal: bool = False) -> tuple[str, dict]:
+    """Build a token-budgeted representation of a resume.
+
+    Every section first receives a share of the budget proportional to its
+    weight; leftover budget is then handed out in priority order. Sections are
+    emitted in their original order so the LLM still sees a coherent resume.
+
+    Returns (compact_text, stats).
+    """
+    original_tokens = estimate_tokens(text)
+    normalized = normalize_whitespace(text)
+    sections = detect_sections(normalized)
+    dropped = []
+    if not keep_low_signal:
+        kept = [(n, b) for n, b in sections if SECTION_WEIGHTS.get(n, 2) > 0]
+        if kept:
+            dropped = [n for n, _ in sections if SECTION_WEIGHTS.get(n, 2) == 0]
+            sections = kept
+
+    costs = {name: estimate_tokens(body) + 4 for name, body in sections}
+    total = sum(costs.values())
+
+    if total <= budget_tokens:
+        compact = _render(sections)
+    else:
+        weights = {name: max(SECTION_WEIGHTS.get(name, 2), 1) for name, _ in sections}
+        weight_sum = sum(weights.values())
+        alloc = {name: min(costs[name], budget_tokens * weights[name] // weight_sum) for name in costs}
+        spare = budget_tokens - sum(alloc.values())
+        for name in sorted(costs, key=lambda n: -weights[n]):
+            if spare <= 0:
+                break
+            extra = min(costs[name] - alloc[name], spare)
+            alloc[name] += extra
+            spare -= extra
+
+        kept = []
+        for name, body in sections:
+            if alloc[name] >= costs[name]:
+                kept.append((name, body))
+                continue
+            part = _truncate_lines(body, alloc[name] - 4)
+            if part:
+                kept.append((name, part))
+            else:
+                dropped.append(name)
+        compact = _render(kept)
+
+    sent_tokens = estimate_tokens(compact)
+    stats = {
+        "tokens_original": original_tokens,
+        "tokens_sent": sent_tokens,
+        "tokens_saved": max(original_tokens - sent_tokens, 0),
+        "sections": [name for name, _ in sections],
+        "dropped": dropped,
+        "truncated": total > budget_tokens,
+    }
+    return compact, stats
+
+
+def chunk_sections(text: str, chunk_tokens: int = 1200) -> list[str]:
+    """Split a long resume into section-aligned chunks for map-reduce analysis.
+
+    Sections are packed greedily; a single oversized section is split on line
+    boundaries so no chunk exceeds chunk_tokens.
+    """
+    chunks = []
+    current: list[tuple[str, str]] = []
+    used = 0
+    for name, body in detect_sections(normalize_whitespace(text)):
+        pieces = [body]
+        if estimate_tokens(body) > chunk_tokens:
+            pieces, piece, piece_used = [], [], 0
+            for line in body.split("\n"):
+                cost = estimate_tokens(line) + 1
+                if piece and piece_used + cost > chunk_tokens:
+                    pieces.append("\n".join(piece))
+                    piece, piece_used = [], 0
+                piece.append(line)
+                piece_used += cost
+            if piece:
+                pieces.append("\n".join(piece))
+        for piece in pieces:
+            cost = estimate_tokens(piece) + 4
+            if current and used + cost > chunk_tokens:
+                chunks.append(_render(current))
+                current, used = [], 0
+            current.append((name, piece))
+            used += cost
+    if current:
+        chunks.append(_render(current))
+    return chunks
+
+
+def diff_sections(old_text: str, new_text: str) -> dict:
+    """Compare two resume versions section by section.
+
+    Returns {"changed": [(section, new_body)], "removed": [section],
+    "unchanged": [section], "change_ratio": share of new tokens that changed}.
+    """
+    old = dict(detect_sections(normalize_whitespace(old_text)))
+    new = detect_sections(normalize_whitespace(new_text))
+
+    changed, unchanged = [], []
+    changed_tokens = total_tokens = 0
+    for name, body in new:
+        tokens = estimate_tokens(body)
+        total_tokens += tokens
+        if old.get(name) == body:
+            unchanged.append(name)
+        else:
+            changed.append((name, body))
+            changed_tokens += tokens
+    new_names = {name for name, _ in new}
+    removed = [name for name in old if name not in new_names]
+
+    return {
+        "changed": changed,
+        "removed": removed,
+        "unchanged": unchanged,
+        "change_ratio": round(changed_tokens / total_tokens, 3) if total_tokens else 1.0,
+    }
+
+
+# ═══════════════════════════════════════════════════════════════
+# LOCAL PRE-SCORE (no LLM)
+# ═══════════════════════════════════════════════════════════════
+
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+\.[\w.]+")
+_PHONE = re.compile(r"\+?\d[\d ()-]{8,}\d")
+_METRIC = re.compile(r"\d+(?:\.\d+)?\s*(?:%|x\b|k\b|\+|users|customers|ms\b)", re.IGNORECASE)
+# Below this many tokens a resume is not worth an LLM call
+MIN_RESUME_TOKENS = 50
+
+
+def prescore_resume(text: str) -> dict:
+    """Cheap structural score (0-100) used to triage resumes before the LLM.
+
+    Checks contact details, core sections, bullet usage, quantified impact
+    and (canonical) skills count. Not a substitute for the LLM analysis.
+    """
+    normalized = normalize_whitespace(text)
+    sections = dict(detect_sections(normalized))
+    tokens = estimate_tokens(normalized)
+    bullets = sum(1 for line in normalized.split("\n") if line.startswith("- "))
+    metrics = len(_METRIC.findall(normalized))
+    # Count distinct skills: known ones by canonical ID ("AWS" == "Amazon Web Services")
+    items = [s for s in re.split(r"[,|•;\n]", sections.get("skills", "")) if s.strip()]
+    skill_ids = extract_skills(sections.get("skills", ""))
+    skills = skill_ids + list(dict.fromkeys(s.strip().lower() for s in items if not normalize_skill(s)))
+
+    checks = {
+        "email": bool(_EMAIL.search(normalized)),
+        "phone": bool(_PHONE.search(normalized)),
+        "summary": "summary" in sections,
+        "experience": "experience" in sections or "projects" in sections,
+        "skills": len(skills) >= 5,
+        "education": "education" in sections,
+        "bullets": bullets >= 4,
+        "quantified": metrics >= 2,
+        "length": 250 <= tokens <= 1500,
+    }
+    weights = {"email": 10, "phone": 5, "summary": 10, "experience": 20, "skills": 15,
+               "education": 10, "bullets": 10, "quantified": 15, "length": 5}
+    score = sum(weights[k] for k, ok in checks.items() if ok)
+
+    return {
+        "score": score,
+        "checks": checks,
+        "tokens": tokens,
+        "skills_count": len(skills),
+        "skill_ids": skill_ids,
+        "analyzable": tokens >= MIN_RESUME_TOKENS,
+    }
+
+
+# ═══════════════════════════════════════════════════════════════
+# STATS
+# ═══════════════════════════════════════════════════════════════
+
+_stats = {"requests": 0, "tokens_original": 0, "tokens_sent": 0, "map_reduce": 0}
+
+
+def record_stats(stats: dict, strategy: str = "compact") -> None:
+    """Accumulate per-request preprocessing stats and log the saving"""
+    _stats["requests"] += 1
+    _stats["tokens_original"] += stats["tokens_original"]
+    _stats["tokens_sent"] += stats["tokens_sent"]
+    if strategy == "map_reduce":
+        _stats["map_reduce"] += 1
+    print(f"[Resume] {strategy}: {stats['tokens_original']} -> {stats['tokens_sent']} tokens "
+          f"(saved {stats['tokens_saved']}, dropped {stats['dropped'] or 'none'})")
+
+
+def get_preprocess_stats() -> dict:
+    """Cumulative token savings since process start"""
+    saved = max(_stats["tokens_original"] - _stats["tokens_sent"], 0)
+    return {**_stats, "tokens_saved": saved}
@@ -9,6 +9,7 @@ from routes.learning import router as learning_router
 from routes.quiz import router as quiz_router
 from routes.jobs import router as jobs_router
 from routes.dashboard import router as dashboard_router
+from routes.admin import router as admin_router
 
 # Create main API router
 api_router = APIRouter()
@@ -21,5 +22,6 @@ api_router.include_router(learning_router)
 api_router.include_router(quiz_router)
 api_router.include_router(jobs_router)
 api_router.include_router(dashboard_router)
+api_router.include_router(admin_router)
 
 __all__ = ["api_router"]
@@ -0,0 +1,139 @@
+"""Admin routes for VidyaMitra API (X-Admin-Token protected)"""
+
+import hmac
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+
+from config import settings
+import extract
+import interview_store
+import learning_progress
+import loop_watchdog
+import memory_governor
+import tracing
+import job_market
+import llm
+import prompts
+import resume_service
+import resume_text
+import voice
+from routes.jobs import market_response_stats
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+def require_admin(x_admin_token: str = Header(default="")) -> None:
+    """Dependency - admin endpoints are disabled unless ADMIN_TOKEN is set"""
+    if not settings.ADMIN_TOKEN or not hmac.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+
+# ═══════════════════════════════════════════════════════════════
+# JOB MARKET DATASET
+# ═══════════════════════════════════════════════════════════════
+
+@router.get("/job-market", dependencies=[Depends(require_admin)])
+async def job_market_info():
+    """Currently active dataset version"""
+    return job_market.dataset_info()
+
+
+@router.post("/job-market/reload", dependencies=[Depends(require_admin)])
+async def reload_job_market():
+    """Re-read the data file and swap it in (even if unchanged on disk)"""
+    try:
+        return await job_market.reload_dataset(force=True)
+    except job_market.DatasetError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@router.put("/job-market", dependencies=[Depends(require_admin)])
+async def replace_job_market(data: dict):
+    """Validate a new dataset, write it to the data file and activate it"""
+    try:
+        return await job_market.replace_dataset(data)
+    except job_market.DatasetError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+# ═══════════════════════════════════════════════════════════════
+# CACHE / PIPELINE STATS
+# ═══════════════════════════════════════════════════════════════
+
+@router.get("/stats", dependencies=[Depends(require_admin)])
+async def stats():
+    """In-process cache sizes and hit rates"""
+    return {
+        "job_market": job_market.dataset_info(),
+        "market_responses": market_response_stats(),
+        "market_context": llm.get_market_context_stats(),
+        "resume_analysis": resume_service.get_stats(),
+        "resume_preprocess": resume_text.get_preprocess_stats(),
+        "extraction": extract.get_stats(),
+        "prompts": prompts.get_stats(),
+        "llm_models": llm.get_model_stats(),
+        "semantic_cache": llm.get_semantic_cache_stats(),
+        "voice_sessions": voice.sessions.stats(),
+        "interviews": interview_store.get_stats(),
+        "learning_progress": learning_progress.get_stats(),
+        "tracing": tracing.get_stats(),
+        "memory": memory_governor.get_stats(),
+    }
+
+
+# ═══════════════════════════════════════════════════════════════
+# EVENT-LOOP WATCHDOG
+# ═══════════════════════════════════════════════════════════════
+
+@router.get("/loop", dependencies=[Depends(require_admin)])
+async def loop_report():
+    """Event-loop lag and the code sites that blocked it, worst first (LOOP_WATCHDOG)"""
+    return loop_watchdog.report()
+
+
+@router.delete("/loop", dependencies=[Depends(require_admin)])
+async def reset_loop_report():
+    """Clear the recorded blocking sites and lag window"""
+    if loop_watchdog.watchdog is None:
+        raise HTTPException(status_code=404, detail="Loop watchdog is not running")
+    loop_watchdog.watchdog.reset()
+    return {"status": "reset"}
+
+
+# ═══════════════════════════════════════════════════════════════
+# MEMORY
+# ═══════════════════════════════════════════════════════════════
+
+@router.get("/memory", dependencies=[Depends(require_admin)])
+async def memory_info():
+    """RSS against the watermark, per-cache footprints and governor activity"""
+    return memory_governor.get_stats()
+
+
+@router.post("/memory/relieve", dependencies=[Depends(require_admin)])
+async def relieve_memory(fraction: float = Query(default=None, gt=0, le=1)):
+    """Shrink caches and trim the heap now (fraction 1 empties every shrinkable cache)"""
+    return memory_governor.relieve(fraction)
+
+
+@router.post("/memory/tracemalloc", dependencies=[Depends(require_admin)])
+async def start_tracemalloc(frames: int = Query(default=1, ge=1, le=25)):
+    """Start tracing allocations (costs CPU and memory while on)"""
+    return memory_governor.start_tracing(frames)
+
+
+@router.delete("/memory/tracemalloc", dependencies=[Depends(require_admin)])
+async def stop_tracemalloc():
+    return memory_governor.stop_tracing()
+
+
+@router.get("/memory/snapshot", dependencies=[Depends(require_admin)])
+async def memory_snapshot(
+    limit: int = Query(default=25, ge=1, le=200),
+    group_by: str = Query(default="lineno", pattern="^(lineno|filename|traceback)$"),
+):
+    """Top allocation sites, and growth since the previous snapshot"""
+    report = await memory_governor.snapshot(limit, group_by)
+    if report is None:
+        raise HTTPException(status_code=409, detail="tracemalloc is not running; POST /api/admin/memory/tracemalloc first")
+    return report
@@ -1,11 +1,15 @@
 """Interview routes for VidyaMitra API"""
 
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
 
-from auth import get_current_user
+from auth import get_current_user, verify_token
 import llm
 import db
+import interview_store
+import voice
 
 router = APIRouter(prefix="/interview", tags=["interview"])
 
@@ -17,14 +21,16 @@ class StartInterviewRequest(BaseModel):
 
 
 class EvaluateAnswerRequest(BaseModel):
-    question: str
     answer: str
+    question: str = ""  # Not needed with interview_id + question_index (taken from the stored interview)
     expected_points: list = []
+    interview_id: str | None = None
+    question_index: int | None = None
 
 
 class CompleteInterviewRequest(BaseModel):
     interview_id: str
-    answers: list
+    answers: list = []  # Only used without a database, for interviews no longer in memory
 
 
 @router.post("/start")
@@ -45,9 +51,13 @@ async def start_interview(
         domain=request.domain,
         role=request.role
     )
+    state = await interview_store.start(
+        user["user_id"], saved.get("id") if saved else None, questions,
+        domain=request.domain, role=request.role
+    )
     
     return {
-        "interview_id": saved.get("id") if saved else None,
+        "interview_id": state.interview_id,
         "questions": questions
     }
 
@@ -57,32 +67,57 @@ async def evaluate_answer(
     request: EvaluateAnswerRequest,
     user: dict = Depends(get_current_user)
 ):
-    """Evaluate a single interview answer"""
+    """Evaluate a single interview answer (recorded when interview_id/question_index are given)"""
+    
+    state = None
+    question, expected_points = request.question, request.expected_points
+    if request.interview_id:
+        state = await interview_store.get(request.interview_id, user["user_id"])
+        if not state:
+            raise HTTPException(status_code=404, detail="Interview not found")
+        stored = state.question(request.question_index if request.question_index is not None else -1)
+        if stored is None:
+            raise HTTPException(status_code=400, detail="question_index out of range")
+        question = stored.get("text") or stored.get("question") or question
+        expected_points = stored.get("expected_points") or expected_points
+    if not question:
+        raise HTTPException(status_code=400, detail="question or interview_id + question_index required")
     
     evaluation = await llm.evaluate_answer(
-        question=request.question,
+        question=question,
         answer=request.answer,
-        expected_points=request.expected_points
+        expected_points=expected_points
     )
+    if state:
+        await interview_store.record(state, request.question_index, request.answer, evaluation)
     
     return {"evaluation": evaluation}
 
 
-@router.post("/complete")
-async def complete_interview(
-    request: CompleteInterviewRequest,
-    user: dict = Depends(get_current_user)
-):
-    """Complete interview and get final score"""
-    
-    if not request.answers:
+async def finish_interview(interview_id: str, user_id: str, answers: list) -> dict:
+    """Mark an interview completed and score it; shared by the app route and the n8n webhook"""
+    state = await interview_store.get(interview_id, user_id)
+    if state:
+        # Scored from the stored evaluations (0 if nothing was answered) - client-sent scores are ignored
+        total_score = await interview_store.complete(state)
+        return {
+            "final_score": total_score,
+            "interview": state.summary()
+        }
+    
+    # Client-sent scores are only accepted without a database, for interviews
+    # no longer in memory - never for an unknown or another user's interview
+    if db._get_client() or interview_store.is_known(interview_id):
+        raise HTTPException(status_code=404, detail="Interview not found")
+    if not answers:
         raise HTTPException(status_code=400, detail="answers required")
     
-    total_score = sum(a.get("score", 0) for a in request.answers) // len(request.answers)
+    total_score = sum(a.get("score", 0) for a in answers) // len(answers)
     
     saved = await db.update_interview(
-        interview_id=request.interview_id,
-        status="completed"
+        interview_id=interview_id,
+        status="completed",
+        final_score=total_score
     )
     
     return {
@@ -91,6 +126,16 @@ async def complete_interview(
     }
 
 
+@router.post("/complete")
+async def complete_interview(
+    request: CompleteInterviewRequest,
+    user: dict = Depends(get_current_user)
+):
+    """Complete interview and get final score"""
+    
+    return await finish_interview(request.interview_id, user["user_id"], request.answers)
+
+
 @router.get("/")
 async def list_interviews(user: dict = Depends(get_current_user)):
     """Get all interviews for current user"""
@@ -101,15 +146,14 @@ async def list_interviews(user: dict = Depends(get_current_user)):
 
 @router.get("/{interview_id}")
 async def get_interview(interview_id: str, user: dict = Depends(get_current_user)):
-    """Get specific interview by ID"""
+    """Get specific interview by ID, with its full transcript"""
     
-    interviews = await db.get_interviews(user["user_id"])
-    interview = next((i for i in interviews if i["id"] == interview_id), None)
+    state = await interview_store.get(interview_id, user["user_id"])
     
-    if not interview:
+    if not state:
         raise HTTPException(status_code=404, detail="Interview not found")
     
-    return interview
+    return {**state.summary(), "turns": state.transcript()}
 
 
 # ═══════════════════════════════════════════════════════════════
@@ -149,3 +193,28 @@ async def voice_process(
         "response_text": response_text,
         "is_complete": is_last
     }
+
+
+@router.websocket("/voice/ws")
+async def voice_session(websocket: WebSocket):
+    """Stateful voice interview: first message {"type": "start", "token": ...}, then partial/final transcripts"""
+    await websocket.accept()
+    try:
+        start = await asyncio.wait_for(websocket.receive_json(), timeout=10)
+        if not isinstance(start, dict) or start.get("type") != "start":
+            raise ValueError("First message must be {\"type\": \"start\", \"token\": ...}")
+        user = await verify_token(str(start.get("token") or ""))
+        if not user.get("user_id"):
+            raise HTTPException(status_code=401, detail="User not found")
+        session = await voice.open_session(user, start)
+    except WebSocketDisconnect:
+        return
+    except HTTPException as e:
+        await websocket.send_json({"type": "error", "message": e.detail})
+        await websocket.close(code=4401 if e.status_code == 401 else 1011)
+        return
+    except (asyncio.TimeoutError, LookupError, ValueError, TypeError, voice.SessionLimitError) as e:
+        await websocket.send_json({"type": "error", "message": str(e) or "Start message expected"})
+        await websocket.close(code=1008)
+        return
+    await voice.serve(websocket, session)
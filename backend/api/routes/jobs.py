@@ -1,95 +1,169 @@
 """Job recommendation routes for VidyaMitra API"""
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from pydantic import BaseModel
 
 from auth import get_current_user
+from config import settings
+from http_cache import ResponseCache, respond
 import llm
 import db
-from job_market import JOB_MARKET_DATA, get_job_market_summary, get_role_outlook, get_skills_gap_analysis
+from job_market import (
+    MAX_BATCH_USERS, batch_skills_gap, dataset_version, get_job_market_summary, get_market_data,
+    get_role_outlook, get_skills_gap_analysis, on_reload, recommend_roles
+)
 
 router = APIRouter(prefix="/jobs", tags=["jobs"])
 
+# Serialized market responses, rebuilt when the dataset version changes
+_market_responses = ResponseCache("market_responses", max_entries=64)
+
+
+def market_response_stats() -> dict:
+    return _market_responses.stats()
+
+
+def _market_response(request: Request, key: tuple, build):
+    prepared = _market_responses.get(key, dataset_version(), build)
+    return respond(request, prepared, settings.MARKET_CACHE_MAX_AGE)
+
 
 class RecommendJobsRequest(BaseModel):
     skills: list
     role: str = ""
     location: str = ""
+    top: int = 5
+    enrich: bool = False  # Add LLM advice on top of the local ranking
+
+
+class CohortMember(BaseModel):
+    id: str = ""
+    skills: list
+
+
+class BatchSkillGapRequest(BaseModel):
+    users: list[CohortMember]
+    roles: list[str] = []
+    top: int = 3
 
 
 # ═══════════════════════════════════════════════════════════════
 # JOB MARKET DATA ENDPOINTS (No Auth - Public Data)
 # ═══════════════════════════════════════════════════════════════
 
-@router.get("/market/summary")
-async def market_summary(field: str = None):
-    """Get job market summary with latest trends"""
-    return get_job_market_summary(field)
-
-
-@router.get("/market/fastest-growing")
-async def fastest_growing_jobs(region: str = "global"):
-    """Get fastest growing jobs by region"""
-    if region.lower() == "india":
+def _fastest_growing_payload(region: str) -> dict:
+    data = get_market_data()
+    if region == "india":
         return {
             "region": "India",
-            "jobs": JOB_MARKET_DATA["fastest_growing_india"],
+            "jobs": data["fastest_growing_india"],
             "source": "WEF Future of Jobs Report 2025, India Employment Forum"
         }
     return {
         "region": "Global",
-        "jobs": JOB_MARKET_DATA["fastest_growing_global"],
+        "jobs": data["fastest_growing_global"],
         "source": "WEF Future of Jobs Report 2025, BLS"
     }
 
 
-@router.get("/market/declining")
-async def declining_jobs():
-    """Get jobs at risk of automation/decline"""
+def _declining_payload() -> dict:
     return {
         "warning": "These roles face high automation risk by 2030",
-        "jobs": JOB_MARKET_DATA["declining_roles"],
+        "jobs": get_market_data()["declining_roles"],
         "recommendation": "Consider upskilling to tech-adjacent roles"
     }
 
 
-@router.get("/market/skills")
-async def in_demand_skills():
-    """Get most in-demand skills"""
+def _skills_payload() -> dict:
+    data = get_market_data()
     return {
-        "technical_skills": JOB_MARKET_DATA["top_skills_global"],
-        "soft_skills": JOB_MARKET_DATA["top_soft_skills"],
-        "certifications": JOB_MARKET_DATA["top_certifications"],
+        "technical_skills": data["top_skills_global"],
+        "soft_skills": data["top_soft_skills"],
+        "certifications": data["top_certifications"],
         "key_insight": "39-40% of core job skills will change by 2030"
     }
 
 
-@router.get("/market/salaries")
-async def salary_benchmarks(level: str = "mid_level"):
-    """Get salary benchmarks by experience level"""
-    level = level.lower().replace("-", "_").replace(" ", "_")
-    if level not in JOB_MARKET_DATA["salary_benchmarks_usd"]:
-        level = "mid_level"
+def _salaries_payload(level: str) -> dict:
     return {
         "level": level,
-        "salaries_usd": JOB_MARKET_DATA["salary_benchmarks_usd"][level],
+        "salaries_usd": get_market_data()["salary_benchmarks_usd"][level],
         "note": "Salaries vary by location, company size, and specific skills"
     }
 
 
+@on_reload
+def _warm_market_responses():
+    """Serialize the default market responses for a new dataset ahead of the first request"""
+    version = dataset_version()
+    _market_responses.get(("summary", None), version, get_job_market_summary)
+    _market_responses.get(("fastest_growing", "global"), version, lambda: _fastest_growing_payload("global"))
+    _market_responses.get(("fastest_growing", "india"), version, lambda: _fastest_growing_payload("india"))
+    _market_responses.get(("declining",), version, _declining_payload)
+    _market_responses.get(("skills",), version, _skills_payload)
+    _market_responses.get(("salaries", "mid_level"), version, lambda: _salaries_payload("mid_level"))
+
+
+@router.get("/market/summary")
+async def market_summary(request: Request, field: str = None):
+    """Get job market summary with latest trends"""
+    summary = get_job_market_summary(field)
+    return _market_response(request, ("summary", summary.get("field")), lambda: summary)
+
+
+@router.get("/market/fastest-growing")
+async def fastest_growing_jobs(request: Request, region: str = "global"):
+    """Get fastest growing jobs by region"""
+    region = "india" if region.lower() == "india" else "global"
+    return _market_response(request, ("fastest_growing", region), lambda: _fastest_growing_payload(region))
+
+
+@router.get("/market/declining")
+async def declining_jobs(request: Request):
+    """Get jobs at risk of automation/decline"""
+    return _market_response(request, ("declining",), _declining_payload)
+
+
+@router.get("/market/skills")
+async def in_demand_skills(request: Request):
+    """Get most in-demand skills"""
+    return _market_response(request, ("skills",), _skills_payload)
+
+
+@router.get("/market/salaries")
+async def salary_benchmarks(request: Request, level: str = "mid_level"):
+    """Get salary benchmarks by experience level"""
+    level = level.lower().replace("-", "_").replace(" ", "_")
+    if level not in get_market_data()["salary_benchmarks_usd"]:
+        level = "mid_level"
+    return _market_response(request, ("salaries", level), lambda: _salaries_payload(level))
+
+
 @router.get("/market/industry/{industry}")
-async def industry_outlook(industry: str):
+async def industry_outlook(request: Request, industry: str):
     """Get outlook for a specific industry"""
     industry = industry.lower().replace("-", "_").replace(" ", "_")
-    if industry not in JOB_MARKET_DATA["industry_outlook"]:
+    outlook = get_market_data()["industry_outlook"]
+    if industry not in outlook:
         return {
             "error": f"Industry '{industry}' not found",
-            "available": list(JOB_MARKET_DATA["industry_outlook"].keys())
+            "available": list(outlook.keys())
         }
-    return {
+    return _market_response(request, ("industry", industry), lambda: {
         "industry": industry,
-        **JOB_MARKET_DATA["industry_outlook"][industry]
-    }
+        **outlook[industry]
+    })
+
+
+# Served by http_cache.FastPathMiddleware ahead of routing (see main.py)
+FAST_PATHS = {
+    "/market/summary": lambda r: market_summary(r, r.query_params.get("field")),
+    "/market/fastest-growing": lambda r: fastest_growing_jobs(r, r.query_params.get("region", "global")),
+    "/market/declining": declining_jobs,
+    "/market/skills": in_demand_skills,
+    "/market/salaries": lambda r: salary_benchmarks(r, r.query_params.get("level", "mid_level")),
+    "/market/industry/": lambda r: industry_outlook(r, r.url.path.rsplit("/", 1)[1]),
+}
 
 
 @router.get("/market/role/{role}")
@@ -104,6 +178,19 @@ async def analyze_skill_gap(request: RecommendJobsRequest):
     return get_skills_gap_analysis(request.skills, request.role)
 
 
+@router.post("/market/skill-gap/batch")
+async def analyze_skill_gap_batch(request: BatchSkillGapRequest):
+    """Skill gaps for a cohort of users against many roles at once"""
+    if not request.users:
+        raise HTTPException(status_code=400, detail="users list required")
+    if len(request.users) > MAX_BATCH_USERS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_USERS} users per request")
+    result = batch_skills_gap([u.skills for u in request.users], request.roles, max(request.top, 1))
+    for user, row in zip(request.users, result["results"]):
+        row["id"] = user.id
+    return result
+
+
 # ═══════════════════════════════════════════════════════════════
 # PERSONALIZED RECOMMENDATIONS (Auth Required)
 # ═══════════════════════════════════════════════════════════════
@@ -113,16 +200,14 @@ async def recommend_jobs(
     request: RecommendJobsRequest,
     user: dict = Depends(get_current_user)
 ):
-    """Get job recommendations based on skills"""
+    """Get job recommendations based on skills (ranked locally, LLM optional)"""
     
     if not request.skills:
         raise HTTPException(status_code=400, detail="skills list required")
     
-    jobs = await llm.get_job_recommendations(
-        skills=request.skills,
-        role=request.role,
-        location=request.location
-    )
+    jobs = recommend_roles(request.skills, request.role, max(request.top, 1))
+    if request.enrich:
+        jobs = await llm.enrich_job_recommendations(jobs, request.skills, request.role, request.location)
     
     saved = await db.save_job_search(
         user_id=user["user_id"],
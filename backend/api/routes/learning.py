@@ -6,6 +6,7 @@ from pydantic import BaseModel
 from auth import get_current_user
 import llm
 import db
+import learning_progress
 
 router = APIRouter(prefix="/learning", tags=["learning"])
 
@@ -13,10 +14,30 @@ router = APIRouter(prefix="/learning", tags=["learning"])
 class GeneratePlanRequest(BaseModel):
     gaps: list
     role: str = "Software Engineer"
+    time_available: str = llm.DEFAULT_TIME_AVAILABLE
 
 
 class UpdateProgressRequest(BaseModel):
-    progress: dict
+    patch: list | None = None  # RFC 6902 operations on the progress object
+    items: dict | None = None  # Per-item deltas: {"docker": {"done": true}}
+    progress: dict | None = None  # Replaces the whole progress object
+    version: int | None = None  # Version the client last saw; stale -> 409
+
+
+async def apply_progress_update(plan_id: str, user_id: str, update: dict) -> dict:
+    """learning_progress.update() with its errors mapped to HTTP responses"""
+    try:
+        plan = await learning_progress.update(plan_id, user_id, **update)
+    except learning_progress.VersionConflict as e:
+        raise HTTPException(status_code=409, detail={"message": "Plan progress changed", **e.view})
+    except learning_progress.PatchError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except learning_progress.ProgressUnavailable:
+        raise HTTPException(status_code=503, detail="Progress could not be saved, please retry",
+                            headers={"Retry-After": "1"})
+    if plan is None:
+        raise HTTPException(status_code=404, detail="Plan not found")
+    return plan
 
 
 @router.post("/generate")
@@ -31,7 +52,8 @@ async def generate_learning_plan(
     
     plan = await llm.generate_learning_plan(
         gaps=request.gaps,
-        role=request.role
+        role=request.role,
+        time_available=request.time_available
     )
     
     saved = await db.save_learning_plan(
@@ -52,14 +74,14 @@ async def update_progress(
     request: UpdateProgressRequest,
     user: dict = Depends(get_current_user)
 ):
-    """Update learning plan progress"""
+    """Update learning plan progress (JSON Patch or per-item deltas, versioned)"""
     
-    saved = await db.update_learning_progress(plan_id, request.progress)
+    if request.patch is None and request.items is None and request.progress is None:
+        raise HTTPException(status_code=400, detail="patch, items or progress required")
     
-    if not saved:
-        raise HTTPException(status_code=404, detail="Plan not found")
+    plan = await apply_progress_update(plan_id, user["user_id"], request.model_dump(exclude_none=True))
     
-    return {"plan": saved}
+    return {"plan": plan}
 
 
 @router.get("/")
@@ -1,11 +1,16 @@
 """Resume routes for VidyaMitra API"""
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 from auth import get_current_user
+import bulk_pipeline
+import extract
 import llm
+import memory_governor
 import db
+import resume_service
 
 router = APIRouter(prefix="/resume", tags=["resume"])
 
@@ -13,6 +18,7 @@ router = APIRouter(prefix="/resume", tags=["resume"])
 class ResumeAnalyzeRequest(BaseModel):
     resume_text: str
     file_id: str | None = None
+    mode: str = "full"  # "incremental" re-scores only sections changed since the last upload
 
 
 class ResumeGenerateRequest(BaseModel):
@@ -45,21 +51,49 @@ async def analyze_resume(
     if not request.resume_text:
         raise HTTPException(status_code=400, detail="resume_text required")
     
-    analysis = await llm.analyze_resume(request.resume_text)
-    
-    saved = await db.save_resume(
+    result = await resume_service.analyze_and_save(
         user_id=user["user_id"],
         resume_text=request.resume_text,
-        analysis=analysis
+        incremental=request.mode == "incremental"
     )
     
     return {
-        "analysis": analysis,
-        "resume_id": saved.get("id") if saved else None
+        "analysis": result["analysis"],
+        "resume_id": result["resume_id"],
+        "cached": result["cached"]
     }
 
 
-@router.post("/generate")
+@router.post("/upload")
+async def upload_resume(
+    request: Request,
+    analyze: bool = False,
+    target_role: str = "",
+    user: dict = Depends(get_current_user)
+):
+    """Extract text from a PDF/DOCX sent as the raw request body (optionally analyze it)"""
+    
+    try:
+        extracted = await extract.extract_upload(request.stream())
+    except extract.UnsupportedFormat as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except extract.ExtractionError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    
+    if not analyze:
+        return extracted
+    if not extracted["resume_text"].strip():
+        raise HTTPException(status_code=422, detail="No text found in file (scanned document?)")
+    
+    result = await resume_service.analyze_and_save(
+        user_id=user["user_id"],
+        resume_text=extracted["resume_text"],
+        target_role=target_role
+    )
+    return {**result, "extraction": extracted}
+
+
+@router.post("/generate", dependencies=[Depends(memory_governor.admit_heavy)])
 async def generate_resume(
     request: ResumeGenerateRequest,
     user: dict = Depends(get_current_user)
@@ -77,6 +111,84 @@ async def generate_resume(
     }
 
 
+# ═══════════════════════════════════════════════════════════════
+# BULK ANALYSIS (institutional uploads)
+# ═══════════════════════════════════════════════════════════════
+
+class _JobStream(StreamingResponse):
+    """Streams a claimed bulk job; the claim is released even if the stream never starts"""
+    
+    def __init__(self, job: dict):
+        super().__init__(
+            bulk_pipeline.run_job(job),
+            media_type="application/x-ndjson",
+            headers={"X-Job-Id": job["job_id"]}
+        )
+        self.job = job
+    
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.body_iterator.aclose()
+            bulk_pipeline.release_job(self.job)
+
+
+def _owned_job(job_id: str, user: dict) -> dict:
+    job = bulk_pipeline.load_job(job_id)
+    if not job or job["uploader_id"] != user["user_id"]:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.post("/bulk")
+async def bulk_analyze(
+    request: Request,
+    target_role: str = "",
+    user: dict = Depends(get_current_user)
+):
+    """Analyze many resumes from a raw ZIP (Content-Type: application/zip) or NDJSON body.
+
+    NDJSON lines: {"id", "user_id", "resume_text", "target_role"}; ZIP entries are
+    .txt/.md/.pdf/.docx files owned by the uploader. Streams NDJSON result/progress lines.
+    """
+    try:
+        job = await bulk_pipeline.create_job(
+            request.stream(),
+            request.headers.get("content-type", ""),
+            uploader_id=user["user_id"],
+            target_role=target_role
+        )
+    except bulk_pipeline.UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return _JobStream(bulk_pipeline.claim_job(job["job_id"]))
+
+
+@router.post("/bulk/{job_id}/resume")
+async def resume_bulk_job(job_id: str, user: dict = Depends(get_current_user)):
+    """Resume an interrupted bulk job - replays finished results, then continues"""
+    
+    _owned_job(job_id, user)
+    try:
+        # Claimed here, before the response starts, so a concurrent resume gets 409
+        job = bulk_pipeline.claim_job(job_id)
+    except bulk_pipeline.JobBusy:
+        raise HTTPException(status_code=409, detail="Job is already running")
+    
+    return _JobStream(job)
+
+
+@router.get("/bulk/{job_id}")
+async def bulk_job_progress(job_id: str, user: dict = Depends(get_current_user)):
+    """Get progress of a bulk job"""
+    
+    _owned_job(job_id, user)
+    return bulk_pipeline.job_progress(job_id)
+
+
 @router.get("/")
 async def list_resumes(user: dict = Depends(get_current_user)):
     """Get all resumes for current user"""
@@ -89,10 +201,9 @@ async def list_resumes(user: dict = Depends(get_current_user)):
 async def get_resume(resume_id: str, user: dict = Depends(get_current_user)):
     """Get specific resume by ID"""
     
-    resumes = await db.get_resumes(user["user_id"])
-    resume = next((r for r in resumes if r["id"] == resume_id), None)
+    resume = await db.get_resume(resume_id)
     
-    if not resume:
+    if not resume or resume.get("user_id") != user["user_id"]:
         raise HTTPException(status_code=404, detail="Resume not found")
     
     return resume
@@ -4,13 +4,19 @@ When USE_N8N=true, these endpoints proxy requests to n8n workflows.
 When USE_N8N=false, they call GitHub Models directly via llm.py.
 """
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 
 import llm
 import db
+import interview_store
+import memory_governor
 import n8n_client
+import resume_service
 from config import settings
+from job_market import recommend_roles
+from routes.interview import finish_interview
+from routes.learning import apply_progress_update
 
 router = APIRouter(prefix="/webhook", tags=["n8n"])
 
@@ -43,43 +49,19 @@ async def n8n_analyze_resume(payload: N8nPayload):
     if not resume_text:
         raise HTTPException(status_code=400, detail="resume_text required")
     
-    # Use n8n or direct LLM
-    if settings.USE_N8N:
-        result = await n8n_client.call_n8n("resume_analyze", payload.model_dump())
-        if result.get("status") != "error":
-            # n8n returns: { status, analysis: { score, grade, summary, strengths, improvements, missing_keywords } }
-            analysis = result.get("analysis", {})
-            # Save to DB
-            saved = await db.save_resume(
-                user_id=payload.user_id,
-                resume_text=resume_text,
-                target_role=target_role,
-                analysis=analysis
-            )
-            return {
-                "status": "ok",
-                "analysis": analysis,
-                "resume_id": saved.get("id") if saved else None
-            }
-        # Fallback to direct LLM
-    
-    analysis = await llm.analyze_resume(resume_text, target_role)
-    
-    saved = await db.save_resume(
+    # Use n8n or direct LLM; identical resumes reuse the stored analysis
+    result = await resume_service.analyze_and_save(
         user_id=payload.user_id,
         resume_text=resume_text,
         target_role=target_role,
-        analysis=analysis
+        n8n_payload=payload.model_dump() if settings.USE_N8N else None,
+        incremental=payload.data.get("mode") == "incremental"
     )
     
-    return {
-        "status": "ok",
-        "analysis": analysis,
-        "resume_id": saved.get("id") if saved else None
-    }
+    return {"status": "ok", **result}
 
 
-@router.post("/resume/enhance")
+@router.post("/resume/enhance", dependencies=[Depends(memory_governor.admit_heavy)])
 async def n8n_enhance_resume(payload: N8nPayload):
     """Enhance/improve an existing resume"""
     
@@ -114,22 +96,16 @@ async def n8n_resume(payload: N8nPayload):
     # Ensure user exists in DB
     await db.ensure_user(payload.user_id)
     
-    analysis = await llm.analyze_resume(
-        payload.data.get("resume_text", ""),
-        payload.data.get("target_role", "")
-    )
-    
-    saved = await db.save_resume(
+    result = await resume_service.analyze_and_save(
         user_id=payload.user_id,
         resume_text=payload.data.get("resume_text", ""),
-        target_role=payload.data.get("target_role", ""),
-        analysis=analysis
+        target_role=payload.data.get("target_role", "")
     )
     
-    return {"status": "ok", "analysis": analysis, "resume_id": saved.get("id") if saved else None}
+    return {"status": "ok", **result}
 
 
-@router.post("/resume/generate")
+@router.post("/resume/generate", dependencies=[Depends(memory_governor.admit_heavy)])
 async def n8n_generate_resume(payload: N8nPayload):
     """Generate professional resume from structured data"""
     
@@ -189,9 +165,12 @@ async def n8n_start_interview(payload: N8nPayload):
                     "topic": q.get("topic", ""),
                     "key_concepts": q.get("key_concepts", [])
                 })
+            state = await interview_store.start(
+                payload.user_id, saved.get("id") if saved else None, normalized, domain=domain, role=role
+            )
             return {
                 "status": "ok",
-                "interview_id": saved.get("id") if saved else result.get("session_id"),
+                "interview_id": state.interview_id,
                 "session_id": result.get("session_id"),
                 "questions": normalized
             }
@@ -205,10 +184,13 @@ async def n8n_start_interview(payload: N8nPayload):
         role=role,
         difficulty=difficulty
     )
+    state = await interview_store.start(
+        payload.user_id, saved.get("id") if saved else None, questions, domain=domain, role=role
+    )
     
     return {
         "status": "ok",
-        "interview_id": saved.get("id") if saved else None,
+        "interview_id": state.interview_id,
         "questions": questions
     }
 
@@ -224,13 +206,29 @@ async def n8n_evaluate_answer(payload: N8nPayload):
     answer = payload.data.get("answer", "")
     expected_points = payload.data.get("expected_points", [])
     
+    # With interview_id + question_index the evaluation is recorded server-side
+    state = None
+    index = payload.data.get("question_index")
+    if payload.data.get("interview_id") and isinstance(index, int):
+        state = await interview_store.get(payload.data["interview_id"], payload.user_id)
+        stored = state.question(index) if state else None
+        if stored:
+            question = question or stored.get("text") or stored.get("question", "")
+            expected_points = expected_points or stored.get("expected_points", [])
+        else:
+            state = None
+    
     # Use n8n or direct LLM
     if settings.USE_N8N:
         result = await n8n_client.call_n8n("interview_evaluate", payload.model_dump())
         if result.get("status") != "error":
+            if state and isinstance(result.get("evaluation"), dict):
+                await interview_store.record(state, index, answer, result["evaluation"])
             return result
     
     evaluation = await llm.evaluate_answer(question, answer, expected_points)
+    if state:
+        await interview_store.record(state, index, answer, evaluation)
     
     return {"status": "ok", "evaluation": evaluation}
 
@@ -248,15 +246,9 @@ async def n8n_complete_interview(payload: N8nPayload):
     if not interview_id:
         raise HTTPException(status_code=400, detail="interview_id required")
     
-    # Calculate average score from evaluations
-    total_score = sum(a.get("score", 0) for a in answers) // len(answers) if answers else 0
+    result = await finish_interview(interview_id, payload.user_id, answers)
     
-    saved = await db.update_interview(
-        interview_id=interview_id,
-        status="completed"
-    )
-    
-    return {"status": "ok", "final_score": total_score, "interview": saved}
+    return {"status": "ok", **result}
 
 
 # ═══════════════════════════════════════════════════════════════
@@ -272,24 +264,31 @@ async def n8n_generate_learning(payload: N8nPayload):
     
     gaps = payload.data.get("gaps", [])
     role = payload.data.get("role", payload.data.get("target_role", "Software Engineer"))
+    time_available = payload.data.get("time_available") or llm.DEFAULT_TIME_AVAILABLE
     
     if not gaps:
         raise HTTPException(status_code=400, detail="gaps list required")
+    if isinstance(gaps, str):
+        gaps = [g.strip() for g in gaps.split(",") if g.strip()]
+    
+    # Plans whose skills are all cached skip both n8n and the LLM
+    plan = llm.cached_learning_plan(gaps, role, time_available)
     
     # Use n8n or direct LLM
-    if settings.USE_N8N:
+    if plan is None and settings.USE_N8N:
         # n8n expects: { data: { target_role, gaps } }
         n8n_payload = {
             "user_id": payload.user_id,
             "data": {
                 "target_role": role,
-                "gaps": ", ".join(gaps) if isinstance(gaps, list) else gaps
+                "gaps": ", ".join(gaps)
             }
         }
         result = await n8n_client.call_n8n("learning_generate", n8n_payload)
         if result.get("status") != "error":
             # Save to DB
             plan = result.get("plan", [])
+            llm.remember_learning_plan(gaps, role, plan, time_available)
             saved = await db.save_learning_plan(
                 user_id=payload.user_id,
                 target_role=role,
@@ -301,7 +300,8 @@ async def n8n_generate_learning(payload: N8nPayload):
                 "plan": plan
             }
     
-    plan = await llm.generate_learning_plan(gaps, role)
+    if plan is None:
+        plan = await llm.generate_learning_plan(gaps, role, time_available)
     
     saved = await db.save_learning_plan(
         user_id=payload.user_id,
@@ -318,13 +318,15 @@ async def n8n_generate_learning(payload: N8nPayload):
 
 @router.patch("/learning/{plan_id}/progress")
 async def n8n_update_progress(plan_id: str, payload: N8nPayload):
-    """Update learning plan progress"""
+    """Update learning plan progress (JSON Patch or per-item deltas, versioned)"""
     
-    progress = payload.data.get("progress", {})
+    update = {key: payload.data[key] for key in ("patch", "items", "progress", "version") if payload.data.get(key) is not None}
+    if not update.keys() - {"version"}:
+        raise HTTPException(status_code=400, detail="patch, items or progress required")
     
-    saved = await db.update_learning_progress(plan_id, progress)
+    plan = await apply_progress_update(plan_id, payload.user_id, update)
     
-    return {"status": "ok", "plan": saved}
+    return {"status": "ok", "plan": plan}
 
 
 # ═══════════════════════════════════════════════════════════════
@@ -414,19 +416,26 @@ async def n8n_evaluate_quiz(payload: N8nPayload):
 
 @router.post("/jobs/recommend")
 async def n8n_recommend_jobs(payload: N8nPayload):
-    """Get job recommendations based on skills"""
+    """Get job recommendations based on skills (ranked locally, LLM optional)"""
     
     # Ensure user exists in DB
     await db.ensure_user(payload.user_id)
     
     skills = payload.data.get("skills", [])
-    role = payload.data.get("role", "")
+    role = payload.data.get("role") or payload.data.get("target_role", "")
     location = payload.data.get("location", "")
     
     if not skills:
         raise HTTPException(status_code=400, detail="skills list required")
     
-    jobs = await llm.get_job_recommendations(skills, role, location)
+    try:
+        top = max(int(payload.data.get("top", 5)), 1)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="top must be an integer")
+    
+    jobs = recommend_roles(skills, role, top)
+    if payload.data.get("enrich"):
+        jobs = await llm.enrich_job_recommendations(jobs, skills, role, location)
     
     saved = await db.save_job_search(
         user_id=payload.user_id,
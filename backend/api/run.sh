@@ -15,5 +15,5 @@ exec uvicorn main:app \
     --limit-concurrency 20 \
     --limit-max-requests 1000 \
     --timeout-keep-alive 5 \
-    --access-log \
+    --no-access-log \
     --no-use-colors
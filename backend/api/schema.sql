@@ -40,6 +40,23 @@ CREATE TABLE IF NOT EXISTS resumes (
 CREATE INDEX IF NOT EXISTS idx_resumes_user_id ON resumes(user_id);
 CREATE INDEX IF NOT EXISTS idx_resumes_created_at ON resumes(created_at DESC);
 
+-- ═══════════════════════════════════════════════════════════════
+-- RESUME CONTENTS TABLE (deduplicated resume text)
+-- ═══════════════════════════════════════════════════════════════
+-- Identical resume text (after whitespace normalization) is stored once and
+-- referenced from resumes.content_hash; resumes.resume_text stays NULL.
+CREATE TABLE IF NOT EXISTS resume_contents (
+    content_hash TEXT PRIMARY KEY,  -- sha256 of normalized resume text
+    resume_text TEXT NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+ALTER TABLE resumes ADD COLUMN IF NOT EXISTS content_hash TEXT REFERENCES resume_contents(content_hash);
+ALTER TABLE resumes ADD COLUMN IF NOT EXISTS prompt_version TEXT;  -- Analysis prompt version
+
+-- Analysis reuse lookup: (content_hash, target_role, prompt_version)
+CREATE INDEX IF NOT EXISTS idx_resumes_analysis_key ON resumes(content_hash, target_role, prompt_version);
+
 -- ═══════════════════════════════════════════════════════════════
 -- INTERVIEWS TABLE
 -- ═══════════════════════════════════════════════════════════════
@@ -57,6 +74,27 @@ CREATE INDEX IF NOT EXISTS idx_interviews_user_id ON interviews(user_id);
 CREATE INDEX IF NOT EXISTS idx_interviews_status ON interviews(status);
 CREATE INDEX IF NOT EXISTS idx_interviews_created_at ON interviews(created_at DESC);
 
+ALTER TABLE interviews ADD COLUMN IF NOT EXISTS final_score INTEGER;  -- Average of answered turn scores
+
+-- ═══════════════════════════════════════════════════════════════
+-- INTERVIEW TURNS TABLE (questions, answers and evaluations)
+-- ═══════════════════════════════════════════════════════════════
+-- One row per question, inserted when the interview starts and updated as
+-- each answer is evaluated, so history views need no LLM re-calls.
+CREATE TABLE IF NOT EXISTS interview_turns (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    interview_id UUID NOT NULL REFERENCES interviews(id) ON DELETE CASCADE,
+    question_index INTEGER NOT NULL,
+    question TEXT NOT NULL,
+    question_json JSONB,        -- Full question (type, expected_points, difficulty)
+    answer TEXT,
+    evaluation_json JSONB,      -- Full evaluation result
+    score INTEGER,
+    answered_at TIMESTAMPTZ,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    UNIQUE (interview_id, question_index)
+);
+
 -- ═══════════════════════════════════════════════════════════════
 -- QUIZZES TABLE
 -- ═══════════════════════════════════════════════════════════════
@@ -85,6 +123,11 @@ CREATE TABLE IF NOT EXISTS learning_plans (
 
 CREATE INDEX IF NOT EXISTS idx_learning_plans_user_id ON learning_plans(user_id);
 
+-- Progress is kept apart from plan_json so a checkbox tick rewrites only this
+-- small object; version backs optimistic concurrency (UPDATE ... WHERE version = n)
+ALTER TABLE learning_plans ADD COLUMN IF NOT EXISTS progress JSONB NOT NULL DEFAULT '{}'::jsonb;
+ALTER TABLE learning_plans ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 0;
+
 -- ═══════════════════════════════════════════════════════════════
 -- ROW LEVEL SECURITY (RLS)
 -- ═══════════════════════════════════════════════════════════════
@@ -93,6 +136,7 @@ CREATE INDEX IF NOT EXISTS idx_learning_plans_user_id ON learning_plans(user_id)
 ALTER TABLE users ENABLE ROW LEVEL SECURITY;
 ALTER TABLE resumes ENABLE ROW LEVEL SECURITY;
 ALTER TABLE interviews ENABLE ROW LEVEL SECURITY;
+ALTER TABLE interview_turns ENABLE ROW LEVEL SECURITY;
 ALTER TABLE learning_plans ENABLE ROW LEVEL SECURITY;
 ALTER TABLE quizzes ENABLE ROW LEVEL SECURITY;
 ALTER TABLE job_searches ENABLE ROW LEVEL SECURITY;
@@ -119,6 +163,10 @@ CREATE POLICY "Users can insert own interviews" ON interviews
     FOR INSERT WITH CHECK (auth.uid()::text = user_id);
 CREATE POLICY "Users can update own interviews" ON interviews
     FOR UPDATE USING (auth.uid()::text = user_id);
+CREATE POLICY "Users can view own interview turns" ON interview_turns
+    FOR SELECT USING (EXISTS (
+        SELECT 1 FROM interviews i WHERE i.id = interview_id AND i.user_id = auth.uid()::text
+    ));
 
 -- Learning plans policies
 CREATE POLICY "Users can view own learning plans" ON learning_plans
@@ -0,0 +1,132 @@
+"""Semantic cache - reuse LLM output for near-duplicate requests
+
+Requests are canonicalized first (skill aliases, role titles, sorted skill
+sets) so most near-duplicates become exact hits. The rest are matched by
+cosine similarity of hashed word + character-trigram vectors against
+earlier requests with the same exact-match fields (count, difficulty...).
+Pure Python, CPU-only, bounded by entry count.
+"""
+
+import math
+import random
+from collections import OrderedDict
+
+from cache import approx_mapping_size
+
+HASH_BUCKETS = 1 << 16
+TRIGRAM_WEIGHT = 0.5  # Relative to whole words
+SAMPLE_SIZE = 20  # Near hits kept (reservoir sample) for false-hit review
+
+
+def embed(text: str) -> dict[int, float]:
+    """Unit-length sparse vector of hashed words and character trigrams"""
+    vector: dict[int, float] = {}
+    for word in text.split():
+        bucket = hash(word) % HASH_BUCKETS
+        vector[bucket] = vector.get(bucket, 0.0) + 1.0
+    padded = f" {text} "
+    for i in range(len(padded) - 2):
+        bucket = hash(padded[i:i + 3]) % HASH_BUCKETS
+        vector[bucket] = vector.get(bucket, 0.0) + TRIGRAM_WEIGHT
+    norm = math.sqrt(sum(w * w for w in vector.values())) or 1.0
+    return {bucket: w / norm for bucket, w in vector.items()}
+
+
+def cosine(a: dict[int, float], b: dict[int, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(w * b.get(bucket, 0.0) for bucket, w in a.items())
+
+
+class SemanticCache:
+    """LRU of canonical request text -> result, with nearest-neighbour lookup.
+
+    partition holds the fields that must match exactly; only entries in the
+    same partition are compared. Not thread-safe; event loop only.
+    """
+
+    def __init__(self, name: str, threshold: float, max_entries: int = 256):
+        self.name = name
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()  # (partition, text) -> result
+        self._vectors: dict[tuple, dict[str, dict]] = {}  # partition -> text -> vector
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._near_seen = 0
+        self._samples: list[dict] = []
+
+    def get(self, partition: tuple, text: str):
+        key = (partition, text)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.exact_hits += 1
+            return self._entries[key]
+        best, best_score = None, self.threshold
+        vector = embed(text)
+        for other, other_vector in self._vectors.get(partition, {}).items():
+            score = cosine(vector, other_vector)
+            if score >= best_score:
+                best, best_score = other, score
+        if best is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end((partition, best))
+        self.semantic_hits += 1
+        self._sample(text, best, best_score)
+        return self._entries[(partition, best)]
+
+    def set(self, partition: tuple, text: str, value) -> None:
+        self._entries[(partition, text)] = value
+        self._entries.move_to_end((partition, text))
+        self._vectors.setdefault(partition, {})[text] = embed(text)
+        while len(self._entries) > self.max_entries:
+            self._evict_oldest()
+
+    def _evict_oldest(self) -> None:
+        (old_partition, old_text), _ = self._entries.popitem(last=False)
+        vectors = self._vectors[old_partition]
+        del vectors[old_text]
+        if not vectors:
+            del self._vectors[old_partition]
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._vectors.clear()
+
+    def shrink(self, fraction: float) -> int:
+        """Evict the least recently used fraction of entries; returns how many"""
+        count = int(len(self._entries) * fraction + 0.999)
+        for _ in range(count):
+            self._evict_oldest()
+        return count
+
+    def _sample(self, query: str, matched: str, score: float) -> None:
+        """Reservoir-sample near hits so false hits can be reviewed"""
+        self._near_seen += 1
+        sample = {"query": query, "matched": matched, "similarity": round(score, 3)}
+        if len(self._samples) < SAMPLE_SIZE:
+            self._samples.append(sample)
+        else:
+            slot = random.randrange(self._near_seen)
+            if slot < SAMPLE_SIZE:
+                self._samples[slot] = sample
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "name": self.name,
+            "entries": len(self._entries),
+            "approx_bytes": approx_mapping_size(self._entries) + approx_mapping_size(self._vectors),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.exact_hits + self.semantic_hits) / lookups, 3) if lookups else 0.0,
+            "near_hit_samples": list(self._samples),
+        }
@@ -0,0 +1,306 @@
+"""Skill ontology - canonical skill IDs, aliases and a fast normalizer
+
+"AWS", "Amazon Web Services" and "Cloud Computing (AWS/Azure/GCP)" all
+resolve to canonical IDs so gap analysis, pre-scoring and caches compare
+like with like. Lookups go exact alias -> phrase trie -> cached fuzzy match.
+"""
+
+import difflib
+import re
+from functools import lru_cache
+
+# ═══════════════════════════════════════════════════════════════
+# ONTOLOGY
+# ═══════════════════════════════════════════════════════════════
+
+# id: (display name, aliases, parent ids). Aliases are true synonyms only;
+# a distinct tool gets its own id and rolls up through its parents, so
+# knowing Tableau counts towards "data analytics" without being Excel.
+SKILLS = {
+    # Languages
+    "python": ("Python", ["python3", "python 3", "py"], []),
+    "javascript": ("JavaScript", ["js", "ecmascript", "es6"], []),
+    "typescript": ("TypeScript", ["ts"], ["javascript"]),
+    "java": ("Java", ["java 8", "java 11", "java 17", "core java"], []),
+    "csharp": ("C#", ["c#", "c sharp", "csharp"], []),
+    "cpp": ("C++", ["c++", "cpp"], []),
+    "c": ("C", ["c language", "c programming"], []),
+    "go": ("Go", ["golang", "go lang"], []),
+    "rust": ("Rust", [], []),
+    "kotlin": ("Kotlin", [], []),
+    "swift": ("Swift", [], []),
+    "php": ("PHP", [], []),
+    "ruby": ("Ruby", [], []),
+    "r": ("R", ["r language", "r programming"], []),
+    "scala": ("Scala", [], []),
+    "sql": ("SQL", ["structured query language", "sql & database management", "database management", "databases"], []),
+    "bash": ("Bash", ["shell scripting", "shell", "bash scripting"], ["linux"]),
+    # Web
+    "html": ("HTML", ["html5"], []),
+    "css": ("CSS", ["css3"], []),
+    "tailwind": ("Tailwind CSS", ["tailwind", "tailwindcss"], ["css"]),
+    "sass": ("Sass", ["scss"], ["css"]),
+    "react": ("React", ["reactjs", "react.js", "react js"], ["javascript"]),
+    "nextjs": ("Next.js", ["next.js", "nextjs", "next js"], ["react"]),
+    "angular": ("Angular", ["angularjs", "angular.js"], ["javascript"]),
+    "vue": ("Vue", ["vue.js", "vuejs"], ["javascript"]),
+    "nodejs": ("Node.js", ["node.js", "node", "nodejs", "node js"], ["javascript"]),
+    "express": ("Express", ["express.js", "expressjs"], ["nodejs"]),
+    "django": ("Django", [], ["python"]),
+    "flask": ("Flask", [], ["python"]),
+    "fastapi": ("FastAPI", [], ["python", "api_development"]),
+    "spring": ("Spring", ["spring boot", "springboot"], ["java"]),
+    "api_development": ("API Development", ["api development", "apis", "rest api", "rest apis",
+                                             "restful apis", "api design"], []),
+    "graphql": ("GraphQL", [], ["api_development"]),
+    # Data / AI
+    "machine_learning": ("Machine Learning", ["ml", "machine learning", "ai/machine learning",
+                                              "ai/ml", "artificial intelligence", "ai"], []),
+    "deep_learning": ("Deep Learning", ["dl", "neural networks"], ["machine_learning"]),
+    "nlp": ("NLP", ["natural language processing"], ["machine_learning"]),
+    "computer_vision": ("Computer Vision", [], ["machine_learning"]),
+    "opencv": ("OpenCV", [], ["computer_vision"]),
+    "llm": ("LLMs", ["large language models", "generative ai", "genai"], ["machine_learning"]),
+    "prompt_engineering": ("Prompt Engineering", [], ["llm"]),
+    "tensorflow": ("TensorFlow", ["tf"], ["deep_learning"]),
+    "keras": ("Keras", [], ["deep_learning"]),
+    "pytorch": ("PyTorch", ["torch"], ["deep_learning"]),
+    "scikit_learn": ("scikit-learn", ["sklearn", "scikit learn"], ["machine_learning"]),
+    "mlops": ("MLOps", ["ml ops"], ["machine_learning"]),
+    "mlflow": ("MLflow", [], ["mlops"]),
+    "kubeflow": ("Kubeflow", [], ["mlops", "kubernetes"]),
+    "data_analytics": ("Data Analytics", ["data analysis", "data analytics & big data", "analytics"], []),
+    "pandas": ("pandas", [], ["python", "data_analytics"]),
+    "numpy": ("NumPy", [], ["python", "data_analytics"]),
+    "excel": ("Excel", ["microsoft excel", "ms excel"], ["data_analytics"]),
+    "tableau": ("Tableau", [], ["data_analytics"]),
+    "power_bi": ("Power BI", ["powerbi"], ["data_analytics"]),
+    "big_data": ("Big Data", [], ["data_analytics"]),
+    "hadoop": ("Hadoop", ["apache hadoop"], ["big_data"]),
+    "spark": ("Spark", ["apache spark"], ["big_data"]),
+    "pyspark": ("PySpark", [], ["spark", "python"]),
+    "kafka": ("Kafka", ["apache kafka"], ["big_data"]),
+    "statistics": ("Statistics", ["statistical analysis", "probability"], []),
+    "data_engineering": ("Data Engineering", ["etl", "data pipelines"], []),
+    "airflow": ("Airflow", ["apache airflow"], ["data_engineering"]),
+    "dbt": ("dbt", [], ["data_engineering", "sql"]),
+    "postgresql": ("PostgreSQL", ["postgres", "postgresql"], ["sql"]),
+    "mysql": ("MySQL", [], ["sql"]),
+    "mongodb": ("MongoDB", ["mongo"], []),
+    "redis": ("Redis", [], []),
+    # Cloud / DevOps
+    "cloud_computing": ("Cloud Computing", ["cloud", "cloud computing (aws/azure/gcp)", "cloud platforms"], []),
+    "aws": ("AWS", ["amazon web services"], ["cloud_computing"]),
+    "aws_ec2": ("EC2", ["ec2", "amazon ec2", "aws ec2"], ["aws"]),
+    "aws_s3": ("S3", ["s3", "amazon s3", "aws s3"], ["aws"]),
+    "aws_lambda": ("AWS Lambda", ["aws lambda", "amazon lambda"], ["aws"]),
+    "azure": ("Azure", ["microsoft azure"], ["cloud_computing"]),
+    "gcp": ("GCP", ["google cloud", "google cloud platform"], ["cloud_computing"]),
+    "docker": ("Docker", ["containers", "containerization"], []),
+    "kubernetes": ("Kubernetes", ["k8s", "kubernetes & containerization"], ["docker"]),
+    "eks": ("EKS", ["amazon eks"], ["kubernetes", "aws"]),
+    "gke": ("GKE", ["google kubernetes engine"], ["kubernetes", "gcp"]),
+    "aks": ("AKS", ["azure kubernetes service"], ["kubernetes", "azure"]),
+    "iac": ("Infrastructure as Code", ["infrastructure as code"], []),
+    "terraform": ("Terraform", [], ["iac"]),
+    "ci_cd": ("CI/CD", ["ci/cd", "ci cd", "cicd", "continuous integration", "devops & ci/cd"], []),
+    "devops": ("DevOps", [], []),
+    "jenkins": ("Jenkins", [], ["ci_cd"]),
+    "github_actions": ("GitHub Actions", [], ["ci_cd"]),
+    "gitlab_ci": ("GitLab CI", ["gitlab ci/cd"], ["ci_cd"]),
+    "linux": ("Linux", [], []),
+    "ubuntu": ("Ubuntu", [], ["linux"]),
+    "unix": ("Unix", [], []),
+    "git": ("Git", ["version control"], []),
+    "github": ("GitHub", [], ["git"]),
+    "gitlab": ("GitLab", [], ["git"]),
+    "networking": ("Networking", ["computer networks", "tcp/ip"], []),
+    # Security
+    "security": ("Security", ["cybersecurity", "cyber security", "information security", "infosec",
+                              "application security"], []),
+    "network_security": ("Network Security", [], ["networking", "security"]),
+    "incident_response": ("Incident Response", ["soc"], ["security"]),
+    "siem": ("SIEM", [], ["incident_response"]),
+    "compliance": ("Compliance", [], []),
+    "gdpr": ("GDPR", [], ["compliance"]),
+    "iso_27001": ("ISO 27001", ["iso 27001", "iso/iec 27001"], ["compliance"]),
+    "soc2": ("SOC 2", ["soc 2", "soc2"], ["compliance"]),
+    "risk_management": ("Risk Management", [], []),
+    "penetration_testing": ("Penetration Testing", ["pentesting", "ethical hacking"], ["security"]),
+    # Design / product
+    "ux_design": ("UX Design", ["ux", "ui/ux", "ux/ui", "user experience"], []),
+    "ui_design": ("UI Design", [], []),
+    "figma": ("Figma", [], ["ux_design"]),
+    "product_management": ("Product Management", ["product manager"], []),
+    "agile": ("Agile", [], []),
+    "scrum": ("Scrum", [], ["agile"]),
+    "kanban": ("Kanban", [], ["agile"]),
+    # Soft skills
+    "communication": ("Communication", ["written communication", "verbal communication"], []),
+    "leadership": ("Leadership", ["leadership & mentoring", "team leadership"], []),
+    "mentoring": ("Mentoring", [], ["leadership"]),
+    "problem_solving": ("Problem Solving", [], []),
+    "collaboration": ("Collaboration", ["teamwork"], []),
+}
+
+# Names that are everyday words ("Go-to-market", "Spring semester") only count
+# when they are a whole list item, never when spotted inside longer text
+EXACT_ONLY = frozenset({
+    "go", "rust", "swift", "spring", "express", "node", "shell", "cloud", "analytics",
+    "soc", "ts", "tf", "py", "dl", "ux",
+})
+
+_TOKEN = re.compile(r"[a-z0-9][a-z0-9+#.]*")
+_CLEAN = re.compile(r"[^a-z0-9+#./& ]+")
+FUZZY_CUTOFF = 0.88
+# Trailing version numbers ("Go 1.21", "C 11", "Swift v5"), stripped for a second exact lookup so
+# EXACT_ONLY and single-letter names resolve in O(1) instead of reaching the fuzzy matcher
+_VERSION_SUFFIX = re.compile(r"(?: v?\d[\w.]*)+$")
+
+
+def tokenize(text: str) -> tuple[str, ...]:
+    """Lowercase word tokens; keeps c++, c#, node.js intact"""
+    return tuple(t.rstrip(".") for t in _TOKEN.findall(text.lower()))
+
+
+def _clean(text: str) -> str:
+    return " ".join(_CLEAN.sub(" ", text.lower()).split())
+
+
+class PhraseMatcher:
+    """Token-level trie that finds every known phrase inside a text in one pass"""
+
+    def __init__(self):
+        self._root: dict = {}
+
+    def add(self, phrase: str, value) -> None:
+        node = self._root
+        for token in tokenize(phrase):
+            node = node.setdefault(token, {})
+        node.setdefault(None, value)  # First registration wins
+
+    def find_all(self, text: str) -> list:
+        """Values of all phrases occurring in text, in order of occurrence"""
+        tokens = tokenize(text)
+        found = []
+        for start in range(len(tokens)):
+            node = self._root
+            for token in tokens[start:]:
+                node = node.get(token)
+                if node is None:
+                    break
+                if None in node:
+                    found.append(node[None])
+        return found
+
+
+# ═══════════════════════════════════════════════════════════════
+# INDEXES (built once at import)
+# ═══════════════════════════════════════════════════════════════
+
+_ALIASES: dict[str, str] = {}
+_MATCHER = PhraseMatcher()
+for _id, (_name, _aliases, _parents) in SKILLS.items():
+    for _alias in [_id.replace("_", " "), _name, *_aliases]:
+        _ALIASES.setdefault(_clean(_alias), _id)
+        # Single letters ("C", "R") and everyday words ("Go") only match a whole item
+        if len(_clean(_alias)) > 1 and _clean(_alias) not in EXACT_ONLY:
+            _MATCHER.add(_alias, _id)
+_ALIAS_KEYS = list(_ALIASES)
+
+
+def _ancestors(skill_id: str) -> frozenset:
+    result = set()
+    stack = list(SKILLS[skill_id][2])
+    while stack:
+        parent = stack.pop()
+        if parent not in result:
+            result.add(parent)
+            stack.extend(SKILLS[parent][2])
+    return frozenset(result)
+
+
+_IMPLIES = {skill_id: _ancestors(skill_id) for skill_id in SKILLS}
+
+
+# ═══════════════════════════════════════════════════════════════
+# NORMALIZER
+# ═══════════════════════════════════════════════════════════════
+
+@lru_cache(maxsize=4096)
+def _fuzzy(key: str) -> str | None:
+    match = difflib.get_close_matches(key, _ALIAS_KEYS, n=1, cutoff=FUZZY_CUTOFF)
+    return _ALIASES[match[0]] if match else None
+
+
+@lru_cache(maxsize=8192)
+def normalize_skill(text: str) -> str | None:
+    """Canonical skill ID for one skill string, or None if unknown"""
+    key = _clean(text)
+    if not key:
+        return None
+    skill_id = _ALIASES.get(key) or _ALIASES.get(_VERSION_SUFFIX.sub("", key))
+    if skill_id:
+        return skill_id
+    found = _MATCHER.find_all(key)
+    if found:
+        return found[0]
+    return _fuzzy(key) if len(key) >= 4 else None
+
+
+_ITEM_SPLIT = re.compile(r"[,;|•/()\n:]+")
+
+
+def extract_skills(text: str) -> list[str]:
+    """All canonical skill IDs mentioned in free text (e.g. a skills section).
+
+    Phrases are spotted anywhere; EXACT_ONLY and single-letter names count
+    only as a whole list item ("Python, Go" has Go, "Go-to-market" does not).
+    """
+    found = _MATCHER.find_all(text)
+    for item in _ITEM_SPLIT.split(text):
+        skill_id = _ALIASES.get(_clean(item))
+        if skill_id:
+            found.append(skill_id)
+    return list(dict.fromkeys(found))
+
+
+@lru_cache(maxsize=8192)
+def _expand_one(skill: str) -> frozenset:
+    ids = {skill_key(skill), *extract_skills(skill)}
+    for skill_id in list(ids):
+        ids |= _IMPLIES.get(skill_id, frozenset())
+    return frozenset(ids)
+
+
+def expand_skills(skills: list) -> frozenset:
+    """Canonical IDs for a user's skill list, including implied parent skills.
+
+    Compound entries such as "Cloud Computing (AWS/Azure/GCP)" contribute
+    every skill they mention; unknown skills are kept as cleaned text.
+    """
+    return frozenset().union(*map(_expand_one, skills))
+
+
+def normalize_skills(skills: list) -> list[str]:
+    """Skill keys for a list of skills, de-duplicated in order ("AWS", "Amazon Web Services" -> ["aws"])"""
+    return list(dict.fromkeys(key for key in map(skill_key, skills) if key))
+
+
+def skill_key(skill: str) -> str:
+    """Stable cache/pool key for a skill: canonical ID or cleaned text"""
+    return normalize_skill(skill) or _clean(skill)
+
+
+def exact_skill_key(skill: str) -> str:
+    """Like skill_key, but only synonyms of the whole text share a key ("JS" = "JavaScript").
+
+    No phrase-inside-text or fuzzy matching, so "Excel VBA" and "Tableau"
+    never borrow the key of a different skill.
+    """
+    key = _clean(skill)
+    return _ALIASES.get(key, key)
+
+
+def display_name(skill_id: str) -> str:
+    return SKILLS[skill_id][0] if skill_id in SKILLS else skill_id
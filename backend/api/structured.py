@@ -0,0 +1,299 @@
+"""Structured LLM output - single-pass JSON extraction and schema validation
+
+extract_json() decodes the first complete JSON object/array in a completion
+(prose and ``` fences around it are skipped) - with orjson when installed.
+The usual bare or fenced reply is decoded directly; otherwise one scan over
+the structural characters finds the matching bracket and only that slice
+is decoded.
+Each prompt declares a pydantic schema; validated output is returned as
+plain dicts/lists so callers are unchanged.
+"""
+
+import importlib.util
+import json
+import re
+from functools import lru_cache
+from typing import Annotated, Any
+
+from pydantic import BaseModel, BeforeValidator, ConfigDict, Field, TypeAdapter, ValidationError
+
+ORJSON_AVAILABLE = importlib.util.find_spec("orjson") is not None
+if ORJSON_AVAILABLE:
+    import orjson
+    _loads = orjson.loads
+else:
+    _loads = json.loads
+
+MAX_CANDIDATES = 3  # Opening brackets tried before giving up (e.g. "[1]" footnotes in prose)
+_OUTSIDE_STRING = re.compile(r'[\[\]{}"]')
+
+
+class OutputError(ValueError):
+    pass
+
+
+# ═══════════════════════════════════════════════════════════════
+# EXTRACTION
+# ═══════════════════════════════════════════════════════════════
+
+def _matching_close(text: str, start: int) -> int:
+    """Index of the bracket closing the one at start, or -1 if the value is unterminated.
+
+    Between strings the next structural character is found by regex; string
+    bodies (most of a reply) are skipped with str.find.
+    """
+    depth = 0
+    pos = start
+    while True:
+        match = _OUTSIDE_STRING.search(text, pos)
+        if match is None:
+            return -1
+        i = match.start()
+        char = text[i]
+        if char == '"':
+            i = text.find('"', i + 1)
+            while i != -1 and _escaped(text, i):
+                i = text.find('"', i + 1)
+            if i == -1:
+                return -1
+        elif char in "{[":
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return i
+        pos = i + 1
+
+
+def _escaped(text: str, quote: int) -> bool:
+    """True if the quote at this index is preceded by an odd number of backslashes"""
+    i = quote - 1
+    while text[i] == "\\":
+        i -= 1
+    return (quote - i) % 2 == 0
+
+
+def _next_open(text: str, pos: int) -> int:
+    brace, bracket = text.find("{", pos), text.find("[", pos)
+    if brace == -1 or bracket == -1:
+        return max(brace, bracket)
+    return min(brace, bracket)
+
+
+def _candidates(text: str):
+    """Decoded JSON values found in text, in order (at most MAX_CANDIDATES)"""
+    start = _next_open(text, 0) if text else -1
+    if start == -1:
+        raise OutputError("no JSON object or array in response")
+    # Bare or fenced reply (JSON mode, ```json blocks): first opener to last closer
+    # decodes in one C-level parse. Only if that slice is not JSON is it scanned.
+    end = text.rfind("}" if text[start] == "{" else "]")
+    if end > start:
+        try:
+            yield _loads(text[start:end + 1])
+            return
+        except ValueError:
+            pass
+    found = False
+    for _ in range(MAX_CANDIDATES):
+        if start == -1:
+            break
+        end = _matching_close(text, start)
+        if end == -1:
+            raise OutputError("unterminated JSON (response truncated?)")
+        try:
+            value = _loads(text[start:end + 1])
+        except ValueError:
+            start = _next_open(text, start + 1)
+            continue
+        found = True
+        yield value
+        start = _next_open(text, end + 1)
+    if not found:
+        raise OutputError("no JSON object or array in response")
+
+
+def extract_json(text: str):
+    """Decode the first complete JSON object or array in text; raise OutputError if none"""
+    return next(_candidates(text))
+
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+_STRING_SPECIAL = re.compile(r'["\\]')
+
+
+class StringFieldStream:
+    """Decode one string field of a streamed JSON object as its text arrives.
+
+    feed() takes raw completion chunks and returns the newly decoded part of
+    the field's value ("" until the key appears, and after the value ends).
+    Escapes split across chunks are held back until complete.
+    """
+
+    def __init__(self, field: str):
+        self._key = re.compile(r'"%s"\s*:\s*"' % re.escape(field))
+        self._buffer = ""
+        self._pos = -1  # Start of the undecoded value text once the key is found
+        self.done = False
+
+    def feed(self, chunk: str) -> str:
+        if self.done:
+            return ""
+        searched = len(self._buffer)
+        self._buffer += chunk
+        if self._pos < 0:
+            match = self._key.search(self._buffer, max(searched - len(self._key.pattern) - 8, 0))
+            if match is None:
+                return ""
+            self._pos = match.end()
+        buffer, i, out = self._buffer, self._pos, []
+        while i < len(buffer):
+            special = _STRING_SPECIAL.search(buffer, i)
+            end = special.start() if special else len(buffer)
+            out.append(buffer[i:end])
+            i = end
+            if special is None:
+                break
+            if buffer[i] == '"':
+                self.done = True
+                i += 1
+                break
+            if i + 1 >= len(buffer):
+                break  # Escape continues in the next chunk
+            escape = buffer[i + 1]
+            if escape != "u":
+                out.append(_ESCAPES.get(escape, escape))
+                i += 2
+                continue
+            if i + 6 > len(buffer):
+                break
+            code = int(buffer[i + 2:i + 6], 16)
+            if 0xD800 <= code < 0xDC00:  # Surrogate pair: wait for the low half
+                if i + 12 > len(buffer):
+                    break
+                code = 0x10000 + ((code - 0xD800) << 10) + (int(buffer[i + 8:i + 12], 16) - 0xDC00)
+                i += 6
+            out.append(chr(code))
+            i += 6
+        self._pos = i
+        return "".join(out)
+
+
+# ═══════════════════════════════════════════════════════════════
+# SCHEMAS
+# ═══════════════════════════════════════════════════════════════
+
+def _to_score(value):
+    """Accept 85, 85.4, "85" and "85/100" for a 0-100 score"""
+    if isinstance(value, str):
+        value = value.split("/")[0].strip().rstrip("%")
+    try:
+        return round(float(value))
+    except (TypeError, ValueError):
+        return value
+
+
+Score = Annotated[int, BeforeValidator(_to_score), Field(ge=0, le=100)]
+
+
+class _Output(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+
+class ResumeAnalysis(_Output):
+    score: Score
+    grade: str = "C"
+    summary: str = ""
+    skills_found: list[str] = []
+    skills_hot: list[str] = []
+    skills_outdated: list[str] = []
+    gaps: list[Any] = []
+    improvements: list[Any] = []
+    certifications_recommended: list[Any] = []
+    market_readiness: str = "medium"
+    career_trajectory: str = "stable"
+
+
+class ResumeDigest(_Output):
+    skills: list[Any] = []
+    highlights: list[Any] = []
+    education: list[Any] = []
+    issues: list[Any] = []
+
+
+class ResumeRescore(_Output):
+    score: Score
+    grade: str = "C"
+    summary: str = ""
+    skills_added: list[str] = []
+    skills_removed: list[str] = []
+    gaps_resolved: list[Any] = []
+    gaps_added: list[Any] = []
+    improvements: list[Any] = []
+
+
+class ResumeEnhancement(_Output):
+    enhanced_resume: str
+    changes_made: list[Any] = []
+
+
+class InterviewQuestion(_Output):
+    text: str
+    type: str = "technical"
+    expected_points: list[str] = []
+    difficulty: str = "medium"
+
+
+class AnswerEvaluation(_Output):
+    score: Score
+    grade: str = "C"
+    feedback: str = ""
+    strengths: list[Any] = []
+    improvements: list[Any] = []
+    would_hire: bool = False
+
+
+class LearningItem(_Output):
+    skill: str
+    priority: str = "medium"
+    resources: list[Any] = []
+
+
+class QuizQuestion(_Output):
+    question: str
+    options: list[str] = Field(min_length=2)
+    correct: str
+    explanation: str = ""
+
+
+class JobAdvice(_Output):
+    title: str
+    advice: str
+
+
+@lru_cache(maxsize=None)
+def _adapter(schema) -> TypeAdapter:
+    return TypeAdapter(schema)
+
+
+def validate(data, schema):
+    """Validate decoded output against a schema (model or list[model]); return plain data"""
+    adapter = _adapter(schema)
+    try:
+        return adapter.dump_python(adapter.validate_python(data))
+    except ValidationError as e:
+        problems = "; ".join(f"{'.'.join(map(str, err['loc'])) or 'value'}: {err['msg']}" for err in e.errors()[:5])
+        raise OutputError(f"schema mismatch - {problems}")
+
+
+def parse(text: str, schema):
+    """First JSON value in text that validates against schema; raises OutputError"""
+    if schema is None:
+        return extract_json(text)
+    error = None
+    for data in _candidates(text):
+        try:
+            return validate(data, schema)
+        except OutputError as e:
+            error = error or e
+    raise error
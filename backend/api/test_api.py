@@ -2,16 +2,20 @@
 VidyaMitra API Test Suite
 Simulates calls from Frontend (with Clerk auth) and n8n (webhook interface)
 
-Run: python test_api.py
+Run: python test_api.py            (--offline: only the checks that need no server)
 """
 
 import asyncio
 import httpx
 import json
+import os
+import sys
 from datetime import datetime
 
 BASE_URL = "http://localhost:8000"
 API_PREFIX = "/api"
+# A real Clerk session token enables the authenticated tests (skipped when empty)
+AUTH_TOKEN = os.environ.get("TEST_AUTH_TOKEN", "")
 
 # Colors for terminal output
 GREEN = "\033[92m"
@@ -410,7 +414,34 @@ async def test_job_market_endpoints():
         except Exception as e:
             log_test("Skill Gap Analysis", False, str(e))
             results.append(False)
-        
+
+        # Test 7: Batch Skill Gap matches the single endpoint
+        log("\n👥 Batch Skill Gap", YELLOW)
+        try:
+            cohort = [["Python", "SQL", "Git"], ["Excel", "Tableau"], ["AWS", "Docker", "Kubernetes"], []]
+            roles = ["ML Engineer", "Data Analyst", "DevOps Engineer"]
+            res = await client.post(f"{BASE_URL}{API_PREFIX}/jobs/market/skill-gap/batch", json={
+                "users": [{"id": str(i), "skills": skills} for i, skills in enumerate(cohort)],
+                "roles": roles
+            })
+            data = res.json()
+            passed = res.status_code == 200 and len(data.get("results", [])) == len(cohort)
+            log_test("Batch gap analysis done", passed, f"{len(cohort)} users x {len(roles)} roles")
+            mismatches = []
+            for skills, row in zip(cohort, data.get("results", [])):
+                for role, match in zip(roles, row["match_percent"]):
+                    single = (await client.post(f"{BASE_URL}{API_PREFIX}/jobs/market/skill-gap", json={
+                        "skills": skills, "role": role
+                    })).json()
+                    if single.get("match_percent") != match:
+                        mismatches.append(f"{role}: {match} vs {single.get('match_percent')}")
+            passed = passed and not mismatches
+            log_test("Batch matches single endpoint", not mismatches, "; ".join(mismatches[:3]))
+            results.append(passed)
+        except Exception as e:
+            log_test("Batch Skill Gap", False, str(e))
+            results.append(False)
+
         return results
 
 
@@ -457,6 +488,81 @@ async def test_frontend_simulation():
         return results
 
 
+# ═══════════════════════════════════════════════════════════════
+# AUTHENTICATED TESTS (TEST_AUTH_TOKEN)
+# ═══════════════════════════════════════════════════════════════
+
+async def test_authenticated():
+    """Ownership checks that need a signed-in user"""
+    
+    log("\n" + "="*60, BLUE)
+    log("🔑 AUTHENTICATED TESTS", BLUE)
+    log("="*60, BLUE)
+    
+    if not AUTH_TOKEN:
+        log("  Skipped - set TEST_AUTH_TOKEN to a Clerk session token", YELLOW)
+        return []
+    
+    headers = {"Authorization": f"Bearer {AUTH_TOKEN}"}
+    async with httpx.AsyncClient(timeout=60, headers=headers) as client:
+        results = []
+        
+        # Bulk upload must not write into another user's account
+        log("\n📦 Bulk Upload Ownership", YELLOW)
+        try:
+            body = json.dumps({"id": "foreign", "user_id": "someone-else-123",
+                               "resume_text": "Jane Doe\nPython developer with 5 years of experience"}) + "\n"
+            res = await client.post(f"{BASE_URL}{API_PREFIX}/resume/bulk", content=body,
+                                    headers={"Content-Type": "application/x-ndjson"})
+            lines = [json.loads(line) for line in res.text.splitlines() if line.strip()]
+            row = next((l for l in lines if l.get("type") == "result" and l.get("ref") == "foreign"), {})
+            passed = res.status_code == 200 and row.get("status") == "skipped" and "resume_id" not in row
+            log_test("Foreign user_id rejected", passed, f"Result: {row}")
+            results.append(passed)
+        except Exception as e:
+            log_test("Bulk Upload Ownership", False, str(e))
+            results.append(False)
+
+        # Completing an interview never trusts client-sent scores
+        log("\n🏁 Interview Completion", YELLOW)
+        try:
+            res = await client.post(f"{BASE_URL}{API_PREFIX}/interview/complete", json={
+                "interview_id": "00000000-0000-0000-0000-000000000000", "answers": [{"score": 100}]
+            })
+            passed = res.status_code == 404
+            log_test("Unknown interview rejected", passed, f"Status: {res.status_code}")
+            results.append(passed)
+
+            res = await client.post(f"{BASE_URL}{API_PREFIX}/interview/start", json={
+                "domain": "technology", "role": "Software Engineer", "question_count": 2
+            })
+            interview_id = res.json().get("interview_id")
+
+            # The n8n webhook applies the same rule, for unknown and foreign interviews alike
+            for label, data in (
+                ("unknown", {"interview_id": "00000000-0000-0000-0000-000000000000", "answers": [{"score": 100}]}),
+                ("foreign", {"interview_id": interview_id, "answers": [{"score": 100}]}),
+            ):
+                res = await client.post(f"{BASE_URL}{API_PREFIX}/webhook/interview/complete", json={
+                    "user_id": "someone-else-123", "data": data
+                })
+                passed = res.status_code == 404
+                log_test(f"Webhook rejects {label} interview", passed, f"Status: {res.status_code}")
+                results.append(passed)
+
+            res = await client.post(f"{BASE_URL}{API_PREFIX}/interview/complete", json={
+                "interview_id": interview_id, "answers": [{"score": 100}]
+            })
+            passed = res.status_code == 200 and res.json().get("final_score") == 0
+            log_test("Unanswered interview scores 0", passed, f"Score: {res.json().get('final_score')}")
+            results.append(passed)
+        except Exception as e:
+            log_test("Interview Completion", False, str(e))
+            results.append(False)
+
+        return results
+
+
 # ═══════════════════════════════════════════════════════════════
 # HEALTH & BASIC TESTS
 # ═══════════════════════════════════════════════════════════════
@@ -489,11 +595,273 @@ async def test_health():
         return results
 
 
+# ═══════════════════════════════════════════════════════════════
+# OFFLINE CHECKS (backend modules imported directly, no server needed)
+# ═══════════════════════════════════════════════════════════════
+
+def check(name, fn):
+    """Run one assert-based check and log it"""
+    try:
+        fn()
+        log_test(name, True)
+        return True
+    except Exception as e:
+        log_test(name, False, f"{type(e).__name__}: {e}")
+        return False
+
+
+def test_job_market_index():
+    """JobMarketIndex lookups against the linear scans they replaced"""
+    
+    log("\n" + "="*60, BLUE)
+    log("🧮 JOB MARKET INDEX (Offline)", BLUE)
+    log("="*60, BLUE)
+    
+    import job_market
+    data = job_market.get_market_data()
+    index = job_market.JobMarketIndex(data, job_market.ROLE_SKILLS)
+    names = [job["role"].lower() for job in data["fastest_growing_global"] + data["declining_roles"]]
+    
+    def scan(query):
+        query = query.lower()
+        return next((name for name in names if query in name), None)
+    
+    def find_role_parity():
+        # Every short and mid-word fragment of every role, plus separators and misses
+        fragments = {name[i:i + size] for name in names for size in (1, 2, 3, 6) for i in range(len(name))}
+        fragments |= {"", "/", "te", "ca", "se", "TE", "zz", "engineer x", "a\nb"}
+        for query in fragments:
+            found = index.find_role(query)
+            assert (found[1]["role"].lower() if found else None) == scan(query), repr(query)
+    
+    def outlook_fallback():
+        unknown = job_market.get_role_outlook(" Underwater Basket Weaver ")
+        assert unknown["role"] == " Underwater Basket Weaver " and unknown["outlook"] == "stable", unknown
+        assert job_market.resolve_role("   ") is None
+    
+    return [
+        check("find_role matches the linear scan (all fragments)", find_role_parity),
+        check("Unknown role keeps its text, outlook stable", outlook_fallback),
+    ]
+
+
+def test_skill_normalizer():
+    """Alias resolution in skills.normalize_skill and friends"""
+    
+    log("\n" + "="*60, BLUE)
+    log("🏷️ SKILL NORMALIZER (Offline)", BLUE)
+    log("="*60, BLUE)
+    
+    import skills
+    
+    def aliases():
+        expected = {
+            "JS": "javascript", "ECMAScript": "javascript", "Amazon Web Services": "aws", "AWS": "aws",
+            "k8s": "kubernetes", "React.js": "react", "Reactjs": "react", "Postgres": "postgresql",
+            "Node JS": "nodejs", "nodejs": "nodejs", "Golang": "go", "Go": "go", "C": "c", "R": "r",
+        }
+        for text, skill_id in expected.items():
+            assert skills.normalize_skill(text) == skill_id, (text, skills.normalize_skill(text))
+    
+    def versions_and_fuzzy():
+        # Version suffixes resolve by exact lookup, also for EXACT_ONLY and single-letter names
+        for text, skill_id in {"Python 3.11": "python", "Go 1.21": "go", "C 11": "c", "Swift v5": "swift",
+                               "PostgreSQL 15": "postgresql", "Machine Learnin": "machine_learning"}.items():
+            assert skills.normalize_skill(text) == skill_id, (text, skills.normalize_skill(text))
+        for text in ("", "   ", "Go-to-market", "xyz"):
+            assert skills.normalize_skill(text) is None, (text, skills.normalize_skill(text))
+    
+    def whole_items_only():
+        found = skills.extract_skills("Python, Go; Go-to-market strategy, Docker/Kubernetes")
+        assert found == ["python", "docker", "kubernetes", "go"], found
+        assert skills.extract_skills("Spring semester internship") == []
+        assert skills.normalize_skills(["AWS", "Amazon Web Services", "aws"]) == ["aws"]
+        # Exact keys never borrow a different skill's id
+        assert skills.exact_skill_key("Excel VBA") == "excel vba"
+        assert skills.exact_skill_key("JS") == skills.exact_skill_key("JavaScript")
+    
+    return [
+        check("Aliases resolve to canonical IDs", aliases),
+        check("Versioned names, fuzzy matches and non-skills", versions_and_fuzzy),
+        check("Ambiguous names only as whole items; exact keys", whole_items_only),
+    ]
+
+
+def test_prompt_registry():
+    """Prompt templates: compaction, verbatim field values, token accounting"""
+    
+    log("\n" + "="*60, BLUE)
+    log("🧾 PROMPT REGISTRY (Offline)", BLUE)
+    log("="*60, BLUE)
+    
+    import re
+    import prompts
+    
+    def compaction():
+        assert prompts.compact_schema('{ "a" : "two  words",\n  "b": [1, 2] }') == '{"a":"two  words","b":[1,2]}'
+        assert prompts.compact_text("  a   b \n\n   c  ") == "a b\nc"
+    
+    def verbatim_fields():
+        template = prompts.PromptTemplate("check", "v1", system="  Be   brief ",
+                                          user="Q: {question}\n\n  Answer:\n{answer}\nReturn {schema}",
+                                          schema='{"score": 0, "note": "a  b"}')
+        answer = "def f():\n    return {1: 2}\n\n\n# done"
+        messages = template.render(question="Why?", answer=answer)
+        assert messages[0] == {"role": "system", "content": "Be brief"}, messages[0]
+        assert messages[1]["content"] == f'Q: Why?\nAnswer:\n{answer}\nReturn {{"score":0,"note":"a  b"}}', messages[1]
+    
+    def registered_templates():
+        for name in prompts.names():
+            template = prompts.get(name)
+            fields = set(re.findall(r"(?<!\{)\{(\w+)\}(?!\})", template._user))
+            messages = template.render(**{field: "X" for field in fields})
+            assert template.static_tokens > 0 and "{schema}" not in messages[-1]["content"], name
+    
+    def accounting():
+        template = prompts.PromptTemplate("check", "v1", user="{x}")
+        messages = template.render(x="hello")
+        template.record(messages, 0.5, usage={"prompt_tokens": 30, "completion_tokens": 10})
+        template.record(messages, 1.5, error=True)
+        template.record_parse("ok")
+        template.record_parse("repaired")
+        summary = template.summary()
+        assert (summary["calls"], summary["errors"], summary["prompt_tokens"]) == (2, 1, 30), summary
+        assert summary["avg_completion_tokens"] == 10 and summary["latency_max"] == 1.5, summary
+        assert summary["parse_failure_rate"] == 0.5 and summary["unrecovered_rate"] == 0.0, summary
+    
+    return [
+        check("Schema/text compaction", compaction),
+        check("Field values are inserted verbatim", verbatim_fields),
+        check("Registered templates render", registered_templates),
+        check("Token and parse accounting", accounting),
+    ]
+
+
+def test_structured_output():
+    """structured.extract_json / parse edge cases"""
+    
+    log("\n" + "="*60, BLUE)
+    log("🧩 STRUCTURED OUTPUT (Offline)", BLUE)
+    log("="*60, BLUE)
+    
+    import structured
+    
+    def raises(fn, *args):
+        try:
+            fn(*args)
+        except structured.OutputError as e:
+            return str(e)
+        raise AssertionError(f"no OutputError for {args[0]!r}")
+    
+    def extraction():
+        cases = {
+            '{"a": 1}': {"a": 1},
+            '```json\n{"a": 1}\n```': {"a": 1},
+            '[{"q": 1}]': [{"q": 1}],
+            # Brackets and escaped quotes inside strings, more JSON after the first value
+            'Sure: {"a": "x}y"} hope that helps {"b": 2}': {"a": "x}y"},
+            '{"a": "quote \\" inside", "b": "back\\\\"}': {"a": 'quote " inside', "b": "back\\"},
+            '{"a": "{"}': {"a": "{"},
+        }
+        for text, expected in cases.items():
+            assert structured.extract_json(text) == expected, (text, structured.extract_json(text))
+    
+    def failures():
+        assert "truncated" in raises(structured.extract_json, '{"a": 1')
+        assert "no JSON" in raises(structured.extract_json, "no json here")
+        assert "no JSON" in raises(structured.extract_json, "")
+    
+    def schemas():
+        # Footnote-like arrays before the object are skipped when they fail the schema
+        assert structured.parse('See [1] and [2]. {"score": 80}', structured.ResumeAnalysis)["score"] == 80
+        assert structured.parse('{"x": 1} then {"score": "85/100"}', structured.ResumeAnalysis)["score"] == 85
+        evaluation = structured.parse('{"score": 85.4, "extra": 1}', structured.AnswerEvaluation)
+        assert evaluation["score"] == 85 and evaluation["extra"] == 1 and evaluation["grade"] == "C", evaluation
+        quiz = structured.parse('[{"question": "q", "options": ["a", "b"], "correct": "a"}]', list[structured.QuizQuestion])
+        assert quiz == [{"question": "q", "options": ["a", "b"], "correct": "a", "explanation": ""}], quiz
+        assert "schema mismatch" in raises(structured.parse, '{"score": 150}', structured.ResumeAnalysis)
+        assert "options" in raises(structured.parse, '{"question": "q", "options": ["a"], "correct": "a"}',
+                                   structured.QuizQuestion)
+    
+    def string_stream():
+        stream = structured.StringFieldStream("feedback")
+        chunks = ['{"score": 8, "feed', 'back": "Go', 'od \\"job\\"\\n', '", "x": 1}']
+        assert [stream.feed(chunk) for chunk in chunks] == ["", "Go", 'od "job"\n', ""]
+    
+    return [
+        check("extract_json: fences, prose, strings with brackets", extraction),
+        check("extract_json: truncated / missing JSON", failures),
+        check("parse: schema coercion, candidates, mismatches", schemas),
+        check("StringFieldStream across chunk boundaries", string_stream),
+    ]
+
+
+def test_semantic_cache():
+    """SemanticCache near-duplicate hits, partitions and LRU eviction"""
+    
+    log("\n" + "="*60, BLUE)
+    log("🧠 SEMANTIC CACHE (Offline)", BLUE)
+    log("="*60, BLUE)
+    
+    from semantic_cache import SemanticCache
+    
+    text = "quiz on python decorators and generators for backend developers"
+    
+    def near_duplicates():
+        cache = SemanticCache("check", threshold=0.9)
+        cache.set((5, "easy"), text, "A")
+        assert cache.get((5, "easy"), text) == "A"
+        assert cache.get((5, "easy"), text.replace("developers", "developer")) == "A"
+        assert cache.get((5, "easy"), text.replace("python decorators and generators", "rust ownership")) is None
+        stats = cache.stats()
+        assert (stats["exact_hits"], stats["semantic_hits"], stats["misses"]) == (1, 1, 1), stats
+        assert stats["near_hit_samples"][0]["matched"] == text, stats
+    
+    def partitions():
+        cache = SemanticCache("check", threshold=0.9)
+        cache.set((5, "easy"), text, "A")
+        # Same text, different exact-match fields (count, difficulty): never shared
+        assert cache.get((5, "hard"), text) is None and cache.get((10, "easy"), text) is None
+        cache.set((5, "hard"), text, "B")
+        assert cache.get((5, "easy"), text) == "A" and cache.get((5, "hard"), text) == "B"
+    
+    def eviction():
+        cache = SemanticCache("check", threshold=0.9, max_entries=3)
+        cache.set(("p",), "alpha", 1)
+        cache.set(("p",), "beta", 2)
+        cache.set(("q",), "gamma", 3)
+        cache.get(("p",), "alpha")  # Touch: beta is now least recently used
+        cache.set(("q",), "delta", 4)
+        assert list(cache._entries) == [(("q",), "gamma"), (("p",), "alpha"), (("q",), "delta")], list(cache._entries)
+        assert cache._vectors.keys() == {("p",), ("q",)} and list(cache._vectors[("p",)]) == ["alpha"]
+        assert cache.shrink(0.5) == 2 and len(cache) == 1 and ("p",) not in cache._vectors
+        cache.clear()
+        assert len(cache) == 0 and not cache._vectors
+    
+    return [
+        check("Exact and near-duplicate hits, misses", near_duplicates),
+        check("Partitions never share entries", partitions),
+        check("LRU eviction drops vectors and empty partitions", eviction),
+    ]
+
+
+OFFLINE_SUITES = [
+    test_job_market_index, test_skill_normalizer, test_prompt_registry, test_structured_output, test_semantic_cache,
+]
+
+
+def run_offline_checks():
+    results = []
+    for suite in OFFLINE_SUITES:
+        results.extend(suite())
+    return results
+
+
 # ═══════════════════════════════════════════════════════════════
 # MAIN TEST RUNNER
 # ═══════════════════════════════════════════════════════════════
 
-async def run_all_tests():
+async def run_all_tests(offline_only=False):
     """Run all test suites"""
     
     log("\n" + "="*60, BLUE)
@@ -505,10 +873,13 @@ async def run_all_tests():
     all_results = []
     
     # Run test suites
-    all_results.extend(await test_health())
-    all_results.extend(await test_job_market_endpoints())
-    all_results.extend(await test_n8n_webhooks())
-    all_results.extend(await test_frontend_simulation())
+    all_results.extend(run_offline_checks())
+    if not offline_only:
+        all_results.extend(await test_health())
+        all_results.extend(await test_job_market_endpoints())
+        all_results.extend(await test_n8n_webhooks())
+        all_results.extend(await test_frontend_simulation())
+        all_results.extend(await test_authenticated())
     
     # Summary
     passed = sum(all_results)
@@ -530,5 +901,5 @@ async def run_all_tests():
 
 
 if __name__ == "__main__":
-    success = asyncio.run(run_all_tests())
+    success = asyncio.run(run_all_tests(offline_only="--offline" in sys.argv))
     exit(0 if success else 1)
@@ -0,0 +1,304 @@
+"""Request tracing - per-stage latency as Server-Timing headers, JSON logs and OTLP
+
+TracingMiddleware starts a trace for each HTTP request and keeps the current
+span in a context var; span() and @traced time the stages below it (auth,
+db, llm calls and parsing, n8n). Stage totals go out in a Server-Timing
+header, slow requests are logged as one JSON line, and finished traces can
+be exported as OTLP/JSON to a file or collector from a background task.
+Outside a request span() and @traced cost one context-var lookup.
+"""
+
+import asyncio
+import functools
+import json
+import random
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from config import settings
+
+SERVICE_NAME = "vidyamitra-api"
+MAX_SPANS = 256  # Per trace; further spans are counted but not kept
+EXPORT_QUEUE = 1024  # Finished traces waiting for export; oldest dropped beyond this
+EXPORT_INTERVAL = 5.0  # Seconds between export batches
+
+_current: ContextVar["Span | None"] = ContextVar("trace_span", default=None)
+
+
+class Trace:
+    __slots__ = ("_trace_id", "spans", "dropped")
+
+    def __init__(self):
+        self._trace_id = None
+        self.spans: list[Span] = []
+        self.dropped = 0
+
+    @property
+    def trace_id(self) -> str:
+        # Ids are only needed for logs/export, so they are made on first use
+        if self._trace_id is None:
+            self._trace_id = f"{random.getrandbits(128):032x}"
+        return self._trace_id
+
+    def server_timing(self, total_ms: float) -> str:
+        """Server-Timing value: time per stage name (count in desc when called more than once)"""
+        if not self.spans:
+            return f"total;dur={total_ms:.1f}"
+        stages: dict[str, list] = {}
+        for s in self.spans:
+            stage = stages.setdefault(s.name, [0.0, 0])
+            stage[0] += s.duration_ms
+            stage[1] += 1
+        parts = [
+            f'{name};dur={ms:.1f};desc="{count}x"' if count > 1 else f"{name};dur={ms:.1f}"
+            for name, (ms, count) in stages.items()
+        ]
+        parts.append(f"total;dur={total_ms:.1f}")
+        return ", ".join(parts)
+
+
+class Span:
+    __slots__ = ("trace", "name", "_span_id", "parent", "attrs", "start_ns", "_start", "duration_ms", "error")
+
+    def __init__(self, trace: Trace, name: str, parent: "Span | None", attrs: dict):
+        self.trace = trace
+        self.name = name
+        self._span_id = None
+        self.parent = parent
+        self.attrs = attrs
+        self.start_ns = time.time_ns()
+        self._start = time.perf_counter()
+        self.duration_ms = 0.0
+        self.error = False
+
+    @property
+    def span_id(self) -> str:
+        if self._span_id is None:
+            self._span_id = f"{random.getrandbits(64):016x}"
+        return self._span_id
+
+    def end(self) -> None:
+        self.duration_ms = (time.perf_counter() - self._start) * 1000
+        _record_stage(self.name, self.duration_ms, self.error)
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._start) * 1000
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Time a stage of the current request (no-op outside one)"""
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    trace = parent.trace
+    s = Span(trace, name, parent, attrs)
+    token = _current.set(s)
+    try:
+        yield s
+    except BaseException:
+        s.error = True
+        raise
+    finally:
+        _current.reset(token)
+        s.end()
+        if len(trace.spans) < MAX_SPANS:
+            trace.spans.append(s)
+        else:
+            trace.dropped += 1
+
+
+def traced(name: str = None):
+    """Decorator: run an async function inside span(name) (default: module.function)"""
+    def decorate(func):
+        span_name = name or f"{func.__module__}.{func.__name__}"
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return await func(*args, **kwargs)
+            with span(span_name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# ═══════════════════════════════════════════════════════════════
+# STAGE STATS
+# ═══════════════════════════════════════════════════════════════
+
+_stages: dict[str, list] = {}  # name -> [count, total_ms, max_ms, errors]
+_counters = {"traces": 0, "logged": 0, "exported": 0, "export_dropped": 0, "export_errors": 0}
+
+
+def _record_stage(name: str, ms: float, error: bool) -> None:
+    stage = _stages.get(name)
+    if stage is None:
+        stage = _stages[name] = [0, 0.0, 0.0, 0]
+    stage[0] += 1
+    stage[1] += ms
+    if ms > stage[2]:
+        stage[2] = ms
+    if error:
+        stage[3] += 1
+
+
+def get_stats() -> dict:
+    return {
+        "enabled": settings.TRACING,
+        **_counters,
+        "export_queue": len(_export_queue),
+        "stages": {
+            name: {"count": count, "avg_ms": round(total / count, 2), "max_ms": round(peak, 2), "errors": errors}
+            for name, (count, total, peak, errors) in sorted(_stages.items())
+        },
+    }
+
+
+# ═══════════════════════════════════════════════════════════════
+# MIDDLEWARE
+# ═══════════════════════════════════════════════════════════════
+
+class TracingMiddleware:
+    """Trace every HTTP request; adds a Server-Timing header to the response"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.TRACING:
+            await self.app(scope, receive, send)
+            return
+        trace = Trace()
+        root = Span(trace, "request", None, {"http.method": scope["method"], "http.target": scope["path"]})
+        token = _current.set(root)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                root.attrs["http.status_code"] = message["status"]
+                timing = trace.server_timing(root.elapsed_ms()).encode("latin-1")
+                message["headers"] = [*message.get("headers", ()), (b"server-timing", timing)]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        except BaseException:
+            root.error = True
+            raise
+        finally:
+            _current.reset(token)
+            root.end()
+            _finish(trace, root)
+
+
+def _finish(trace: Trace, root: Span) -> None:
+    _counters["traces"] += 1
+    if 0 <= settings.TRACE_LOG_MIN_MS <= root.duration_ms:
+        _counters["logged"] += 1
+        print(json.dumps({
+            "event": "request_trace",
+            "trace_id": trace.trace_id,
+            "method": root.attrs["http.method"],
+            "path": root.attrs["http.target"],
+            "status": root.attrs.get("http.status_code"),
+            "duration_ms": round(root.duration_ms, 1),
+            "spans": [
+                {"name": s.name, "ms": round(s.duration_ms, 1), **({"error": True} if s.error else {}), **s.attrs}
+                for s in trace.spans
+            ],
+            **({"spans_dropped": trace.dropped} if trace.dropped else {}),
+        }, default=str))
+    if settings.TRACE_EXPORT_FILE or settings.TRACE_OTLP_ENDPOINT:
+        if len(_export_queue) == _export_queue.maxlen:
+            _counters["export_dropped"] += 1
+        _export_queue.append((trace, root))
+
+
+# ═══════════════════════════════════════════════════════════════
+# OTLP EXPORT
+# ═══════════════════════════════════════════════════════════════
+
+_export_queue: deque = deque(maxlen=EXPORT_QUEUE)
+
+
+def _attributes(attrs: dict) -> list[dict]:
+    out = []
+    for key, value in attrs.items():
+        if isinstance(value, bool):
+            out.append({"key": key, "value": {"boolValue": value}})
+        elif isinstance(value, int):
+            out.append({"key": key, "value": {"intValue": str(value)}})
+        elif isinstance(value, float):
+            out.append({"key": key, "value": {"doubleValue": value}})
+        else:
+            out.append({"key": key, "value": {"stringValue": str(value)}})
+    return out
+
+
+def _otlp_span(trace: Trace, s: Span, kind: int) -> dict:
+    start = s.start_ns
+    out = {
+        "traceId": trace.trace_id,
+        "spanId": s.span_id,
+        "name": s.name if kind == 1 else f"{s.attrs['http.method']} {s.attrs['http.target']}",
+        "kind": kind,  # 1 internal, 2 server
+        "startTimeUnixNano": str(start),
+        "endTimeUnixNano": str(start + int(s.duration_ms * 1_000_000)),
+        "attributes": _attributes(s.attrs),
+        "status": {"code": 2 if s.error else 0},
+    }
+    if s.parent is not None:
+        out["parentSpanId"] = s.parent.span_id
+    return out
+
+
+def _otlp_batch(batch: list) -> dict:
+    spans = []
+    for trace, root in batch:
+        spans.append(_otlp_span(trace, root, 2))
+        spans.extend(_otlp_span(trace, s, 1) for s in trace.spans)
+    return {"resourceSpans": [{
+        "resource": {"attributes": _attributes({"service.name": SERVICE_NAME})},
+        "scopeSpans": [{"scope": {"name": "vidyamitra.tracing"}, "spans": spans}],
+    }]}
+
+
+def _append_line(path: str, line: str) -> None:
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+
+
+async def export_pending() -> None:
+    """Export queued traces as one OTLP/JSON batch (file line and/or collector POST)"""
+    if not _export_queue:
+        return
+    batch = list(_export_queue)
+    _export_queue.clear()
+    payload = _otlp_batch(batch)
+    try:
+        if settings.TRACE_EXPORT_FILE:
+            await asyncio.to_thread(_append_line, settings.TRACE_EXPORT_FILE, json.dumps(payload, default=str))
+        if settings.TRACE_OTLP_ENDPOINT:
+            from main import get_http_client
+            client = get_http_client()
+            if client is not None:
+                res = await client.post(settings.TRACE_OTLP_ENDPOINT, json=payload, timeout=10)
+                res.raise_for_status()
+        _counters["exported"] += len(batch)
+    except Exception as e:
+        _counters["export_errors"] += 1
+        print(f"[Trace] export error: {e}")
+
+
+async def export_loop(interval: float = EXPORT_INTERVAL) -> None:
+    """Background task: export finished traces every interval seconds"""
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            await export_pending()
+    except asyncio.CancelledError:
+        await export_pending()
+        raise
@@ -0,0 +1,430 @@
+"""Voice interview sessions over WebSocket
+
+Session state (questions, transcript, scores) lives server-side, so a turn
+only carries the answer text and auth happens once per connection. Partial
+transcripts start a speculative evaluation when the speaker pauses; if the
+final transcript matches, that evaluation (and the feedback text it has
+already buffered) is used, otherwise it is cancelled.
+
+Turns are pipelined: the spoken reply to a final transcript (a short
+acknowledgement plus the next question) is rendered when the previous turn
+ends and sent at once; the evaluation is streamed afterwards while the next
+answer is already being spoken. Sessions started with spoken_feedback get
+the feedback read out before the next question instead.
+
+Sessions are bounded in number and size, survive a reconnect and expire
+when idle.
+"""
+
+import asyncio
+import re
+import time
+import uuid
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+from cache import approx_size
+from config import settings
+import db
+import interview_store
+import llm
+
+MAX_QUESTIONS = 20
+MAX_ANSWER_CHARS = 4000  # Stored transcript per answer (the evaluation sees the first 1500)
+MIN_SPECULATE_WORDS = 5
+MAX_SPECULATIONS_PER_TURN = 3
+SPECULATION_TOLERANCE_WORDS = 2  # Trailing words a final transcript may add to still reuse a speculation
+ACKNOWLEDGEMENTS = ("Thank you.", "Got it, thanks.", "Okay, noted.", "Thanks for that.")
+CLOSING = "Thank you - that concludes our interview."
+EVALUATION_FALLBACK = {"score": 50, "grade": "C", "feedback": "Response noted.", "strengths": [], "improvements": []}
+
+_WORDS = re.compile(r"[\w']+")
+
+
+class SessionLimitError(Exception):
+    pass
+
+
+def _words(text: str) -> list[str]:
+    return _WORDS.findall(text.lower())
+
+
+class _Evaluation:
+    """One (possibly speculative) streamed evaluation; feedback deltas are queued until consumed"""
+
+    def __init__(self, question: dict, answer: str):
+        self.answer = answer
+        self.words = _words(answer)
+        self.deltas: asyncio.Queue = asyncio.Queue()
+        self.task = asyncio.create_task(self._run(question))
+
+    async def _run(self, question: dict) -> dict:
+        try:
+            return await llm.stream_evaluation(
+                question.get("text", ""), self.answer, question.get("expected_points"), on_feedback=self.deltas.put
+            )
+        finally:
+            self.deltas.put_nowait(None)
+
+    def matches(self, words: list[str]) -> bool:
+        extra = len(words) - len(self.words)
+        return 0 <= extra <= SPECULATION_TOLERANCE_WORDS and words[:len(self.words)] == self.words
+
+    def cancel(self) -> None:
+        self.task.cancel()
+
+
+class VoiceSession:
+    def __init__(self, user_id: str, state: interview_store.InterviewState, domain: str, role: str,
+                 questions: list, spoken_feedback: bool = False):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.state = state  # Stored transcript/scores (written through to interview_turns)
+        self.interview_id = state.interview_id
+        self.domain = domain
+        self.role = role
+        self.questions = questions
+        self.spoken_feedback = spoken_feedback
+        self.index = 0
+        self.turns: list[dict] = []
+        self.websocket: WebSocket | None = None
+        self.last_active = time.monotonic()
+        self.pending: set[asyncio.Task] = set()  # Evaluations still being delivered
+        self.reply = self._render_reply()
+        self._send_lock = asyncio.Lock()
+        self._partial_text = ""
+        self._partial_words: list[str] = []
+        self._speculation: _Evaluation | None = None
+        self._speculations = 0
+        self._timer: asyncio.Task | None = None
+
+    @property
+    def question(self) -> dict | None:
+        return self.questions[self.index] if self.index < len(self.questions) else None
+
+    @property
+    def complete(self) -> bool:
+        return self.index >= len(self.questions)
+
+    @property
+    def connected(self) -> bool:
+        return self.websocket is not None
+
+    def _render_reply(self) -> str:
+        """Spoken reply to the current question's answer (acknowledgement + next question)"""
+        following = self.index + 1
+        if following >= len(self.questions):
+            return CLOSING
+        ack = ACKNOWLEDGEMENTS[self.index % len(ACKNOWLEDGEMENTS)]
+        return f"{ack} Next question: {self.questions[following].get('text', '')}"
+
+    async def send(self, message: dict) -> bool:
+        """Send to the connected client, if any; False if nobody received it"""
+        websocket = self.websocket
+        if websocket is None:
+            return False
+        try:
+            async with self._send_lock:
+                await websocket.send_json(message)
+            return True
+        except Exception:
+            return False
+
+    def touch(self) -> None:
+        self.last_active = time.monotonic()
+
+    # ── speculation ────────────────────────────────────────────
+
+    def on_partial(self, text: str) -> None:
+        """Interim transcript: (re)arm the pause timer that starts a speculative evaluation"""
+        self._partial_text = text[:MAX_ANSWER_CHARS]
+        self._partial_words = _words(self._partial_text)
+        if self._timer:
+            self._timer.cancel()
+        if self.question and len(self._partial_words) >= MIN_SPECULATE_WORDS:
+            self._timer = asyncio.create_task(self._speculate_after_pause())
+
+    async def _speculate_after_pause(self) -> None:
+        await asyncio.sleep(settings.VOICE_SPECULATE_AFTER)
+        current = self._speculation
+        if current and current.words == self._partial_words:
+            return
+        if self._speculations >= MAX_SPECULATIONS_PER_TURN:
+            return
+        if current:
+            current.cancel()
+            sessions.speculation["wasted"] += 1
+        self._speculations += 1
+        sessions.speculation["started"] += 1
+        self._speculation = _Evaluation(self.question, self._partial_text)
+
+    def take_evaluation(self, answer: str) -> _Evaluation:
+        """Evaluation for the final transcript - the speculative one if it still matches"""
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        speculation, self._speculation = self._speculation, None
+        if speculation and speculation.matches(_words(answer)):
+            sessions.speculation["used"] += 1
+            return speculation
+        if speculation:
+            speculation.cancel()
+            sessions.speculation["wasted"] += 1
+        return _Evaluation(self.question, answer)
+
+    def record_answer(self, answer: str) -> int:
+        """Store the answer (evaluation pending), advance and pre-render the next reply; returns its turn index"""
+        self.turns.append({"question": self.question.get("text", ""), "answer": answer, "evaluation": None})
+        self.index += 1
+        self.reply = self._render_reply()
+        self._speculations = 0
+        self._partial_text = ""
+        self._partial_words = []
+        return len(self.turns) - 1
+
+    def close(self) -> None:
+        """Detach the client and stop speculation; pending evaluations still complete into the transcript"""
+        self.websocket = None
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        if self._speculation:
+            self._speculation.cancel()
+            self._speculation = None
+
+    def snapshot(self) -> dict:
+        return {
+            "session_id": self.id,
+            "interview_id": self.interview_id,
+            "index": self.index,
+            "total": len(self.questions),
+            "question": self.question,
+            "is_complete": self.complete,
+        }
+
+
+class SessionStore:
+    """Live voice sessions; idle ones are dropped and the count is capped"""
+
+    def __init__(self):
+        self._sessions: dict[str, VoiceSession] = {}
+        self.created = 0
+        self.expired = 0
+        self.speculation = {"started": 0, "used": 0, "wasted": 0}
+        self._response_latency_total = 0.0
+        self._response_latency_count = 0
+
+    def create(self, user_id: str, state: interview_store.InterviewState, domain: str, role: str,
+               questions: list, spoken_feedback: bool = False) -> VoiceSession:
+        if len(self._sessions) >= settings.VOICE_MAX_SESSIONS:
+            self.sweep()
+        if len(self._sessions) >= settings.VOICE_MAX_SESSIONS:
+            raise SessionLimitError("Too many active voice sessions, try again shortly")
+        session = VoiceSession(user_id, state, domain, role, questions, spoken_feedback)
+        self._sessions[session.id] = session
+        self.created += 1
+        return session
+
+    def get(self, session_id: str, user_id: str) -> VoiceSession | None:
+        session = self._sessions.get(session_id)
+        return session if session and session.user_id == user_id else None
+
+    def remove(self, session: VoiceSession) -> None:
+        session.close()
+        for task in session.pending:
+            task.cancel()
+        self._sessions.pop(session.id, None)
+
+    def sweep(self) -> int:
+        """Drop sessions idle for longer than VOICE_IDLE_TIMEOUT"""
+        cutoff = time.monotonic() - settings.VOICE_IDLE_TIMEOUT
+        idle = [s for s in self._sessions.values() if s.last_active < cutoff]
+        for session in idle:
+            self.remove(session)
+        self.expired += len(idle)
+        return len(idle)
+
+    def record_response_latency(self, seconds: float) -> None:
+        self._response_latency_total += seconds
+        self._response_latency_count += 1
+
+    def stats(self) -> dict:
+        return {
+            "active": len(self._sessions),
+            "connected": sum(s.connected for s in self._sessions.values()),
+            "max_sessions": settings.VOICE_MAX_SESSIONS,
+            "approx_bytes": approx_size([(s.questions, s.turns) for s in self._sessions.values()]),
+            "created": self.created,
+            "expired": self.expired,
+            "speculation": dict(self.speculation),
+            # Final transcript -> first spoken-response text sent
+            "avg_response_latency": round(self._response_latency_total / self._response_latency_count, 3)
+            if self._response_latency_count else 0.0,
+        }
+
+
+sessions = SessionStore()
+
+
+async def sweep_sessions(interval: float = 30.0) -> None:
+    """Background loop expiring idle sessions"""
+    while True:
+        await asyncio.sleep(interval)
+        expired = sessions.sweep()
+        if expired:
+            print(f"[Voice] expired {expired} idle session(s)")
+
+
+# ═══════════════════════════════════════════════════════════════
+# PROTOCOL
+# ═══════════════════════════════════════════════════════════════
+
+async def open_session(user: dict, start: dict) -> VoiceSession:
+    """Resume by session_id, or create a session (generating questions unless provided)"""
+    if start.get("session_id"):
+        session = sessions.get(start["session_id"], user["user_id"])
+        if session is None:
+            raise LookupError("Session not found or expired")
+        if session.connected:
+            raise LookupError("Session is already connected")
+        return session
+
+    domain = str(start.get("domain") or "technology")[:100]
+    role = str(start.get("role") or "Software Engineer")[:100]
+    questions = start.get("questions")
+    if isinstance(questions, list) and questions:
+        questions = [q if isinstance(q, dict) else {"text": str(q)} for q in questions[:MAX_QUESTIONS]]
+    else:
+        count = min(max(int(start.get("question_count") or 5), 1), MAX_QUESTIONS)
+        questions = await llm.generate_questions(domain=domain, role=role, count=count)
+    saved = await db.save_interview(user_id=user["user_id"], domain=domain, role=role)
+    state = await interview_store.start(
+        user["user_id"], saved.get("id") if saved else None, questions, domain=domain, role=role
+    )
+    return sessions.create(user["user_id"], state, domain, role, questions,
+                           spoken_feedback=bool(start.get("spoken_feedback")))
+
+
+async def _deliver(session: VoiceSession, index: int, evaluation: _Evaluation) -> dict:
+    """Stream one turn's feedback and evaluation to the client and store the result"""
+    while (delta := await evaluation.deltas.get()) is not None:
+        await session.send({"type": "feedback", "turn": index, "text": delta})
+    try:
+        result = await evaluation.task
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        print(f"[Voice] evaluation error: {e}")
+        result = dict(EVALUATION_FALLBACK)
+    session.turns[index]["evaluation"] = result
+    await interview_store.record(session.state, index, session.turns[index]["answer"], result)
+    await session.send({"type": "evaluation", "turn": index, "evaluation": result})
+    return result
+
+
+async def _answer(session: VoiceSession, answer: str) -> None:
+    """Final transcript: reply at once with the pre-rendered text; evaluate in the background"""
+    received = time.monotonic()
+    evaluation = session.take_evaluation(answer)
+    reply = session.reply
+    index = session.record_answer(answer)
+    await session.send({"type": "reply", "turn": index, "response_text": reply, **session.snapshot()})
+    sessions.record_response_latency(time.monotonic() - received)
+    task = asyncio.create_task(_deliver(session, index, evaluation))
+    session.pending.add(task)
+    task.add_done_callback(session.pending.discard)
+
+
+async def _answer_with_feedback(session: VoiceSession, answer: str) -> None:
+    """spoken_feedback sessions: stream the feedback as speech, then the next question.
+
+    The streamed text is the evaluation's feedback as generated; if the
+    evaluation needed a repair or failed, the turn's response_text (always
+    authoritative) differs from what was streamed.
+    """
+    received = time.monotonic()
+    evaluation = session.take_evaluation(answer)
+    streamed = []
+
+    async def speak(text: str) -> None:
+        if not streamed:
+            sessions.record_response_latency(time.monotonic() - received)
+        streamed.append(text)
+        await session.send({"type": "token", "text": text})
+
+    while (delta := await evaluation.deltas.get()) is not None:
+        await speak(delta)
+    try:
+        result = await evaluation.task
+    except Exception as e:
+        print(f"[Voice] evaluation error: {e}")
+        result = dict(EVALUATION_FALLBACK)
+    feedback = result.get("feedback", "")
+    if not streamed and feedback:
+        await speak(feedback)
+
+    index = session.record_answer(answer)
+    session.turns[index]["evaluation"] = result
+    await interview_store.record(session.state, index, answer, result)
+    question = session.question
+    closing = f" Next question: {question.get('text', '')}" if question else f" {CLOSING}"
+    await speak(closing)
+    await session.send({
+        "type": "turn",
+        "evaluation": result,
+        "response_text": f"{feedback}{closing}",
+        **session.snapshot(),
+    })
+
+
+async def _finish(session: VoiceSession) -> None:
+    if session.pending:
+        # wait() rather than gather(): a disconnect must not cancel evaluations in flight
+        await asyncio.wait(set(session.pending))
+    final_score = await interview_store.complete(session.state)
+    await session.send({
+        "type": "complete",
+        "final_score": final_score,
+        "turns": session.turns,
+        "interview_id": session.interview_id,
+    })
+    sessions.remove(session)
+
+
+async def serve(websocket: WebSocket, session: VoiceSession) -> None:
+    """Message loop for one connected session (see ENDPOINTS.md for the protocol)"""
+    session.websocket = websocket
+    session.touch()
+    await session.send({"type": "session", **session.snapshot(), "turns": session.turns})
+    answer = _answer_with_feedback if session.spoken_feedback else _answer
+    try:
+        while not session.complete:
+            try:
+                message = await asyncio.wait_for(websocket.receive_json(), timeout=settings.VOICE_IDLE_TIMEOUT)
+            except asyncio.TimeoutError:
+                await websocket.close(code=1000, reason="idle")
+                return
+            except ValueError:
+                await session.send({"type": "error", "message": "Invalid JSON"})
+                continue
+            session.touch()
+            kind = message.get("type") if isinstance(message, dict) else None
+            text = str(message.get("text") or "")[:MAX_ANSWER_CHARS] if kind else ""
+            if kind == "partial":
+                session.on_partial(text)
+            elif kind == "final":
+                if text.strip():
+                    await answer(session, text)
+                else:
+                    await session.send({"type": "error", "message": "Empty transcript"})
+            elif kind == "end":
+                break
+            elif kind == "ping":
+                await session.send({"type": "pong"})
+            else:
+                await session.send({"type": "error", "message": f"Unknown message type: {kind}"})
+        await _finish(session)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        session.close()